@@ -1,19 +1,40 @@
 from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import and_, or_, inspect as sa_inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.orm import Session, aliased, joinedload
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 import os
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 import json
-import pytz
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, namedtuple
+from itertools import islice
+from math import lcm
+from timezones import SYSTEM_TIMEZONE, convert_times_to_user_timezone
+from recurrence import common_series_dates, first_series_date, series_occurrence_dates
 load_dotenv()
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
-app.config['SQLALCHEMY_DATABASE_URI'] = f"mysql://{os.getenv('MYSQL_USER')}:{os.getenv('MYSQL_PASSWORD')}@{os.getenv('MYSQL_HOST')}/{os.getenv('MYSQL_DATABASE')}"
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL') or f"mysql://{os.getenv('MYSQL_USER')}:{os.getenv('MYSQL_PASSWORD')}@{os.getenv('MYSQL_HOST')}/{os.getenv('MYSQL_DATABASE')}"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Окно занятий, которое WebApp /schedule показывает сразу; остальное догружается через /api/schedule
+SCHEDULE_WINDOW_PAST_DAYS = int(os.getenv('SCHEDULE_WINDOW_PAST_DAYS', '35'))
+SCHEDULE_WINDOW_FUTURE_DAYS = int(os.getenv('SCHEDULE_WINDOW_FUTURE_DAYS', '70'))
+SCHEDULE_PAGE_SIZE = int(os.getenv('SCHEDULE_PAGE_SIZE', '100'))  # Занятий на страницу /api/schedule
+SCHEDULE_MAX_PAGE_SIZE = 500
+MONTH_SCHEDULE_CACHE_SIZE = int(os.getenv('MONTH_SCHEDULE_CACHE_SIZE', '64'))  # Месяцев в кэше /get_month_schedule
+SERIES_HORIZON_DAYS = int(os.getenv('SERIES_HORIZON_DAYS', '366'))  # Насколько вперёд разворачиваются серии без даты окончания
+
 db = SQLAlchemy(app)
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -29,36 +50,6 @@ def datetime_handler(x):
 
 app.json_encoder = type('JSONEncoder', (json.JSONEncoder,), {'default': datetime_handler})
 
-# Часовой пояс системы (Саратов)
-SYSTEM_TIMEZONE = pytz.timezone('Europe/Saratov')  # UTC+4
-
-def convert_time_to_user_timezone(system_datetime, user_timezone_str):
-    """
-    Конвертировать время из системного часового пояса в пользовательский
-    system_datetime - datetime объект в системном времени (Саратов UTC+4)
-    user_timezone_str - строка часового пояса пользователя (например, 'Europe/Moscow')
-    """
-    try:
-        # Если передана строка вместо timezone объекта
-        if isinstance(user_timezone_str, str):
-            if user_timezone_str.startswith('UTC') or user_timezone_str.startswith('+'):
-                # Старый формат (например, '+04:00')
-                user_timezone_str = 'Europe/Saratov'  # По умолчанию
-            user_tz = pytz.timezone(user_timezone_str)
-        else:
-            user_tz = user_timezone_str
-        
-        # Локализуем системное время
-        system_dt_localized = SYSTEM_TIMEZONE.localize(system_datetime) if system_datetime.tzinfo is None else system_datetime
-        
-        # Конвертируем в пользовательский часовой пояс
-        user_dt = system_dt_localized.astimezone(user_tz)
-        
-        return user_dt
-    except Exception as e:
-        app.logger.error(f"Ошибка конвертации времени: {e}")
-        return system_datetime
-
 class User(UserMixin, db.Model):
     __tablename__ = 'user'
     id = db.Column(db.Integer, primary_key=True)
@@ -109,7 +100,12 @@ class Schedule(db.Model):
     subject_id = db.Column(db.Integer, db.ForeignKey('subject.id', ondelete='CASCADE'), nullable=False)
     lesson_type = db.Column(db.String(20), default='regular')  # 'regular' или 'trial'
     duration_minutes = db.Column(db.Integer, default=60)  # Продолжительность в минутах
+    start_at = db.Column(db.DateTime, index=True)  # date + time, пересчитывается при сохранении
+    end_at = db.Column(db.DateTime, index=True)  # start_at + duration_minutes
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())  # По нему бот подтягивает изменения
+    series_id = db.Column(db.Integer, db.ForeignKey('lesson_series.id', ondelete='SET NULL'))  # Серия, из которой записано занятие
+    occurrence_date = db.Column(db.Date)  # Дата занятия по правилу серии (date может отличаться после переноса)
     
     # Отношения
     tutor = db.relationship('TelegramID', foreign_keys=[tutor_id], backref='tutor_schedules')
@@ -118,6 +114,493 @@ class Schedule(db.Model):
     
     # Отношение для напоминаний с каскадным удалением
     reminders = db.relationship('Reminder', backref='schedule', lazy=True, cascade='all, delete-orphan')
+    
+    # Окно занятий пользователя по времени (WebApp /schedule)
+    __table_args__ = (
+        db.Index('idx_tutor_start_at', 'tutor_id', 'start_at'),
+        db.Index('idx_student_start_at', 'student_id', 'start_at'),
+        db.UniqueConstraint('series_id', 'occurrence_date', name='unique_series_occurrence'),
+    )
+
+    @property
+    def key(self):
+        """Ключ занятия в ответах API: у записанных занятий — id"""
+        return str(self.id)
+
+    @property
+    def sort_id(self):
+        return self.id
+
+    def sync_time_bounds(self):
+        """Пересчитать start_at и end_at из date, time и duration_minutes"""
+        if self.date is None or self.time is None:
+            return
+        self.start_at, self.end_at = schedule_time_bounds(self.date, self.time, self.duration_minutes)
+
+def schedule_time_bounds(lesson_date, lesson_time, duration_minutes):
+    """start_at и end_at занятия. Нужны и там, где события ORM не срабатывают (массовые INSERT/UPDATE)"""
+    start_at = datetime.combine(lesson_date, lesson_time)
+    return start_at, start_at + timedelta(minutes=duration_minutes or 60)
+
+# SQL-функции для массовых операций с расписанием: MySQL в работе, SQLite в тестах
+class sql_weekday(FunctionElement):
+    """День недели даты, 0 — понедельник (как date.weekday())"""
+    type = db.Integer()
+    inherit_cache = True
+
+@compiles(sql_weekday)
+def compile_weekday(element, compiler, **kw):
+    return f"WEEKDAY({compiler.process(element.clauses, **kw)})"
+
+@compiles(sql_weekday, 'sqlite')
+def compile_weekday_sqlite(element, compiler, **kw):
+    return f"((CAST(strftime('%w', {compiler.process(element.clauses, **kw)}) AS INTEGER) + 6) % 7)"
+
+class sql_lesson_start(FunctionElement):
+    """date + time одним DATETIME"""
+    type = db.DateTime()
+    inherit_cache = True
+
+@compiles(sql_lesson_start)
+def compile_lesson_start(element, compiler, **kw):
+    return f"TIMESTAMP({compiler.process(element.clauses, **kw)})"
+
+@compiles(sql_lesson_start, 'sqlite')
+def compile_lesson_start_sqlite(element, compiler, **kw):
+    lesson_date, lesson_time = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f"datetime({lesson_date} || ' ' || {lesson_time})"
+
+class sql_add_minutes(FunctionElement):
+    """DATETIME плюс число минут"""
+    type = db.DateTime()
+    inherit_cache = True
+
+@compiles(sql_add_minutes)
+def compile_add_minutes(element, compiler, **kw):
+    moment, minutes = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f"TIMESTAMPADD(MINUTE, {minutes}, {moment})"
+
+@compiles(sql_add_minutes, 'sqlite')
+def compile_add_minutes_sqlite(element, compiler, **kw):
+    moment, minutes = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f"datetime({moment}, '+' || {minutes} || ' minutes')"
+
+def schedule_bounds_values(lesson_date, lesson_time, duration_minutes):
+    """Значения start_at/end_at для массового UPDATE: Query.update не вызывает before_update"""
+    start_at = sql_lesson_start(lesson_date, lesson_time)
+    return {
+        Schedule.start_at: start_at,
+        Schedule.end_at: sql_add_minutes(start_at, db.func.coalesce(duration_minutes, 60)),
+    }
+
+def future_same_weekday_query(schedule, **filters):
+    """Будущие занятия пары в тот же день недели, начиная с даты schedule, — фильтр целиком в SQL"""
+    return Schedule.query.filter(
+        Schedule.tutor_id == schedule.tutor_id,
+        Schedule.student_id == schedule.student_id,
+        Schedule.date >= schedule.date,
+        sql_weekday(Schedule.date) == schedule.date.weekday(),
+        *(getattr(Schedule, name) == value for name, value in filters.items())
+    )
+
+@db.event.listens_for(Schedule, 'before_insert')
+@db.event.listens_for(Schedule, 'before_update')
+def sync_schedule_time_bounds(mapper, connection, target):
+    """start_at/end_at всегда соответствуют date, time и duration_minutes"""
+    target.sync_time_bounds()
+
+class LessonSeries(db.Model):
+    """Регулярное занятие: правило повторения вместо строки schedule на каждую неделю"""
+    __tablename__ = 'lesson_series'
+    id = db.Column(db.Integer, primary_key=True)
+    tutor_id = db.Column(db.Integer, db.ForeignKey('telegram_id.id', ondelete='CASCADE'), nullable=False, index=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('telegram_id.id', ondelete='CASCADE'), nullable=False, index=True)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id', ondelete='CASCADE'), nullable=False)
+    weekday = db.Column(db.Integer, nullable=False)  # 0 — понедельник
+    interval_weeks = db.Column(db.Integer, nullable=False, default=1)
+    time = db.Column(db.Time, nullable=False)
+    duration_minutes = db.Column(db.Integer, default=60)
+    lesson_type = db.Column(db.String(20), default='regular')
+    start_date = db.Column(db.Date, nullable=False)  # Первое занятие серии
+    end_date = db.Column(db.Date)  # Последняя допустимая дата, None — без окончания
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now(), index=True)  # По нему бот подтягивает новые серии
+    
+    tutor = db.relationship('TelegramID', foreign_keys=[tutor_id])
+    student = db.relationship('TelegramID', foreign_keys=[student_id])
+    subject = db.relationship('Subject')
+    exceptions = db.relationship('LessonSeriesException', cascade='all, delete-orphan', passive_deletes=True)
+    
+    __table_args__ = (
+        db.Index('idx_series_period', 'start_date', 'end_date'),
+    )
+
+class LessonSeriesException(db.Model):
+    """Отменённое занятие серии"""
+    __tablename__ = 'lesson_series_exception'
+    series_id = db.Column(db.Integer, db.ForeignKey('lesson_series.id', ondelete='CASCADE'), primary_key=True)
+    occurrence_date = db.Column(db.Date, primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class SeriesOccurrence:
+    """Занятие серии, не записанное в schedule: те же поля, что у Schedule, но без id"""
+    id = None
+
+    def __init__(self, series, occurrence_date):
+        self.series_id = series.id
+        self.occurrence_date = occurrence_date
+        self.tutor_id = series.tutor_id
+        self.student_id = series.student_id
+        self.subject_id = series.subject_id
+        self.tutor = series.tutor
+        self.student = series.student
+        self.subject = series.subject
+        self.date = occurrence_date
+        self.time = series.time
+        self.lesson_type = series.lesson_type
+        self.duration_minutes = series.duration_minutes
+        self.start_at, self.end_at = schedule_time_bounds(occurrence_date, series.time, series.duration_minutes)
+
+    @property
+    def key(self):
+        return f"s{self.series_id}:{self.occurrence_date.isoformat()}"
+
+    @property
+    def sort_id(self):
+        # Отрицательный, чтобы не совпадать с id записанных занятий в курсоре (start_at, id)
+        return -self.series_id
+
+def expand_series(date_from, date_to, *criteria):
+    """Незаписанные занятия серий с датами в [date_from, date_to].
+    
+    date_from=None — с начала серий, date_to=None — на SERIES_HORIZON_DAYS вперёд. Запросов два
+    независимо от длины серий: сами серии и (если они есть) отменённые или уже записанные в schedule даты.
+    """
+    if date_to is None:
+        date_to = datetime.now().date() + timedelta(days=SERIES_HORIZON_DAYS)
+    query = LessonSeries.query.options(
+        joinedload(LessonSeries.subject), joinedload(LessonSeries.tutor), joinedload(LessonSeries.student)
+    ).filter(LessonSeries.start_date <= date_to, *criteria)
+    if date_from is not None:
+        query = query.filter(or_(LessonSeries.end_date.is_(None), LessonSeries.end_date >= date_from))
+    series_list = query.order_by(LessonSeries.id).all()
+    if not series_list:
+        return []
+    
+    series_ids = [series.id for series in series_list]
+    taken = db.session.query(
+        LessonSeriesException.series_id, LessonSeriesException.occurrence_date
+    ).filter(LessonSeriesException.series_id.in_(series_ids), LessonSeriesException.occurrence_date <= date_to)
+    materialized = db.session.query(Schedule.series_id, Schedule.occurrence_date).filter(
+        Schedule.series_id.in_(series_ids), Schedule.occurrence_date <= date_to
+    )
+    if date_from is not None:
+        taken = taken.filter(LessonSeriesException.occurrence_date >= date_from)
+        materialized = materialized.filter(Schedule.occurrence_date >= date_from)
+    skip = set(taken.union_all(materialized).all())
+    
+    occurrences = []
+    for series in series_list:
+        for occurrence_date in series_occurrence_dates(
+            series.start_date, series.end_date, series.interval_weeks, date_from or series.start_date, date_to
+        ):
+            if (series.id, occurrence_date) not in skip:
+                occurrences.append(SeriesOccurrence(series, occurrence_date))
+    return occurrences
+
+def series_for_user(user):
+    """Условие на серии пользователя (как репетитора или ученика)"""
+    if user.status == 'репетитор':
+        return LessonSeries.tutor_id == user.id
+    return LessonSeries.student_id == user.id
+
+# Предлагаемое занятие для проверки пересечений; key — ключ занятия, которое переносится (его старое место не мешает)
+LessonSlot = namedtuple('LessonSlot', 'tutor_id student_id subject_id start_at end_at key', defaults=(None,))
+LessonConflict = namedtuple('LessonConflict', 'slot role lesson')
+
+class LessonIntervalIndex:
+    """Занятия репетиторов и учеников по дням: для каждого (роль, id, день начала) — интервалы
+    [start_at, end_at), отсортированные по началу. Пересечения ищутся двоичным поиском"""
+
+    def __init__(self):
+        self._starts = {}
+        self._lessons = {}
+        self._longest = timedelta(0)
+
+    def add(self, lesson):
+        for role, person_id in (('tutor', lesson.tutor_id), ('student', lesson.student_id)):
+            key = (role, person_id, lesson.start_at.date())
+            starts = self._starts.setdefault(key, [])
+            index = bisect_right(starts, lesson.start_at)
+            starts.insert(index, lesson.start_at)
+            self._lessons.setdefault(key, []).insert(index, lesson)
+        self._longest = max(self._longest, lesson.end_at - lesson.start_at)
+
+    def overlapping(self, role, person_id, start_at, end_at):
+        """Занятия человека, пересекающиеся с [start_at, end_at) (в том числе начавшиеся накануне)"""
+        found = []
+        earliest = start_at - self._longest
+        day = earliest.date()
+        while day <= end_at.date():
+            starts = self._starts.get((role, person_id, day), [])
+            lessons = self._lessons.get((role, person_id, day), [])
+            # Кандидаты начинаются до end_at и не раньше, чем start_at минус самое длинное занятие
+            for index in range(bisect_left(starts, end_at) - 1, bisect_left(starts, earliest) - 1, -1):
+                if lessons[index].end_at > start_at:
+                    found.append(lessons[index])
+            day += timedelta(days=1)
+        return found
+
+def is_group_lesson(slot, lesson):
+    """Групповое занятие: репетитор ведёт одно занятие с несколькими учениками.
+    
+    Правило: занятия одного репетитора с разными учениками, у которых совпадают начало, окончание и
+    предмет, — одно групповое занятие и для репетитора не пересекаются (так создаются занятия сразу
+    для нескольких пар в add_schedule). Любое другое наложение — пересечение, в том числе в update_schedule.
+    """
+    return (
+        slot.student_id != lesson.student_id
+        and (slot.start_at, slot.end_at, int(slot.subject_id)) == (lesson.start_at, lesson.end_at, int(lesson.subject_id))
+    )
+
+def find_lesson_conflicts(slots):
+    """Все пересечения предлагаемых занятий slots с расписанием репетиторов и учеников и между собой.
+    
+    Занятия всех затронутых дней читаются одним запросом к schedule (и одним к сериям, плюс
+    отменённые и записанные даты, если серии есть), дальше каждое занятие проверяется по индексу
+    интервалов. Занятия с key из slots не мешают — это старое место переносимых занятий.
+    Возвращает список LessonConflict(slot, 'tutor' | 'student', занятие).
+    """
+    if not slots:
+        return []
+    tutor_ids = sorted({int(slot.tutor_id) for slot in slots})
+    student_ids = sorted({int(slot.student_id) for slot in slots})
+    window_start = min(slot.start_at for slot in slots)
+    window_end = max(slot.end_at for slot in slots)
+    # Занятие, начавшееся накануне, может заканчиваться после полуночи
+    days = sorted({day for slot in slots for day in (slot.start_at.date(), slot.start_at.date() - timedelta(days=1))})
+    
+    existing = Schedule.query.filter(
+        or_(Schedule.tutor_id.in_(tutor_ids), Schedule.student_id.in_(student_ids)),
+        Schedule.date.in_(days),
+        Schedule.start_at < window_end,
+        Schedule.end_at > window_start,
+    ).all()
+    existing += expand_series(
+        days[0], days[-1], or_(LessonSeries.tutor_id.in_(tutor_ids), LessonSeries.student_id.in_(student_ids))
+    )
+    
+    moved = {slot.key for slot in slots if slot.key}
+    index = LessonIntervalIndex()
+    for lesson in existing:
+        if lesson.key not in moved:
+            index.add(lesson)
+    
+    conflicts = []
+    for slot in sorted(slots, key=lambda slot: slot.start_at):
+        for role, person_id in (('tutor', int(slot.tutor_id)), ('student', int(slot.student_id))):
+            for lesson in index.overlapping(role, person_id, slot.start_at, slot.end_at):
+                if role == 'tutor' and is_group_lesson(slot, lesson):
+                    continue
+                conflicts.append(LessonConflict(slot, role, lesson))
+        # Занятия одной пачки тоже не должны пересекаться
+        index.add(slot._replace(tutor_id=int(slot.tutor_id), student_id=int(slot.student_id)))
+    return conflicts
+
+def describe_conflicts(conflicts, limit=5):
+    """Текст ошибки: первые limit пересечений"""
+    parts = []
+    for conflict in conflicts[:limit]:
+        who = 'репетитор' if conflict.role == 'tutor' else 'ученик'
+        lesson = conflict.lesson
+        parts.append(
+            f"{conflict.slot.start_at.strftime('%d.%m.%Y %H:%M')} — {who} занят "
+            f"{lesson.start_at.strftime('%H:%M')}–{lesson.end_at.strftime('%H:%M')}"
+        )
+    if len(conflicts) > limit:
+        parts.append(f"и ещё {len(conflicts) - limit}")
+    return 'Пересечение с другими занятиями: ' + '; '.join(parts)
+
+def serialize_conflicts(conflicts):
+    """Пересечения для ответа API"""
+    return [{
+        'date': conflict.slot.start_at.strftime('%Y-%m-%d'),
+        'time': conflict.slot.start_at.strftime('%H:%M'),
+        'tutor_id': int(conflict.slot.tutor_id),
+        'student_id': int(conflict.slot.student_id),
+        'role': conflict.role,
+        'with': {
+            'id': getattr(conflict.lesson, 'id', None),  # None — занятие серии или той же пачки
+            'key': conflict.lesson.key,
+            'date': conflict.lesson.start_at.strftime('%Y-%m-%d'),
+            'start': conflict.lesson.start_at.strftime('%H:%M'),
+            'end': conflict.lesson.end_at.strftime('%H:%M'),
+            'tutor_id': int(conflict.lesson.tutor_id),
+            'student_id': int(conflict.lesson.student_id),
+        },
+    } for conflict in conflicts]
+
+def conflicts_response(conflicts):
+    return jsonify({'success': False, 'error': describe_conflicts(conflicts), 'conflicts': serialize_conflicts(conflicts)})
+
+# Правило повторения для проверки серий: серия (end_date=None — без окончания) или записанное занятие
+# (start_date == end_date). skip — даты без занятия (отменённые или записанные в schedule отдельно);
+# lesson — Schedule, LessonSeries или None у новой серии
+LessonRule = namedtuple(
+    'LessonRule', 'tutor_id student_id subject_id start_date end_date interval_weeks time duration skip lesson'
+)
+
+def schedule_rule(schedule):
+    return LessonRule(
+        int(schedule.tutor_id), int(schedule.student_id), int(schedule.subject_id), schedule.date, schedule.date, 1,
+        schedule.time, schedule.duration_minutes or 60, frozenset(), schedule
+    )
+
+def series_rule(series, skip=frozenset()):
+    return LessonRule(
+        int(series.tutor_id), int(series.student_id), int(series.subject_id), series.start_date, series.end_date,
+        series.interval_weeks or 1, series.time, series.duration_minutes or 60, skip, series
+    )
+
+def rule_dates(rule, date_to=None):
+    """Даты занятий правила (без skip) до date_to; у серии без окончания date_to обязателен"""
+    last = min(rule.end_date, date_to) if rule.end_date and date_to else rule.end_date or date_to
+    return [
+        day for day in series_occurrence_dates(rule.start_date, rule.end_date, rule.interval_weeks, rule.start_date, last)
+        if day not in rule.skip
+    ]
+
+def aligned_rule_dates(rule, other, shift):
+    """Даты d, когда rule проходит в d, а other — в d + shift дней, без учёта skip"""
+    other_end = other.end_date - timedelta(days=shift) if other.end_date else None
+    return common_series_dates(
+        rule.start_date, rule.end_date, rule.interval_weeks,
+        other.start_date - timedelta(days=shift), other_end, other.interval_weeks
+    )
+
+def common_rule_dates(rule, other, shift):
+    """То же, что aligned_rule_dates, но без дат, в которые у одного из правил занятия нет"""
+    for day in aligned_rule_dates(rule, other, shift):
+        if day not in rule.skip and day + timedelta(days=shift) not in other.skip:
+            yield day
+
+def clashing_shifts(rule, other):
+    """Сдвиги в днях (занятие other накануне, в тот же день, назавтра), при которых занятия пересекаются по времени"""
+    start = rule.time.hour * 60 + rule.time.minute
+    other_start = other.time.hour * 60 + other.time.minute
+    return [
+        shift for shift in (-1, 0, 1)
+        if start < other_start + shift * 1440 + other.duration and other_start + shift * 1440 < start + rule.duration
+    ]
+
+def rule_slot(rule, day):
+    return LessonSlot(rule.tutor_id, rule.student_id, rule.subject_id, *schedule_time_bounds(day, rule.time, rule.duration))
+
+def rule_lesson(rule, day):
+    """Занятие правила в дату day для описания пересечения"""
+    if isinstance(rule.lesson, LessonSeries):
+        return SeriesOccurrence(rule.lesson, day)
+    return rule.lesson if rule.lesson is not None else rule_slot(rule, day)
+
+def load_lesson_rules(rules, ignore_series_ids=(), ignore_keys=()):
+    """Записанные занятия и серии репетиторов и учеников из rules, которые могут совпасть с ними по датам.
+    
+    Три запроса: занятия, серии и их отменённые и записанные даты. Серии без окончания ничем не
+    ограничиваются — дальше они сравниваются по правилам, а не по развёрнутым датам.
+    """
+    tutor_ids = sorted({rule.tutor_id for rule in rules})
+    student_ids = sorted({rule.student_id for rule in rules})
+    date_from = min(rule.start_date for rule in rules) - timedelta(days=1)
+    ends = [rule.end_date for rule in rules]
+    date_to = None if None in ends else max(ends) + timedelta(days=1)
+    
+    rows = Schedule.query.filter(
+        or_(Schedule.tutor_id.in_(tutor_ids), Schedule.student_id.in_(student_ids)), Schedule.date >= date_from
+    )
+    series_query = LessonSeries.query.options(
+        joinedload(LessonSeries.subject), joinedload(LessonSeries.tutor), joinedload(LessonSeries.student)
+    ).filter(
+        or_(LessonSeries.tutor_id.in_(tutor_ids), LessonSeries.student_id.in_(student_ids)),
+        or_(LessonSeries.end_date.is_(None), LessonSeries.end_date >= date_from),
+        LessonSeries.id.notin_(list(ignore_series_ids)),
+    )
+    if date_to is not None:
+        rows = rows.filter(Schedule.date <= date_to)
+        series_query = series_query.filter(LessonSeries.start_date <= date_to)
+    existing = [schedule_rule(row) for row in rows.all() if row.key not in ignore_keys]
+    
+    series_list = series_query.order_by(LessonSeries.id).all()
+    if series_list:
+        skip = series_skip_dates([series.id for series in series_list])
+        existing += [series_rule(series, skip.get(series.id, frozenset())) for series in series_list]
+    return existing
+
+def series_skip_dates(series_ids):
+    """Отменённые и записанные в schedule даты серий одним запросом: {series_id: frozenset(дат)}"""
+    skip = {}
+    for series_id, occurrence_date in db.session.query(
+        LessonSeriesException.series_id, LessonSeriesException.occurrence_date
+    ).filter(LessonSeriesException.series_id.in_(series_ids)).union_all(
+        db.session.query(Schedule.series_id, Schedule.occurrence_date).filter(Schedule.series_id.in_(series_ids))
+    ):
+        skip.setdefault(series_id, set()).add(occurrence_date)
+    return {series_id: frozenset(dates) for series_id, dates in skip.items()}
+
+def skip_existing_lessons(rule, existing):
+    """Даты новой серии, в которые у той же пары уже есть занятие с тем же началом, пропускаются (как в
+    create_recurring_lessons): отдельные даты — исключениями, совпадающий бесконечный хвост — датой окончания.
+    Возвращает изменённое правило; бесконечный хвост, который не выразить датой окончания, остаётся пересечением"""
+    for other in existing:
+        if (other.tutor_id, other.student_id, other.time) != (rule.tutor_id, rule.student_id, rule.time):
+            continue
+        if rule.end_date is None and other.end_date is None:
+            if lcm(rule.interval_weeks, other.interval_weeks) != rule.interval_weeks:
+                continue
+            first = next(aligned_rule_dates(rule, other, 0), None)
+            if first is None:
+                continue
+            # Хвост с first совпадает целиком, кроме отменённых дат other — их новая серия сохраняет
+            step = timedelta(weeks=rule.interval_weeks)
+            cancelled = [day for day in other.skip if day >= first and (day - first) % step == timedelta(0)]
+            cut = max(cancelled) + step if cancelled else first
+            rule = rule._replace(
+                end_date=cut - timedelta(days=1),
+                skip=rule.skip | {day for day in rule_dates(rule, cut - timedelta(days=1)) if day >= first} - set(other.skip),
+            )
+        else:
+            rule = rule._replace(skip=rule.skip | set(common_rule_dates(rule, other, 0)))
+    
+    # Пропущенные первые занятия — просто более позднее начало серии, без исключений
+    start = rule.start_date
+    while start in rule.skip and (rule.end_date is None or start <= rule.end_date):
+        start += timedelta(weeks=rule.interval_weeks)
+    return rule._replace(start_date=start, skip=frozenset(day for day in rule.skip if day > start))
+
+def find_series_conflicts(rules, existing, limit=None):
+    """Пересечения новых серий rules с правилами existing и между собой — по правилам, а не по развёрнутым
+    датам, поэтому серии без окончания проверяются целиком. Для каждой пары правил в ответ попадают
+    не больше limit дат. Групповые занятия — как в find_lesson_conflicts. Возвращает список LessonConflict"""
+    limit = limit or MAX_RECURRING_WEEKS
+    conflicts = []
+    for index, rule in enumerate(rules):
+        for other in existing + rules[:index]:
+            roles = [
+                role for role, person_id, other_id in (
+                    ('tutor', rule.tutor_id, other.tutor_id), ('student', rule.student_id, other.student_id)
+                )
+                if person_id == other_id
+            ]
+            if not roles:
+                continue
+            for shift in clashing_shifts(rule, other):
+                for day in islice(common_rule_dates(rule, other, shift), limit):
+                    slot = rule_slot(rule, day)
+                    lesson = rule_lesson(other, day + timedelta(days=shift))
+                    for role in roles:
+                        if role == 'tutor' and is_group_lesson(slot, lesson):
+                            continue
+                        conflicts.append(LessonConflict(slot, role, lesson))
+    return sorted(conflicts, key=lambda conflict: (conflict.slot.start_at, conflict.role != 'tutor'))
 
 class Reminder(db.Model):
     __tablename__ = 'reminder'
@@ -127,6 +610,12 @@ class Reminder(db.Model):
     sent = db.Column(db.Boolean, default=False)
     sent_at = db.Column(db.DateTime)
     last_sent = db.Column(db.DateTime)
+    lesson_start = db.Column(db.DateTime)  # Время занятия, для которого бот отправил напоминание
+    claim_token = db.Column(db.String(32), index=True)
+    claimed_at = db.Column(db.DateTime)
+    tutor_status = db.Column(db.String(20))  # sent / failed / skipped
+    student_status = db.Column(db.String(20))
+    parent_status = db.Column(db.String(20))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class Subject(db.Model):
@@ -135,6 +624,65 @@ class Subject(db.Model):
     name = db.Column(db.String(100), nullable=False, unique=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class ScheduleVersion(db.Model):
+    """Номер версии расписания месяца ('2026-10') или всех месяцев сразу ('all') для ETag /get_month_schedule"""
+    __tablename__ = 'schedule_version'
+    scope = db.Column(db.String(7), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+# Изменения пользователей, предметов и серий видны во всех месяцах
+SCHEDULE_VERSION_ALL = 'all'
+
+def schedule_month_scope(day):
+    return day.strftime('%Y-%m')
+
+def bump_schedule_versions(connection, scopes):
+    """Увеличить версии в той же транзакции, что и изменение расписания"""
+    table = ScheduleVersion.__table__
+    rows = [{'scope': scope, 'version': 1} for scope in sorted(scopes)]
+    if connection.dialect.name == 'mysql':
+        statement = mysql_insert(table).values(rows).on_duplicate_key_update(version=table.c.version + 1)
+    else:
+        statement = sqlite_insert(table).values(rows).on_conflict_do_update(
+            index_elements=[table.c.scope], set_={'version': table.c.version + 1}
+        )
+    connection.execute(statement)
+
+@db.event.listens_for(Session, 'before_flush')
+def track_schedule_versions(session, flush_context, instances):
+    """Изменения занятий увеличивают версию их месяцев (старого и нового), пользователей, предметов и серий — общую"""
+    scopes = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (TelegramID, Subject, LessonSeries, LessonSeriesException)):
+            if obj in session.dirty and not session.is_modified(obj):
+                continue
+            scopes.add(SCHEDULE_VERSION_ALL)
+        elif isinstance(obj, Schedule):
+            if obj in session.dirty and not session.is_modified(obj):
+                continue
+            history = sa_inspect(obj).attrs.date.history
+            for day in [obj.date, *history.deleted]:
+                if day is not None:
+                    scopes.add(schedule_month_scope(day))
+    if scopes:
+        bump_schedule_versions(session.connection(), scopes)
+
+@db.event.listens_for(Session, 'do_orm_execute')
+def track_bulk_schedule_versions(orm_execute_state):
+    """Массовые INSERT занятий увеличивают версии своих месяцев; массовые UPDATE/DELETE
+    не знают затронутых месяцев — увеличиваем общую версию"""
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ not in (Schedule, TelegramID, Subject, LessonSeries, LessonSeriesException):
+        return
+    rows = orm_execute_state.parameters
+    if orm_execute_state.is_insert and mapper.class_ is Schedule and isinstance(rows, list) and rows:
+        scopes = {schedule_month_scope(row['date']) for row in rows}
+    else:
+        scopes = {SCHEDULE_VERSION_ALL}
+    bump_schedule_versions(orm_execute_state.session.connection(), scopes)
+
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
@@ -172,25 +720,22 @@ def admin_users():
 @login_required
 def admin_pairs():
     telegram_ids = TelegramID.query.all()
-    # Получаем пары с данными репетиторов и учеников
+    # Получаем пары с данными репетиторов и учеников одним запросом
+    tutor = aliased(TelegramID)
+    student = aliased(TelegramID)
     pairs = db.session.query(
-        Pair,
-        TelegramID.description.label('tutor_name'),
-        TelegramID.telegram_id.label('tutor_telegram')
+        Pair.id,
+        tutor.description.label('tutor_name'),
+        tutor.telegram_id.label('tutor_telegram'),
+        db.func.coalesce(student.description, 'Неизвестно').label('student_name'),
+        db.func.coalesce(student.telegram_id, 'Неизвестно').label('student_telegram')
     ).join(
-        TelegramID, Pair.tutor_id == TelegramID.id
-    ).all()
+        tutor, Pair.tutor_id == tutor.id
+    ).outerjoin(
+        student, Pair.student_id == student.id
+    ).order_by(Pair.id).all()
     
-    # Дополнительно получаем данные учеников для каждой пары
-    for pair_data in pairs:
-        pair, tutor_name, tutor_telegram = pair_data
-        student = TelegramID.query.get(pair.student_id)
-        pair.student_name = student.description if student else 'Неизвестно'
-        pair.student_telegram = student.telegram_id if student else 'Неизвестно'
-        pair.tutor_name = tutor_name
-        pair.tutor_telegram = tutor_telegram
-    
-    return render_template('pairs.html', telegram_ids=telegram_ids, pairs=[p[0] for p in pairs])
+    return render_template('pairs.html', telegram_ids=telegram_ids, pairs=pairs)
 
 @app.route('/admin/schedule')
 @login_required
@@ -384,23 +929,29 @@ def edit_telegram_id(id):
 @app.route('/delete_telegram_id/<int:id>')
 @login_required
 def delete_telegram_id(id):
-    telegram_id = TelegramID.query.get_or_404(id)
+    TelegramID.query.get_or_404(id)
     
     # Сначала удаляем все связанные записи из расписания
-    Schedule.query.filter(
+    schedules_count = Schedule.query.filter(
         (Schedule.tutor_id == id) | (Schedule.student_id == id)
-    ).delete()
+    ).delete(synchronize_session=False)
+    
+    # Серии занятий пользователя (отменённые даты удаляются каскадом в БД)
+    LessonSeries.query.filter(
+        (LessonSeries.tutor_id == id) | (LessonSeries.student_id == id)
+    ).delete(synchronize_session=False)
     
     # Удаляем все пары, где этот пользователь участвует
-    Pair.query.filter(
+    pairs_count = Pair.query.filter(
         (Pair.tutor_id == id) | (Pair.student_id == id)
-    ).delete()
+    ).delete(synchronize_session=False)
     
-    # Теперь можно безопасно удалить самого пользователя
-    db.session.delete(telegram_id)
+    # Теперь можно безопасно удалить самого пользователя. Тоже массовым DELETE: удаление объекта
+    # через ORM подгружало бы его занятия и пары по обратным связям
+    TelegramID.query.filter_by(id=id).delete(synchronize_session=False)
     db.session.commit()
     
-    flash('Пользователь и все связанные записи успешно удалены')
+    flash(f'Пользователь удалён вместе с {pairs_count} парами и {schedules_count} записями в расписании')
     return redirect(url_for('admin_users'))
 
 @app.route('/add_pair', methods=['POST'])
@@ -429,20 +980,18 @@ def add_pair():
 def delete_pair(id):
     pair = Pair.query.get_or_404(id)
     
-    # Удаляем все записи из расписания для этой пары
-    schedules_to_delete = Schedule.query.filter_by(
+    # Удаляем все записи из расписания для этой пары и саму пару — массовыми DELETE в одной транзакции
+    schedules_count = Schedule.query.filter_by(
         tutor_id=pair.tutor_id,
         student_id=pair.student_id
-    ).all()
-    
-    for schedule in schedules_to_delete:
-        db.session.delete(schedule)
-    
-    # Удаляем саму пару
-    db.session.delete(pair)
+    ).delete(synchronize_session=False)
+    LessonSeries.query.filter_by(
+        tutor_id=pair.tutor_id,
+        student_id=pair.student_id
+    ).delete(synchronize_session=False)
+    Pair.query.filter_by(id=id).delete(synchronize_session=False)
     db.session.commit()
     
-    schedules_count = len(schedules_to_delete)
     if schedules_count > 0:
         flash(f'Пара успешно удалена вместе с {schedules_count} записями в расписании')
     else:
@@ -450,9 +999,193 @@ def delete_pair(id):
     
     return redirect(url_for('admin_pairs'))
 
+MAX_RECURRING_WEEKS = 52
+
+def recurring_lesson_dates(start_date, weeks, weekdays=None):
+    """Даты занятий на weeks недель начиная с start_date: по дню недели start_date или по weekdays (0 — понедельник)"""
+    weekdays = sorted(set(weekdays)) if weekdays else [start_date.weekday()]
+    dates = []
+    for weekday in weekdays:
+        first_date = start_date + timedelta(days=(weekday - start_date.weekday()) % 7)
+        dates.extend(first_date + timedelta(weeks=week) for week in range(weeks))
+    return sorted(day for day in dates if day < start_date + timedelta(weeks=weeks))
+
+def create_recurring_lessons(pairs, lesson_dates, lesson_time, subject_id, lesson_type, duration):
+    """Создать занятия для всех пар (tutor_id, student_id) на все даты, пропуская уже существующие.
+    
+    Все занятия пачки проверяются на пересечения одним вызовом find_lesson_conflicts: занятие той же
+    пары в то же время считается уже существующим и пропускается, любое другое пересечение отменяет
+    всю пачку. Недостающие занятия вставляются одним массовым INSERT.
+    Возвращает (создано, пропущено, пересечения); commit — за вызывающим.
+    """
+    targets = {(tutor_id, student_id, lesson_date) for tutor_id, student_id in pairs for lesson_date in lesson_dates}
+    if not targets:
+        return 0, 0, []
+    
+    slots = {
+        (tutor_id, student_id, lesson_date): LessonSlot(
+            tutor_id, student_id, subject_id, *schedule_time_bounds(lesson_date, lesson_time, duration)
+        )
+        for tutor_id, student_id, lesson_date in targets
+    }
+    conflicts = find_lesson_conflicts(list(slots.values()))
+    existing = {
+        (conflict.slot.tutor_id, conflict.slot.student_id, conflict.slot.start_at.date())
+        for conflict in conflicts
+        if (conflict.lesson.tutor_id, conflict.lesson.student_id, conflict.lesson.start_at)
+        == (conflict.slot.tutor_id, conflict.slot.student_id, conflict.slot.start_at)
+    }
+    conflicts = [
+        conflict for conflict in conflicts
+        if (conflict.slot.tutor_id, conflict.slot.student_id, conflict.slot.start_at.date()) not in existing
+    ]
+    if conflicts:
+        return 0, 0, conflicts
+    
+    rows = []
+    for tutor_id, student_id, lesson_date in sorted(targets - existing):
+        # Массовый INSERT не вызывает before_insert, поэтому start_at/end_at считаем здесь
+        start_at, end_at = slots[(tutor_id, student_id, lesson_date)][3:5]
+        rows.append({
+            'tutor_id': tutor_id,
+            'student_id': student_id,
+            'date': lesson_date,
+            'time': lesson_time,
+            'subject_id': subject_id,
+            'lesson_type': lesson_type,
+            'duration_minutes': duration,
+            'start_at': start_at,
+            'end_at': end_at,
+        })
+    if rows:
+        db.session.execute(db.insert(Schedule), rows)
+    return len(rows), len(targets) - len(rows), []
+
+def lesson_series_rules(pairs, start_date, weeks, weekdays, lesson_time, subject_id, duration):
+    """Правила новых серий для всех пар (tutor_id, student_id): по одному на день недели.
+    
+    Даты те же, что у recurring_lesson_dates, но хранится только правило; weeks=None — серия без
+    даты окончания.
+    """
+    end_date = start_date + timedelta(weeks=weeks, days=-1) if weeks else None
+    return [
+        LessonRule(
+            int(tutor_id), int(student_id), int(subject_id), first_series_date(start_date, weekday), end_date, 1,
+            lesson_time, duration, frozenset(), None
+        )
+        for tutor_id, student_id in sorted(pairs)
+        for weekday in sorted(set(weekdays or [start_date.weekday()]))
+    ]
+
+def series_count_window(rule):
+    """До какой даты считать занятия серии в ответе: серию без окончания — на SERIES_HORIZON_DAYS"""
+    return rule.end_date or rule.start_date + timedelta(days=SERIES_HORIZON_DAYS)
+
+def create_lesson_series(rules, lesson_type):
+    """Записать серии по правилам; даты из skip становятся исключениями. Возвращает серии; commit — за вызывающим"""
+    series_list = [
+        LessonSeries(
+            tutor_id=rule.tutor_id,
+            student_id=rule.student_id,
+            subject_id=rule.subject_id,
+            weekday=rule.start_date.weekday(),
+            interval_weeks=rule.interval_weeks,
+            time=rule.time,
+            duration_minutes=rule.duration,
+            lesson_type=lesson_type,
+            start_date=rule.start_date,
+            end_date=rule.end_date,
+        )
+        for rule in rules
+    ]
+    db.session.add_all(series_list)
+    db.session.flush()
+    db.session.add_all([
+        LessonSeriesException(series_id=series.id, occurrence_date=occurrence_date)
+        for series, rule in zip(series_list, rules)
+        for occurrence_date in sorted(rule.skip)
+        if rule.start_date <= occurrence_date and (rule.end_date is None or occurrence_date <= rule.end_date)
+    ])
+    return series_list
+
+def end_series_before(series, occurrence_date):
+    """Закончить серию перед occurrence_date; серия, в которой не остаётся занятий, удаляется"""
+    if occurrence_date <= series.start_date:
+        db.session.delete(series)
+        return
+    series.end_date = occurrence_date - timedelta(days=1)
+    LessonSeriesException.query.filter(
+        LessonSeriesException.series_id == series.id,
+        LessonSeriesException.occurrence_date >= occurrence_date
+    ).delete(synchronize_session=False)
+
+def split_series(series, occurrence_date, **changes):
+    """Разделить серию: с occurrence_date действует новая серия с изменениями changes.
+    
+    Отменённые даты и записанные в schedule занятия начиная с occurrence_date переходят к новой серии.
+    """
+    new_series = LessonSeries(
+        tutor_id=series.tutor_id,
+        student_id=series.student_id,
+        subject_id=series.subject_id,
+        weekday=series.weekday,
+        interval_weeks=series.interval_weeks,
+        time=series.time,
+        duration_minutes=series.duration_minutes,
+        lesson_type=series.lesson_type,
+        start_date=occurrence_date,
+        end_date=series.end_date,
+    )
+    for name, value in changes.items():
+        setattr(new_series, name, value)
+    db.session.add(new_series)
+    db.session.flush()
+    
+    LessonSeriesException.query.filter(
+        LessonSeriesException.series_id == series.id,
+        LessonSeriesException.occurrence_date >= occurrence_date
+    ).update({LessonSeriesException.series_id: new_series.id}, synchronize_session=False)
+    Schedule.query.filter(
+        Schedule.series_id == series.id,
+        Schedule.occurrence_date >= occurrence_date
+    ).update({Schedule.series_id: new_series.id}, synchronize_session=False)
+    end_series_before(series, occurrence_date)
+    return new_series
+
+def materialize_occurrence(series, occurrence_date):
+    """Строка schedule для занятия серии: создаётся, когда к занятию привязывается изменение или удаление.
+    commit — за вызывающим"""
+    schedule = Schedule.query.filter_by(series_id=series.id, occurrence_date=occurrence_date).first()
+    if schedule:
+        return schedule
+    schedule = Schedule(
+        tutor_id=series.tutor_id,
+        student_id=series.student_id,
+        subject_id=series.subject_id,
+        date=occurrence_date,
+        time=series.time,
+        lesson_type=series.lesson_type,
+        duration_minutes=series.duration_minutes,
+        series_id=series.id,
+        occurrence_date=occurrence_date,
+    )
+    db.session.add(schedule)
+    db.session.flush()
+    return schedule
+
 @app.route('/add_schedule', methods=['POST'])
 @login_required
 def add_schedule():
+    """Добавить занятие или серию занятий.
+    
+    Кроме одной пары (tutor_id, student_id) можно передать несколько полей pairs вида
+    "tutor_id:student_id", а кроме дня недели первой даты — несколько полей weekdays (0 — понедельник).
+    repeat_count — на сколько недель вперёд повторять занятия, open_ended=true — повторять без даты
+    окончания. Повторяющиеся занятия хранятся сериями (правило повторения на пару и день недели);
+    as_rows=true — запасной путь: записать строку schedule на каждую неделю, как раньше.
+    В обоих случаях уже существующие занятия той же пары в то же время пропускаются, а в ответе —
+    created и skipped (у серии без окончания занятия считаются на SERIES_HORIZON_DAYS вперёд).
+    """
     tutor_id = request.form.get('tutor_id')
     student_id = request.form.get('student_id')
     date = request.form.get('date')
@@ -461,15 +1194,29 @@ def add_schedule():
     repeat_count = request.form.get('repeat_count')
     lesson_type = request.form.get('lesson_type', 'regular')  # Получаем тип занятия
     is_trial = request.form.get('is_trial') == 'true'  # Чекбокс пробного занятия
+    pair_values = request.form.getlist('pairs')
+    open_ended = request.form.get('open_ended') == 'true'
+    as_rows = request.form.get('as_rows') == 'true'
     
-    if not all([tutor_id, student_id, date, time, subject_id]):
+    if not all([tutor_id or pair_values, student_id or pair_values, date, time, subject_id]):
         return jsonify({'success': False, 'error': 'Пожалуйста, заполните все поля'})
     
     try:
-        # Проверяем, существуют ли пользователи
-        tutor = TelegramID.query.get(tutor_id)
-        student = TelegramID.query.get(student_id)
-        if not tutor or not student:
+        try:
+            if pair_values:
+                pairs = {tuple(int(part) for part in value.split(':')) for value in pair_values}
+            else:
+                pairs = {(int(tutor_id), int(student_id))}
+            weekdays = [int(value) for value in request.form.getlist('weekdays')]
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Неверные пары или дни недели'})
+        if any(len(pair) != 2 for pair in pairs) or any(not 0 <= weekday <= 6 for weekday in weekdays):
+            return jsonify({'success': False, 'error': 'Неверные пары или дни недели'})
+        
+        # Проверяем, существуют ли пользователи (одним запросом для всех пар)
+        user_ids = {user_id for pair in pairs for user_id in pair}
+        found_ids = {row.id for row in db.session.query(TelegramID.id).filter(TelegramID.id.in_(user_ids))}
+        if found_ids != user_ids:
             return jsonify({'success': False, 'error': 'Репетитор или ученик не найдены'})
         
         # Преобразуем строку даты в объект date
@@ -485,49 +1232,57 @@ def add_schedule():
         if repeat_count and repeat_count.strip():
             try:
                 weeks_to_repeat = int(repeat_count)
-                weeks_to_repeat = max(1, min(weeks_to_repeat, 52))  # Ограничиваем от 1 до 52 недель
+                weeks_to_repeat = max(1, min(weeks_to_repeat, MAX_RECURRING_WEEKS))  # Ограничиваем от 1 до 52 недель
             except ValueError:
                 weeks_to_repeat = 1
         
-        created_count = 0
-        skipped_count = 0
-        
-        # Создаем занятия на указанное количество недель
-        for week in range(weeks_to_repeat):
-            current_date = lesson_date + timedelta(weeks=week)
+        if (open_ended or weeks_to_repeat > 1) and not as_rows:
+            # Одна строка lesson_series на пару и день недели вместо занятия на каждую неделю
+            rules = lesson_series_rules(
+                pairs, lesson_date, None if open_ended else weeks_to_repeat, weekdays, lesson_time, int(subject_id), duration
+            )
+            existing = load_lesson_rules(rules)
+            # Как в create_recurring_lessons: занятие той же пары в то же время уже есть — пропускается
+            planned = [skip_existing_lessons(rule, existing) for rule in rules]
+            conflicts = find_series_conflicts(planned, existing)
+            if conflicts:
+                return conflicts_response(conflicts)
             
-            # Проверяем, нет ли уже занятия в это время
-            existing_schedule = Schedule.query.filter_by(
-                tutor_id=tutor_id,
-                student_id=student_id,
-                date=current_date,
-                time=lesson_time
-            ).first()
+            total_count = sum(len(rule_dates(rule, series_count_window(rule))) for rule in rules)
+            created_count = sum(len(rule_dates(rule, series_count_window(original))) for rule, original in zip(planned, rules))
+            # Серия, все занятия которой уже есть, не создаётся
+            planned = [rule for rule in planned if rule.end_date is None or rule_dates(rule)]
+            series_list = create_lesson_series(planned, final_lesson_type)
+            db.session.commit()
             
-            if not existing_schedule:
-                new_schedule = Schedule(
-                    tutor_id=tutor_id,
-                    student_id=student_id,
-                    date=current_date,
-                    time=lesson_time,
-                    subject_id=subject_id,
-                    lesson_type=final_lesson_type,
-                    duration_minutes=duration
-                )
-                db.session.add(new_schedule)
-                created_count += 1
-            else:
-                skipped_count += 1
+            skipped_count = total_count - created_count
+            message = f'Создано серий занятий: {len(series_list)}'
+            if skipped_count > 0:
+                message += f' (пропущено {skipped_count} занятий - уже существуют)'
+            return jsonify({
+                'success': True,
+                'series_created': len(series_list),
+                'created': created_count,
+                'skipped': skipped_count,
+                'message': message
+            })
         
+        # Разовое занятие (или as_rows): строки schedule на указанное количество недель
+        lesson_dates = recurring_lesson_dates(lesson_date, weeks_to_repeat, weekdays)
+        created_count, skipped_count, conflicts = create_recurring_lessons(
+            pairs, lesson_dates, lesson_time, int(subject_id), final_lesson_type, duration
+        )
+        if conflicts:
+            return conflicts_response(conflicts)
         db.session.commit()
         
-        if weeks_to_repeat > 1:
+        result = {'success': True, 'created': created_count, 'skipped': skipped_count}
+        if created_count + skipped_count > 1:
             message = f'Создано {created_count} занятий'
             if skipped_count > 0:
                 message += f' (пропущено {skipped_count} - уже существуют)'
-            return jsonify({'success': True, 'message': message})
-        else:
-            return jsonify({'success': True})
+            result['message'] = message
+        return jsonify(result)
             
     except Exception as e:
         db.session.rollback()
@@ -548,22 +1303,19 @@ def edit_schedule(id):
     try:
         lesson_date = datetime.strptime(date, '%Y-%m-%d').date()
         
-        # Проверяем, нет ли уже занятия в это время
-        existing_schedule = Schedule.query.filter(
-            Schedule.tutor_id == schedule.tutor_id,
-            Schedule.student_id == schedule.student_id,
-            Schedule.date == lesson_date,
-            Schedule.time == datetime.strptime(time, '%H:%M').time(),
-            Schedule.id != schedule.id
-        ).first()
-        
-        if existing_schedule:
-            return jsonify({'success': False, 'error': 'Занятие в это время уже существует'})
-        
         # Обновляем тип занятия и продолжительность
         final_lesson_type = 'trial' if is_trial else 'regular'
         duration = 30 if final_lesson_type == 'trial' else 60
         
+        # Проверяем, не пересекается ли занятие с другими занятиями репетитора и ученика
+        conflicts = find_lesson_conflicts([LessonSlot(
+            schedule.tutor_id, schedule.student_id, subject_id,
+            *schedule_time_bounds(lesson_date, datetime.strptime(time, '%H:%M').time(), duration),
+            key=schedule.key
+        )])
+        if conflicts:
+            return conflicts_response(conflicts)
+        
         schedule.date = lesson_date
         schedule.time = datetime.strptime(time, '%H:%M').time()
         schedule.subject_id = subject_id
@@ -597,44 +1349,60 @@ def update_schedule(id):
         lesson_date = datetime.strptime(date, '%Y-%m-%d').date()
         new_time = datetime.strptime(time_str, '%H:%M').time()
         
-        # Массовое изменение только времени/предмета для всех будущих занятий в этот день недели
+        # Массовое изменение только времени/предмета для всех будущих занятий в этот день недели:
+        # один UPDATE, день недели проверяется в SQL
         if apply_to == 'future_same_weekday':
-            base_date = schedule.date
-            base_weekday = base_date.weekday()
-            base_tutor_id = schedule.tutor_id
-            base_student_id = schedule.student_id
+            series_id, occurrence_date = schedule.series_id, schedule.occurrence_date
+            series = db.session.get(LessonSeries, series_id) if series_id else None
             
-            # Находим все будущие занятия этой пары, начиная с текущей даты
-            future_schedules = Schedule.query.filter(
-                Schedule.tutor_id == base_tutor_id,
-                Schedule.student_id == base_student_id,
-                Schedule.date >= base_date
+            # Все переносимые записанные занятия проверяются одной пачкой, незаписанные занятия серии —
+            # правилом новой серии (для серии без окончания — целиком)
+            moved = future_same_weekday_query(schedule).with_entities(
+                Schedule.id, Schedule.tutor_id, Schedule.student_id, Schedule.date, Schedule.duration_minutes
             ).all()
+            slots = [
+                LessonSlot(
+                    row.tutor_id, row.student_id, subject_id,
+                    *schedule_time_bounds(row.date, new_time, row.duration_minutes), key=str(row.id)
+                )
+                for row in moved
+            ]
+            conflicts = find_lesson_conflicts(slots)
+            if series and not conflicts:
+                rule = series_rule(series, series_skip_dates([series.id]).get(series.id, frozenset()))._replace(
+                    start_date=occurrence_date, time=new_time, subject_id=int(subject_id), lesson=None
+                )
+                existing = load_lesson_rules([rule], ignore_series_ids={series.id}, ignore_keys={slot.key for slot in slots})
+                conflicts = find_series_conflicts([rule], existing)
+            if conflicts:
+                return conflicts_response(conflicts)
+            
+            updated_count = future_same_weekday_query(schedule).update({
+                Schedule.subject_id: subject_id,
+                Schedule.time: new_time,
+                **schedule_bounds_values(Schedule.date, new_time, Schedule.duration_minutes),
+            }, synchronize_session=False)
             
-            updated_count = 0
-            for s in future_schedules:
-                if s.date.weekday() == base_weekday:
-                    s.subject_id = subject_id
-                    s.time = new_time
-                    updated_count += 1
+            # Занятие из серии: незаписанные занятия меняет новая серия с этой даты
+            if series:
+                split_series(series, occurrence_date, time=new_time, subject_id=int(subject_id))
             
             db.session.commit()
             return jsonify({
                 'success': True,
+                'updated': updated_count,
                 'message': f'Обновлено занятий: {updated_count}'
             })
         
         # Обычное редактирование только одного занятия
-        # Проверяем, нет ли конфликта с другим занятием (кроме текущего)
-        existing_schedule = Schedule.query.filter(
-            Schedule.id != id,
-            Schedule.tutor_id == tutor_id,
-            Schedule.date == lesson_date,
-            Schedule.time == new_time
-        ).first()
-        
-        if existing_schedule:
-            return jsonify({'success': False, 'error': 'У репетитора уже есть занятие в это время'})
+        # Проверяем, не пересекается ли оно с другими занятиями репетитора и ученика (кроме текущего)
+        conflicts = find_lesson_conflicts([LessonSlot(
+            tutor_id, student_id, subject_id,
+            *schedule_time_bounds(lesson_date, new_time, schedule.duration_minutes),
+            key=schedule.key
+        )])
+        if conflicts:
+            return conflicts_response(conflicts)
         
         # Обновляем занятие
         schedule.tutor_id = tutor_id
@@ -657,30 +1425,40 @@ def delete_schedule(id):
         schedule = Schedule.query.get_or_404(id)
         apply_to = request.args.get('apply_to', 'single')  # single | future_same_weekday
 
-        if apply_to == 'future_same_weekday':
-            base_date = schedule.date
-            base_weekday = base_date.weekday()
-            base_tutor_id = schedule.tutor_id
-            base_student_id = schedule.student_id
-            base_subject_id = schedule.subject_id
-
-            # Находим все будущие занятия этой пары и предмета начиная с текущей даты
-            future_schedules = Schedule.query.filter(
-                Schedule.tutor_id == base_tutor_id,
-                Schedule.student_id == base_student_id,
-                Schedule.subject_id == base_subject_id,
-                Schedule.date >= base_date
-            ).all()
+        series = db.session.get(LessonSeries, schedule.series_id) if schedule.series_id else None
 
-            deleted_count = 0
-            for s in future_schedules:
-                if s.date.weekday() == base_weekday:
-                    db.session.delete(s)
-                    deleted_count += 1
+        if apply_to == 'future_same_weekday':
+            # Все будущие занятия этой пары и предмета в тот же день недели — одним DELETE
+            # (напоминания и отчёты удаляются каскадом в БД)
+            result = {'success': True}
+            if series:
+                # Незаписанные занятия отрезаемого хвоста серии (у серии без окончания их не сосчитать — None)
+                skip = series_skip_dates([series.id]).get(series.id, frozenset())
+                result['series_occurrences_removed'] = None if series.end_date is None else len([
+                    day for day in series_occurrence_dates(
+                        series.start_date, series.end_date, series.interval_weeks, schedule.occurrence_date, series.end_date
+                    )
+                    if day not in skip
+                ])
+            deleted_count = future_same_weekday_query(
+                schedule, subject_id=schedule.subject_id
+            ).delete(synchronize_session=False)
+            if series:
+                # Серия заканчивается перед этим занятием, записанные занятия серии с этой даты удаляются
+                deleted_count += Schedule.query.filter(
+                    Schedule.series_id == series.id,
+                    Schedule.occurrence_date >= schedule.occurrence_date
+                ).delete(synchronize_session=False)
+                end_series_before(series, schedule.occurrence_date)
 
             db.session.commit()
-            return jsonify({'success': True, 'deleted': deleted_count})
+            # deleted — все удалённые занятия: записанные и (у серии с датой окончания) незаписанные
+            result['deleted'] = deleted_count + (result.get('series_occurrences_removed') or 0)
+            return jsonify(result)
         else:
+            if series:
+                # Без исключения занятие серии снова появилось бы при развёртывании
+                db.session.merge(LessonSeriesException(series_id=series.id, occurrence_date=schedule.occurrence_date))
             db.session.delete(schedule)
             db.session.commit()
             return jsonify({'success': True, 'deleted': 1})
@@ -688,6 +1466,79 @@ def delete_schedule(id):
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/materialize_occurrence', methods=['POST'])
+@login_required
+def materialize_occurrence_route():
+    """Записать занятие серии в schedule, чтобы изменить или удалить его по id"""
+    series = LessonSeries.query.get_or_404(request.form.get('series_id', type=int))
+    try:
+        occurrence_date = datetime.strptime(request.form.get('date', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Неверная дата'})
+    
+    cancelled = db.session.get(LessonSeriesException, (series.id, occurrence_date))
+    if cancelled or not series_occurrence_dates(
+        series.start_date, series.end_date, series.interval_weeks, occurrence_date, occurrence_date
+    ):
+        return jsonify({'success': False, 'error': 'В серии нет занятия в эту дату'})
+    
+    try:
+        schedule = materialize_occurrence(series, occurrence_date)
+        db.session.commit()
+    except IntegrityError:
+        # Занятие одновременно записал другой запрос
+        db.session.rollback()
+        schedule = Schedule.query.filter_by(series_id=series.id, occurrence_date=occurrence_date).one()
+    return jsonify({'success': True, 'id': schedule.id})
+
+def user_schedule_query(user):
+    """Занятия пользователя (как репетитора или ученика) с предметом, репетитором и учеником одним запросом"""
+    owner_column = Schedule.tutor_id if user.status == 'репетитор' else Schedule.student_id
+    return (
+        Schedule.query
+        .options(joinedload(Schedule.subject), joinedload(Schedule.tutor), joinedload(Schedule.student))
+        .filter(owner_column == user.id)
+    )
+
+def schedule_sort_key(schedule):
+    """Порядок занятий и курсора: (start_at, id), у незаписанных занятий серий id = -series_id"""
+    return schedule.start_at, schedule.sort_id
+
+def format_schedule_cursor(start_at, schedule_id):
+    """Курсор постраничной выборки: время начала и id занятия"""
+    return f"{start_at.strftime('%Y-%m-%dT%H:%M:%S')}_{schedule_id}"
+
+def parse_schedule_cursor(cursor):
+    start_at, _, schedule_id = cursor.partition('_')
+    return datetime.strptime(start_at, '%Y-%m-%dT%H:%M:%S'), int(schedule_id or 0)
+
+def serialize_user_schedules(user_schedules, user_timezone_str):
+    """Занятия для WebApp: время и дата в поясе пользователя"""
+    today = datetime.now().date()
+    
+    # Конвертируем время всех занятий в пользовательский часовой пояс за один вызов
+    user_datetimes = convert_times_to_user_timezone(
+        [datetime.combine(schedule.date, schedule.time) for schedule in user_schedules],
+        user_timezone_str
+    )
+    
+    schedules = []
+    for schedule, user_datetime in zip(user_schedules, user_datetimes):
+        schedules.append({
+            'id': schedule.id,  # None у незаписанного занятия серии
+            'key': schedule.key,
+            'start': schedule.start_at.strftime('%Y-%m-%dT%H:%M:%S'),  # Системное время, для догрузки
+            'subject': schedule.subject.name,
+            'time': user_datetime.strftime('%H:%M'),
+            'date': user_datetime.strftime('%d.%m.%Y'),
+            'tutor': schedule.tutor.description,
+            'student': schedule.student.description,
+            'is_past': schedule.date < today,  # Помечаем прошедшие занятия
+            'lesson_type': schedule.lesson_type if hasattr(schedule, 'lesson_type') else 'regular',  # Тип занятия
+            'duration_minutes': schedule.duration_minutes if hasattr(schedule, 'duration_minutes') else 60  # Продолжительность
+        })
+    return schedules
+
 @app.route('/schedule')
 def schedule():
     username = request.args.get('username')
@@ -701,40 +1552,118 @@ def schedule():
     # Получаем часовой пояс пользователя
     user_timezone_str = user.timezone if user.timezone else 'Europe/Saratov'
     
-    # Находим все расписания где пользователь является репетитором или учеником
-    if user.status == 'репетитор':
-        user_schedules = Schedule.query.filter_by(tutor_id=user.id).all()
+    # Сразу отдаём только окно вокруг сегодняшнего дня, более ранние и поздние занятия
+    # страница догружает через /api/schedule. Сортировка — в БД
+    today = datetime.combine(datetime.now().date(), datetime.min.time())
+    window_start = today - timedelta(days=SCHEDULE_WINDOW_PAST_DAYS)
+    window_end = today + timedelta(days=SCHEDULE_WINDOW_FUTURE_DAYS + 1)
+    user_schedules = (
+        user_schedule_query(user)
+        .filter(Schedule.start_at >= window_start, Schedule.start_at < window_end)
+        .order_by(Schedule.start_at, Schedule.id)
+        .all()
+    )
+    # Занятия серий разворачиваются только на окно
+    occurrences = expand_series(window_start.date(), (window_end - timedelta(days=1)).date(), series_for_user(user))
+    if occurrences:
+        user_schedules = sorted(user_schedules + occurrences, key=schedule_sort_key)
+    
+    schedules = serialize_user_schedules(user_schedules, user_timezone_str)
+    window = {
+        'start': window_start.strftime('%Y-%m-%dT%H:%M:%S'),
+        'end': window_end.strftime('%Y-%m-%dT%H:%M:%S'),
+        # (start_at, id) < (window_start, 0) — всё до окна, > (window_end, 0) — всё после
+        'before': format_schedule_cursor(window_start, 0),
+        'after': format_schedule_cursor(window_end, 0),
+    }
+    return render_template('schedule_view.html', schedules=schedules, user=user, user_timezone=user_timezone_str, window=window)
+
+@app.route('/api/schedule')
+def schedule_page():
+    """Страница занятий пользователя до или после курсора (keyset-пагинация по start_at, id)"""
+    username = request.args.get('username')
+    user = TelegramID.query.filter_by(telegram_id=username).first() if username else None
+    if not user:
+        return jsonify({'error': 'Пользователь не найден'}), 404
+    
+    direction = request.args.get('direction', 'after')
+    if direction not in ('before', 'after'):
+        return jsonify({'error': 'direction должен быть before или after'}), 400
+    try:
+        cursor_start, cursor_id = parse_schedule_cursor(request.args['cursor'])
+        limit = min(max(int(request.args.get('limit', SCHEDULE_PAGE_SIZE)), 1), SCHEDULE_MAX_PAGE_SIZE)
+    except (KeyError, ValueError):
+        return jsonify({'error': 'Неверный курсор или limit'}), 400
+    
+    query = user_schedule_query(user)
+    if direction == 'after':
+        query = query.filter(or_(
+            Schedule.start_at > cursor_start,
+            and_(Schedule.start_at == cursor_start, Schedule.id > cursor_id),
+        )).order_by(Schedule.start_at, Schedule.id)
     else:
-        user_schedules = Schedule.query.filter_by(student_id=user.id).all()
+        query = query.filter(or_(
+            Schedule.start_at < cursor_start,
+            and_(Schedule.start_at == cursor_start, Schedule.id < cursor_id),
+        )).order_by(Schedule.start_at.desc(), Schedule.id.desc())
     
-    # Формируем список расписаний
-    schedules = []
-    today = datetime.now().date()
+    # Берём на одно занятие больше, чтобы узнать, есть ли следующая страница
+    rows = query.limit(limit + 1).all()
     
-    for schedule in user_schedules:
-        # Создаем datetime объект в системном времени
-        system_datetime = datetime.combine(schedule.date, schedule.time)
-        
-        # Конвертируем в пользовательский часовой пояс
-        user_datetime = convert_time_to_user_timezone(system_datetime, user_timezone_str)
-        
-        schedules.append({
-            'subject': schedule.subject.name,
-            'time': user_datetime.strftime('%H:%M'),
-            'date': user_datetime.strftime('%d.%m.%Y'),
-            'tutor': schedule.tutor.description,
-            'student': schedule.student.description,
-            'is_past': schedule.date < today,  # Помечаем прошедшие занятия
-            'system_date': schedule.date.strftime('%d.%m.%Y'),  # Системная дата для сортировки
-            'system_time': schedule.time.strftime('%H:%M'),  # Системное время для сортировки
-            'lesson_type': schedule.lesson_type if hasattr(schedule, 'lesson_type') else 'regular',  # Тип занятия
-            'duration_minutes': schedule.duration_minutes if hasattr(schedule, 'duration_minutes') else 60  # Продолжительность
-        })
+    # Занятия серий нужны только между курсором и последней прочитанной строкой: всё, что дальше,
+    # на страницу не попадёт. Если строк меньше limit + 1 — до начала серий или до горизонта
+    cursor_key = (cursor_start, cursor_id)
+    edge_date = rows[-1].start_at.date() if len(rows) > limit else None
+    if direction == 'after':
+        occurrences = [
+            occurrence for occurrence in expand_series(cursor_start.date(), edge_date, series_for_user(user))
+            if schedule_sort_key(occurrence) > cursor_key
+        ]
+    else:
+        occurrences = [
+            occurrence for occurrence in expand_series(edge_date, cursor_start.date(), series_for_user(user))
+            if schedule_sort_key(occurrence) < cursor_key
+        ]
+    if occurrences:
+        rows = sorted(rows + occurrences, key=schedule_sort_key, reverse=direction == 'before')
     
-    # Сортируем расписания по системной дате и времени (для корректной сортировки)
-    schedules.sort(key=lambda x: (datetime.strptime(x['system_date'], '%d.%m.%Y'), x['system_time']))
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == 'before':
+        rows.reverse()
     
-    return render_template('schedule_view.html', schedules=schedules, user=user, user_timezone=user_timezone_str)
+    user_timezone_str = user.timezone if user.timezone else 'Europe/Saratov'
+    next_cursor = None
+    if rows:
+        edge = rows[-1] if direction == 'after' else rows[0]
+        next_cursor = format_schedule_cursor(*schedule_sort_key(edge))
+    return jsonify({
+        'schedules': serialize_user_schedules(rows, user_timezone_str),
+        'next_cursor': next_cursor,
+        'has_more': has_more,
+    })
+
+# Сериализованные ответы /get_month_schedule: ключ запроса -> (ETag, тело)
+month_schedule_cache = OrderedDict()
+month_schedule_cache_lock = threading.Lock()
+
+def month_schedule_etag(year, month, selected_date):
+    """Сильный ETag месяца по версиям из schedule_version; таблицу schedule не читает"""
+    scope = schedule_month_scope(datetime(year, month, 1))
+    versions = dict(
+        db.session.query(ScheduleVersion.scope, ScheduleVersion.version)
+        .filter(ScheduleVersion.scope.in_([scope, SCHEDULE_VERSION_ALL]))
+        .all()
+    )
+    day = f"-{selected_date}" if selected_date else ''
+    return f"{scope}{day}-{versions.get(SCHEDULE_VERSION_ALL, 0)}.{versions.get(scope, 0)}"
+
+def month_schedule_response(body, etag):
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    # Браузер хранит ответ, но каждый раз сверяет ETag
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 @app.route('/get_month_schedule')
 @login_required
@@ -746,6 +1675,17 @@ def get_month_schedule():
     if not all([month, year]):
         return jsonify({'error': 'Missing parameters'}), 400
     
+    # Если с прошлого запроса месяц не менялся — 304 или ответ из кэша без запроса к schedule
+    etag = month_schedule_etag(year, month, selected_date)
+    if request.if_none_match.contains(etag):
+        return month_schedule_response(b'', etag).make_conditional(request)
+    cache_key = (year, month, selected_date)
+    with month_schedule_cache_lock:
+        cached = month_schedule_cache.get(cache_key)
+        if cached and cached[0] == etag:
+            month_schedule_cache.move_to_end(cache_key)
+            return month_schedule_response(cached[1], etag)
+    
     # Получаем все занятия в указанном месяце
     start_date = datetime(year, month, 1).date()
     if month == 12:
@@ -753,21 +1693,31 @@ def get_month_schedule():
     else:
         end_date = datetime(year, month + 1, 1).date()
     
-    query = Schedule.query.filter(
+    query = Schedule.query.options(
+        joinedload(Schedule.subject), joinedload(Schedule.tutor), joinedload(Schedule.student)
+    ).filter(
         Schedule.date >= start_date,
         Schedule.date < end_date
     )
     
     # Если указана конкретная дата, фильтруем по ней
+    last_date = end_date - timedelta(days=1)
     if selected_date:
-        query = query.filter(Schedule.date == datetime.strptime(selected_date, '%Y-%m-%d').date())
+        start_date = last_date = datetime.strptime(selected_date, '%Y-%m-%d').date()
+        query = query.filter(Schedule.date == start_date)
     
     schedules = query.order_by(Schedule.date, Schedule.time).all()
+    occurrences = expand_series(start_date, last_date)
+    if occurrences:
+        schedules = sorted(schedules + occurrences, key=lambda schedule: (schedule.date, schedule.time))
     
     month_schedule = []
     for schedule in schedules:
         month_schedule.append({
-            'id': schedule.id,
+            'id': schedule.id,  # None у незаписанного занятия серии
+            'key': schedule.key,
+            'series_id': schedule.series_id,
+            'occurrence_date': schedule.occurrence_date.strftime('%Y-%m-%d') if schedule.occurrence_date else None,
             'date': schedule.date.strftime('%Y-%m-%d'),
             'time': schedule.time.strftime('%H:%M'),
             'subject': schedule.subject.name,
@@ -780,7 +1730,13 @@ def get_month_schedule():
             'duration_minutes': schedule.duration_minutes if hasattr(schedule, 'duration_minutes') else 60
         })
     
-    return jsonify(month_schedule)
+    body = json.dumps(month_schedule, ensure_ascii=False).encode('utf-8')
+    with month_schedule_cache_lock:
+        month_schedule_cache[cache_key] = (etag, body)
+        month_schedule_cache.move_to_end(cache_key)
+        while len(month_schedule_cache) > MONTH_SCHEDULE_CACHE_SIZE:
+            month_schedule_cache.popitem(last=False)
+    return month_schedule_response(body, etag)
 
 @app.route('/send_reminders')
 def send_reminders():
@@ -812,17 +1768,19 @@ def send_reminders():
 @app.route('/api/tutor_students/<int:tutor_id>')
 @login_required
 def get_tutor_students(tutor_id):
-    # Получаем всех учеников, связанных с репетитором через таблицу Pair
-    pairs = Pair.query.filter_by(tutor_id=tutor_id).all()
-    students = []
-    for pair in pairs:
-        student = TelegramID.query.get(pair.student_id)
-        if student:
-            students.append({
-                'id': student.id,
-                'description': student.description,
-                'telegram_id': student.telegram_id
-            })
+    # Получаем всех учеников, связанных с репетитором через таблицу Pair, одним запросом
+    student = aliased(TelegramID)
+    rows = db.session.query(
+        student.id, student.description, student.telegram_id
+    ).join(
+        Pair, Pair.student_id == student.id
+    ).filter(
+        Pair.tutor_id == tutor_id
+    ).order_by(Pair.id).all()
+    students = [
+        {'id': row.id, 'description': row.description, 'telegram_id': row.telegram_id}
+        for row in rows
+    ]
     return jsonify(students)
 
 @app.route('/logout')
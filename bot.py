@@ -6,9 +6,25 @@ from dotenv import load_dotenv
 import mysql.connector
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, WebAppInfo, MenuButtonWebApp, ReplyKeyboardMarkup, KeyboardButton
 from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters, CallbackQueryHandler
+from telegram.error import RetryAfter
+from timezones import TIMEZONES, convert_time_to_user_timezone
+from recurrence import series_occurrence_dates
 import asyncio
+import functools
+import heapq
+import hmac
+import html
+import queue
+import json
+import random
+import signal
+import socket
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
 from datetime import datetime, timedelta, time
-import pytz
 
 # Загружаем переменные окружения
 load_dotenv()
@@ -30,6 +46,40 @@ if not TOKEN:
     logger.error("TELEGRAM_BOT_TOKEN не найден в переменных окружения!")
     sys.exit(1)
 
+# Режим запуска: all — всё в одном процессе, poller — только обработка обновлений Telegram,
+# worker — только напоминания и напоминания об отчётах (python bot.py worker)
+BOT_MODES = ('all', 'poller', 'worker')
+BOT_MODE = os.getenv('BOT_MODE') or (sys.argv[1] if __name__ == '__main__' and len(sys.argv) > 1 else 'all')
+if BOT_MODE not in BOT_MODES:
+    logger.error(f"Неизвестный режим запуска {BOT_MODE!r}, допустимые: {', '.join(BOT_MODES)}")
+    sys.exit(1)
+
+def mode_env(name, default):
+    """Настройка с учётом режима: WORKER_<NAME> / POLLER_<NAME> важнее общей <NAME>"""
+    return os.getenv(f"{BOT_MODE.upper()}_{name}", os.getenv(name, default))
+
+HEALTH_PORT = int(os.getenv('HEALTH_PORT', '0'))  # Порт HTTP-проверки здоровья (0 — выключена)
+HEALTH_STALE_AFTER = int(os.getenv('HEALTH_STALE_AFTER', '180'))  # Фоновая задача молчит дольше — процесс нездоров
+
+# Получение обновлений: polling — опрос getUpdates, webhook — Telegram сам присылает обновления на наш порт
+UPDATE_MODES = ('polling', 'webhook')
+UPDATE_MODE = os.getenv('UPDATE_MODE', 'polling')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')  # Публичный адрес, который регистрируется в Telegram (пусто — не регистрировать)
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN')  # Сверяется с заголовком X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_MAX_BODY = int(os.getenv('WEBHOOK_MAX_BODY', str(1024 * 1024)))  # Максимальный размер тела запроса в байтах
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))  # Одновременных запросов от Telegram
+WEBHOOK_DRAIN_TIMEOUT = int(os.getenv('WEBHOOK_DRAIN_TIMEOUT', '30'))  # Сколько ждать запросы в обработке при остановке
+WEBHOOK_READ_TIMEOUT = float(os.getenv('WEBHOOK_READ_TIMEOUT', '10'))  # Сколько ждать заголовки и тело запроса от клиента
+if UPDATE_MODE not in UPDATE_MODES:
+    logger.error(f"Неизвестный способ получения обновлений {UPDATE_MODE!r}, допустимые: {', '.join(UPDATE_MODES)}")
+    sys.exit(1)
+if UPDATE_MODE == 'webhook' and BOT_MODE != 'worker' and not WEBHOOK_SECRET_TOKEN:
+    logger.error("Для UPDATE_MODE=webhook нужен WEBHOOK_SECRET_TOKEN!")
+    sys.exit(1)
+
 # База данных конфигурация
 DB_CONFIG = {
     'host': os.getenv('MYSQL_HOST', 'localhost'),
@@ -38,23 +88,534 @@ DB_CONFIG = {
     'database': os.getenv('MYSQL_DATABASE')
 }
 
-# Часовой пояс системы (Саратов)
-SYSTEM_TIMEZONE = pytz.timezone('Europe/Saratov')  # UTC+4
-
-# Доступные часовые пояса для выбора
-TIMEZONES = {
-    'Europe/Moscow': '🇷🇺 Москва (UTC+3)',
-    'Europe/Saratov': '🇷🇺 Саратов (UTC+4)',
-    'Asia/Yekaterinburg': '🇷🇺 Екатеринбург (UTC+5)',
-    'Asia/Omsk': '🇷🇺 Омск (UTC+6)',
-    'Asia/Krasnoyarsk': '🇷🇺 Красноярск (UTC+7)',
-    'Asia/Irkutsk': '🇷🇺 Иркутск (UTC+8)',
-    'Asia/Yakutsk': '🇷🇺 Якутск (UTC+9)',
-    'Asia/Vladivostok': '🇷🇺 Владивосток (UTC+10)',
-    'Asia/Magadan': '🇷🇺 Магадан (UTC+11)',
-    'Asia/Kamchatka': '🇷🇺 Камчатка (UTC+12)',
-    'Europe/Kaliningrad': '🇷🇺 Калининград (UTC+2)',
-}
+# Настройки пула соединений с БД
+DB_POOL_SIZE = int(mode_env('DB_POOL_SIZE', '10'))  # Максимум одновременно открытых соединений
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '5'))  # Сколько ждать свободное соединение (сек)
+DB_CONN_MAX_LIFETIME = int(os.getenv('DB_CONN_MAX_LIFETIME', '1800'))  # Пересоздавать соединение через N сек
+DB_CONN_PING_AFTER = int(os.getenv('DB_CONN_PING_AFTER', '30'))  # Проверять соединение, простоявшее дольше N сек
+DB_EXECUTOR_WORKERS = int(mode_env('DB_EXECUTOR_WORKERS', str(DB_POOL_SIZE)))  # Потоки для блокирующих запросов к БД
+METRICS_LOG_INTERVAL = int(os.getenv('METRICS_LOG_INTERVAL', '300'))  # Как часто писать метрики в лог (сек)
+
+# Настройки кэша профилей пользователей
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '1000'))  # Сколько профилей держать в памяти
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', '60'))  # Через сколько секунд профиль перечитывается из БД
+CHAT_STATE_REFRESH_INTERVAL = int(os.getenv('CHAT_STATE_REFRESH_INTERVAL', '3600'))  # Принудительно обновлять chat_id и кнопку меню раз в N сек
+
+# Ограничения исходящих сообщений (лимиты Telegram: ~30 сообщений/сек всего, ~1/сек в личный чат, 20/мин в группу)
+OUTBOUND_GLOBAL_RATE = float(mode_env('OUTBOUND_GLOBAL_RATE', '25'))  # Сообщений в секунду на процесс бота
+OUTBOUND_CHAT_RATE = float(os.getenv('OUTBOUND_CHAT_RATE', '1'))  # Сообщений в секунду в один личный чат
+OUTBOUND_GROUP_RATE = float(os.getenv('OUTBOUND_GROUP_RATE', '0.33'))  # Сообщений в секунду в одну группу
+OUTBOUND_QUEUE_SIZE = int(os.getenv('OUTBOUND_QUEUE_SIZE', '5000'))  # Максимальная длина очереди отправки
+OUTBOUND_WORKERS = int(mode_env('OUTBOUND_WORKERS', '8'))  # Сколько сообщений отправляется параллельно
+OUTBOUND_MAX_RETRIES = int(os.getenv('OUTBOUND_MAX_RETRIES', '3'))  # Повторы после RetryAfter
+
+# Сводка логов для LOG_GROUP_ID
+LOG_DIGEST_INTERVAL = float(os.getenv('LOG_DIGEST_INTERVAL', '30'))  # Как часто отправлять сводку (сек)
+LOG_DIGEST_MAX_CHARS = int(os.getenv('LOG_DIGEST_MAX_CHARS', '3500'))  # Отправить сводку досрочно при таком объёме
+LOG_DIGEST_MAX_EVENTS = int(os.getenv('LOG_DIGEST_MAX_EVENTS', '500'))  # Сверх этого события пишутся только в локальный лог
+LOG_SAMPLE_RATES = os.getenv('LOG_SAMPLE_RATES', '')  # Доля отправляемых событий по типам, например "schedule_view:0.2,reminder:0.5"
+
+# Рассылка напоминаний
+REMINDER_CONCURRENCY = int(mode_env('REMINDER_CONCURRENCY', '20'))  # Сколько напоминаний одного тика доставляется параллельно
+TELEGRAM_CONNECTION_POOL_SIZE = int(os.getenv('TELEGRAM_CONNECTION_POOL_SIZE', '256'))  # HTTP-соединения к Bot API
+REMINDER_REFRESH_INTERVAL = float(os.getenv('REMINDER_REFRESH_INTERVAL', '30'))  # Как часто подтягивать изменения расписания, сек
+REMINDER_REFRESH_OVERLAP = 5  # Запас по updated_at при подтягивании изменений, сек
+
+# Досылка пропущенных напоминаний (после перезапуска или зависания)
+REMINDER_MAX_LATENESS = os.getenv('REMINDER_MAX_LATENESS', 'day:14400,hour:300,10min:120')  # Насколько можно опоздать, сек
+REPORT_REMINDER_MAX_LATENESS = timedelta(seconds=int(os.getenv('REPORT_REMINDER_MAX_LATENESS', '21600')))
+REMINDER_CATCHUP_BURST = int(os.getenv('REMINDER_CATCHUP_BURST', '50'))  # Сколько напоминаний отправлять за одну пачку
+REMINDER_CATCHUP_PAUSE = float(os.getenv('REMINDER_CATCHUP_PAUSE', '1'))  # Пауза между пачками при досылке, сек
+
+# Несколько реплик бота: напоминания делятся на шарды по tutor_id, шарды арендуются через БД
+REMINDER_SHARDS = int(os.getenv('REMINDER_SHARDS', '16'))
+REMINDER_LEASE_TTL = timedelta(seconds=int(os.getenv('REMINDER_LEASE_TTL', '60')))  # Срок аренды шарда
+# Через сколько неотправленное напоминание можно занять заново; по умолчанию — срок аренды шарда
+REMINDER_CLAIM_TIMEOUT = timedelta(seconds=int(os.getenv('REMINDER_CLAIM_TIMEOUT') or REMINDER_LEASE_TTL.total_seconds()))
+WORKER_ID = os.getenv('WORKER_ID') or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+# Приоритеты исходящих сообщений (меньше — важнее)
+PRIORITY_REMINDER = 0  # Напоминания пользователям
+PRIORITY_REPORT = 1  # Отчёты родителям и на подтверждение
+PRIORITY_LOG = 2  # Логи в LOG_GROUP_ID
+
+class PooledConnection:
+    """Соединение, выданное из пула. close() возвращает его в пул, а не закрывает"""
+
+    def __init__(self, pool, entry):
+        self._pool = pool
+        self._entry = entry
+
+    def __getattr__(self, name):
+        return getattr(self._entry['conn'], name)
+
+    def fetchone_prepared(self, sql, params=()):
+        """Выполнить горячий запрос через серверный prepared statement и вернуть одну строку"""
+        cursor = self._prepared_cursor(sql)
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+        return rows[0] if rows else None
+
+    def execute_prepared(self, sql, params=()):
+        """Выполнить горячий запрос на изменение через prepared statement, вернуть число строк"""
+        cursor = self._prepared_cursor(sql)
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+    def _prepared_cursor(self, sql):
+        # Prepared statement живёт на стороне сервера, пока жив курсор — кэшируем курсор на соединении
+        cursor = self._entry['prepared'].get(sql)
+        if cursor is None:
+            cursor = self._entry['conn'].cursor(prepared=True, dictionary=True)
+            self._entry['prepared'][sql] = cursor
+        return cursor
+
+    def close(self):
+        if self._entry is not None:
+            entry, self._entry = self._entry, None
+            self._pool._release(entry)
+
+    def __del__(self):
+        # Соединение не вернули явно (например, из-за исключения) — закрываем, чтобы не потерять слот
+        if self._entry is not None:
+            entry, self._entry = self._entry, None
+            self._pool._release(entry, broken=True)
+
+class DBPool:
+    """Ограниченный пул соединений MySQL с проверкой здоровья и ограничением времени жизни"""
+
+    def __init__(self, config, size, timeout, max_lifetime, ping_after):
+        self._config = config
+        self.size = size
+        self._timeout = timeout
+        self._max_lifetime = max_lifetime
+        self._ping_after = ping_after
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._counters = {
+            'checkouts': 0,
+            'created': 0,
+            'recycled': 0,
+            'broken': 0,
+            'timeouts': 0,
+            'waited': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+        }
+
+    def get_connection(self):
+        """Взять соединение из пула (ждёт не дольше DB_POOL_TIMEOUT)"""
+        started = monotonic()
+        if not self._slots.acquire(timeout=self._timeout):
+            with self._lock:
+                self._counters['timeouts'] += 1
+            raise mysql.connector.errors.PoolError(
+                f"Нет свободных соединений в пуле за {self._timeout} сек (размер пула {self.size})"
+            )
+        waited = monotonic() - started
+        try:
+            entry = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._in_use += 1
+            self._counters['checkouts'] += 1
+            self._counters['wait_time_total'] += waited
+            self._counters['wait_time_max'] = max(self._counters['wait_time_max'], waited)
+            if waited > 0.001:
+                self._counters['waited'] += 1
+        return PooledConnection(self, entry)
+
+    def _checkout(self):
+        while True:
+            try:
+                entry = self._idle.get_nowait()
+            except queue.Empty:
+                return self._new_entry()
+
+            now = monotonic()
+            if now - entry['created_at'] > self._max_lifetime:
+                self._discard(entry, 'recycled')
+                continue
+            if now - entry['last_used'] > self._ping_after:
+                try:
+                    entry['conn'].ping(reconnect=False)
+                except Exception:
+                    self._discard(entry, 'broken')
+                    continue
+            return entry
+
+    def _new_entry(self):
+        conn = mysql.connector.connect(**self._config)
+        now = monotonic()
+        with self._lock:
+            self._counters['created'] += 1
+        return {'conn': conn, 'created_at': now, 'last_used': now, 'prepared': {}}
+
+    def _discard(self, entry, reason):
+        with self._lock:
+            self._counters[reason] += 1
+        try:
+            entry['conn'].close()
+        except Exception:
+            pass
+
+    def _release(self, entry, broken=False):
+        try:
+            if not broken:
+                # Завершаем открытую транзакцию, чтобы следующий владелец видел свежие данные
+                entry['conn'].rollback()
+                entry['last_used'] = monotonic()
+                self._idle.put(entry)
+            else:
+                self._discard(entry, 'broken')
+        except Exception:
+            self._discard(entry, 'broken')
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def stats(self):
+        """Текущее состояние пула для метрик"""
+        with self._lock:
+            result = dict(self._counters)
+            result['in_use'] = self._in_use
+        result['size'] = self.size
+        result['idle'] = self._idle.qsize()
+        checkouts = result['checkouts'] or 1
+        result['wait_time_avg'] = result['wait_time_total'] / checkouts
+        return result
+
+db_pool = DBPool(DB_CONFIG, DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_CONN_MAX_LIFETIME, DB_CONN_PING_AFTER)
+
+class DBExecutor:
+    """Ограниченный пул потоков, в котором выполняются блокирующие запросы к БД"""
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='db')
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._counters = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'queue_wait_total': 0.0,
+            'queue_wait_max': 0.0,
+            'run_time_total': 0.0,
+            'run_time_max': 0.0,
+        }
+
+    async def run(self, func, *args):
+        """Выполнить func(*args) в пуле потоков, не блокируя event loop"""
+        submitted_at = monotonic()
+        with self._lock:
+            self._queued += 1
+            self._counters['submitted'] += 1
+
+        def job():
+            started_at = monotonic()
+            queue_wait = started_at - submitted_at
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                self._counters['queue_wait_total'] += queue_wait
+                self._counters['queue_wait_max'] = max(self._counters['queue_wait_max'], queue_wait)
+            failed = False
+            try:
+                return func(*args)
+            except Exception:
+                failed = True
+                raise
+            finally:
+                run_time = monotonic() - started_at
+                with self._lock:
+                    self._running -= 1
+                    self._counters['failed' if failed else 'completed'] += 1
+                    self._counters['run_time_total'] += run_time
+                    self._counters['run_time_max'] = max(self._counters['run_time_max'], run_time)
+
+        return await asyncio.get_running_loop().run_in_executor(self._executor, job)
+
+    def stats(self):
+        """Текущее состояние пула потоков для метрик"""
+        with self._lock:
+            result = dict(self._counters)
+            result['queued'] = self._queued
+            result['running'] = self._running
+        result['workers'] = self.workers
+        finished = (result['completed'] + result['failed']) or 1
+        result['queue_wait_avg'] = result['queue_wait_total'] / finished
+        result['run_time_avg'] = result['run_time_total'] / finished
+        return result
+
+db_executor = DBExecutor(DB_EXECUTOR_WORKERS)
+
+async def run_db(func, *args):
+    """Выполнить синхронную функцию работы с БД вне event loop"""
+    return await db_executor.run(func, *args)
+
+class UserCache:
+    """LRU-кэш строк telegram_id с TTL, доступный по username и по id"""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._by_username = OrderedDict()  # username -> (expires_at, row)
+        self._username_by_id = {}
+        # username -> номер изменения; update/invalidate увеличивают его, put со старым номером пропускается
+        self._generations = {}
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'expired': 0, 'evicted': 0, 'invalidated': 0, 'stale': 0}
+
+    def get(self, username):
+        """Вернуть копию строки пользователя или None, если её нет в кэше"""
+        with self._lock:
+            return self._get_locked(username)
+
+    def get_by_id(self, user_id):
+        """Вернуть копию строки пользователя по id или None"""
+        with self._lock:
+            username = self._username_by_id.get(user_id)
+            if username is None:
+                self._counters['misses'] += 1
+                return None
+            return self._get_locked(username)
+
+    def _get_locked(self, username):
+        item = self._by_username.get(username)
+        if item is None:
+            self._counters['misses'] += 1
+            return None
+        expires_at, row = item
+        if expires_at < monotonic():
+            self._remove_locked(username)
+            self._counters['expired'] += 1
+            self._counters['misses'] += 1
+            return None
+        self._by_username.move_to_end(username)
+        self._counters['hits'] += 1
+        return dict(row)
+
+    def generation(self, username):
+        """Номер изменения пользователя; читается до запроса в БД и передаётся в put"""
+        with self._lock:
+            return self._generations.get(username, 0)
+
+    def put(self, row, generation=None):
+        """Положить строку пользователя в кэш.
+
+        Если после чтения generation пользователь менялся (update/invalidate),
+        строка могла устареть и не кэшируется.
+        """
+        if not row or self.max_size <= 0:
+            return
+        username = row['telegram_id']
+        with self._lock:
+            if generation is not None and self._generations.get(username, 0) != generation:
+                self._counters['stale'] += 1
+                return
+            self._remove_locked(username)
+            self._by_username[username] = (monotonic() + self.ttl, dict(row))
+            self._username_by_id[row['id']] = username
+            while len(self._by_username) > self.max_size:
+                oldest = next(iter(self._by_username))
+                self._remove_locked(oldest)
+                self._counters['evicted'] += 1
+
+    def update(self, username, **fields):
+        """Записать изменённые поля в закэшированную строку (write-through после UPDATE в БД)"""
+        with self._lock:
+            self._generations[username] = self._generations.get(username, 0) + 1
+            item = self._by_username.get(username)
+            if item is not None:
+                item[1].update(fields)
+
+    def invalidate(self, username):
+        """Удалить пользователя из кэша"""
+        with self._lock:
+            self._generations[username] = self._generations.get(username, 0) + 1
+            if self._remove_locked(username):
+                self._counters['invalidated'] += 1
+
+    def _remove_locked(self, username):
+        item = self._by_username.pop(username, None)
+        if item is None:
+            return False
+        user_id = item[1].get('id')
+        if self._username_by_id.get(user_id) == username:
+            del self._username_by_id[user_id]
+        return True
+
+    def stats(self):
+        """Счётчики попаданий и промахов для метрик"""
+        with self._lock:
+            result = dict(self._counters)
+            result['size'] = len(self._by_username)
+        result['max_size'] = self.max_size
+        lookups = result['hits'] + result['misses']
+        result['hit_ratio'] = result['hits'] / lookups if lookups else 0.0
+        return result
+
+user_cache = UserCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+
+class TokenBucket:
+    """Token bucket для ограничения частоты отправки (работает внутри event loop)"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = monotonic()
+        self._paused_until = 0.0
+
+    def reserve(self):
+        """Забрать токен (возможно, в долг) и вернуть, сколько секунд ждать до отправки"""
+        now = monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= 1
+        return max(0.0, -self._tokens / self.rate, self._paused_until - now)
+
+    async def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def pause(self, seconds):
+        """Не выдавать токены ближайшие seconds секунд (после RetryAfter от Telegram)"""
+        self._paused_until = max(self._paused_until, monotonic() + seconds)
+
+    def is_idle(self):
+        now = monotonic()
+        return now >= self._paused_until and self._tokens + (now - self._updated) * self.rate >= self.capacity
+
+class OutboundDispatcher:
+    """Очередь исходящих сообщений с приоритетами и ограничением частоты"""
+
+    def __init__(self, global_rate, chat_rate, group_rate, queue_size, workers, max_retries):
+        self._global = TokenBucket(global_rate, max(1.0, global_rate))
+        self._chat_rate = chat_rate
+        self._group_rate = group_rate
+        self._chat_buckets = {}
+        self._queue_size = queue_size
+        self._queue = None
+        self._workers = workers
+        self._max_retries = max_retries
+        self._tasks = []
+        self._seq = 0
+        self._counters = {
+            'enqueued': 0,
+            'sent': 0,
+            'failed': 0,
+            'retried': 0,
+            'dropped': 0,
+            'rate_wait_total': 0.0,
+        }
+
+    def start(self):
+        """Запустить обработчики очереди (вызывается из post_init)"""
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue(maxsize=self._queue_size)
+        while len(self._tasks) < self._workers:
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    async def send(self, priority, method, **kwargs):
+        """Поставить отправку в очередь и дождаться результата (исключения пробрасываются)"""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(self._make_job(priority, method, kwargs, future))
+        self._counters['enqueued'] += 1
+        return await future
+
+    def post(self, priority, method, **kwargs):
+        """Поставить отправку в очередь без ожидания. False — если очередь переполнена"""
+        try:
+            self._queue.put_nowait(self._make_job(priority, method, kwargs, None))
+        except asyncio.QueueFull:
+            self._counters['dropped'] += 1
+            return False
+        self._counters['enqueued'] += 1
+        return True
+
+    def _make_job(self, priority, method, kwargs, future):
+        self._seq += 1
+        return (priority, self._seq, method, kwargs, future)
+
+    def _bucket_for(self, chat_id):
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) > 10000:
+                # Убираем простаивающие bucket-ы, чтобы словарь не рос бесконечно
+                for key in [key for key, value in self._chat_buckets.items() if value.is_idle()]:
+                    del self._chat_buckets[key]
+            is_group = str(chat_id).startswith('-')
+            rate = self._group_rate if is_group else self._chat_rate
+            bucket = TokenBucket(rate, 3)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def _worker(self):
+        while True:
+            priority, _, method, kwargs, future = await self._queue.get()
+            try:
+                result = await self._deliver(method, kwargs)
+            except Exception as e:
+                self._counters['failed'] += 1
+                if future is not None:
+                    if not future.done():
+                        future.set_exception(e)
+                else:
+                    logger.error(f"Ошибка при отправке сообщения в чат {kwargs.get('chat_id')}: {e}")
+            else:
+                self._counters['sent'] += 1
+                if future is not None and not future.done():
+                    future.set_result(result)
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, method, kwargs):
+        bucket = self._bucket_for(kwargs.get('chat_id'))
+        attempt = 0
+        while True:
+            waited = await bucket.acquire()
+            waited += await self._global.acquire()
+            self._counters['rate_wait_total'] += waited
+            try:
+                return await method(**kwargs)
+            except RetryAfter as e:
+                attempt += 1
+                if attempt > self._max_retries:
+                    raise
+                retry_after = e.retry_after
+                delay = retry_after.total_seconds() if isinstance(retry_after, timedelta) else float(retry_after)
+                logger.warning(f"Flood control Telegram: пауза {delay} сек перед повтором (чат {kwargs.get('chat_id')})")
+                self._counters['retried'] += 1
+                bucket.pause(delay)
+                self._global.pause(delay)
+
+    def stats(self):
+        """Состояние очереди для метрик"""
+        result = dict(self._counters)
+        result['queued'] = self._queue.qsize() if self._queue is not None else 0
+        result['max_queue'] = self._queue_size
+        result['chat_buckets'] = len(self._chat_buckets)
+        return result
+
+outbound = OutboundDispatcher(
+    OUTBOUND_GLOBAL_RATE, OUTBOUND_CHAT_RATE, OUTBOUND_GROUP_RATE,
+    OUTBOUND_QUEUE_SIZE, OUTBOUND_WORKERS, OUTBOUND_MAX_RETRIES
+)
+
+# Горячие запросы, выполняемые через серверные prepared statements
+SQL_USER_BY_USERNAME = "SELECT * FROM telegram_id WHERE telegram_id = %s"
+SQL_SAVE_CHAT_ID = "UPDATE telegram_id SET chat_id = %s WHERE telegram_id = %s"
+SQL_UPDATE_TIMEZONE = "UPDATE telegram_id SET timezone = %s WHERE telegram_id = %s"
 
 # Функция для проверки пользователя в БД
 def get_user_info(username):
@@ -66,13 +627,19 @@ def get_user_info(username):
     if username.startswith('@'):
         username = username[1:]
     
+    cached = user_cache.get(username)
+    if cached is not None:
+        return cached
+    
+    # Номер изменения читается до запроса: если UPDATE успеет между чтением и put, строка не закэшируется
+    generation = user_cache.generation(username)
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM telegram_id WHERE telegram_id = %s", (username,))
-        result = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        conn = db_pool.get_connection()
+        try:
+            result = conn.fetchone_prepared(SQL_USER_BY_USERNAME, (username,))
+        finally:
+            conn.close()
+        user_cache.put(result, generation)
         return result
     except Exception as e:
         logger.error(f"Ошибка при получении информации о пользователе: {e}")
@@ -89,35 +656,145 @@ def save_chat_id(username, chat_id):
         username = username[1:]
     
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE telegram_id SET chat_id = %s WHERE telegram_id = %s",
-            (chat_id, username)
-        )
-        conn.commit()
-        cursor.close()
-        conn.close()
+        conn = db_pool.get_connection()
+        try:
+            conn.execute_prepared(SQL_SAVE_CHAT_ID, (chat_id, username))
+            conn.commit()
+        finally:
+            conn.close()
+        user_cache.update(username, chat_id=chat_id)
         return True
     except Exception as e:
         logger.error(f"Ошибка при сохранении chat_id: {e}")
         return False
 
-async def send_log_to_group(application, message):
-    """Отправить логовое сообщение в группу"""
-    if not LOG_GROUP_ID:
-        return False
-    
-    try:
-        await application.bot.send_message(
-            chat_id=LOG_GROUP_ID,
-            text=message,
-            parse_mode='HTML'
-        )
+def parse_sample_rates(value):
+    """Разобрать строку вида "schedule_view:0.2,reminder:0.5" в словарь"""
+    rates = {}
+    for item in value.split(','):
+        if ':' not in item:
+            continue
+        event_type, rate = item.split(':', 1)
+        try:
+            rates[event_type.strip()] = max(0.0, min(1.0, float(rate)))
+        except ValueError:
+            logger.error(f"Некорректная доля в LOG_SAMPLE_RATES: {item}")
+    return rates
+
+class LogDigest:
+    """Копит события для LOG_GROUP_ID и отправляет их одной сводкой раз в N секунд или по объёму"""
+
+    SEPARATOR = "\n\n➖➖➖\n\n"
+
+    def __init__(self, chat_id, interval, max_chars, max_events, sample_rates):
+        self.chat_id = chat_id
+        self.interval = interval
+        self.max_chars = max_chars
+        self.max_events = max_events
+        self.sample_rates = sample_rates
+        self._bot = None
+        self._events = []
+        self._chars = 0
+        self._flush_now = None
+        self._counters = {'accepted': 0, 'sampled_out': 0, 'overflow': 0, 'digests': 0, 'fallback': 0}
+
+    def start(self, bot):
+        """Запустить периодическую отправку сводки (вызывается из post_init)"""
+        self._bot = bot
+        self._flush_now = asyncio.Event()
+        asyncio.create_task(self._run())
+
+    def add(self, event_type, message):
+        """Добавить событие в сводку. False — если событие не попадёт в группу"""
+        if not self.chat_id:
+            return False
+        
+        rate = self.sample_rates.get(event_type, 1.0)
+        if rate < 1.0 and random.random() >= rate:
+            self._counters['sampled_out'] += 1
+            return False
+        
+        if self._bot is None or len(self._events) >= self.max_events:
+            self._counters['overflow'] += 1
+            self._log_locally(message)
+            return False
+        
+        self._events.append(message)
+        self._chars += len(message) + len(self.SEPARATOR)
+        self._counters['accepted'] += 1
+        if self._chars >= self.max_chars:
+            self._flush_now.set()
         return True
-    except Exception as e:
-        logger.error(f"Ошибка при отправке лога в группу: {e}")
-        return False
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Ошибка при отправке сводки логов: {e}")
+
+    def _take_chunks(self):
+        """Забрать накопленные события, разбив их на сообщения не длиннее max_chars"""
+        events, self._events, self._chars = self._events, [], 0
+        chunks = []
+        current = []
+        size = 0
+        for message in events:
+            if current and size + len(message) > self.max_chars:
+                chunks.append(current)
+                current, size = [], 0
+            current.append(message)
+            size += len(message) + len(self.SEPARATOR)
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _format(self, chunk):
+        header = f"🗂 <b>Сводка событий</b> ({len(chunk)})\n\n" if len(chunk) > 1 else ""
+        return header + self.SEPARATOR.join(chunk)
+
+    def flush(self):
+        """Поставить накопленные события в очередь отправки"""
+        for chunk in self._take_chunks():
+            if outbound.post(PRIORITY_LOG, self._bot.send_message, chat_id=self.chat_id, text=self._format(chunk), parse_mode='HTML'):
+                self._counters['digests'] += 1
+            else:
+                for message in chunk:
+                    self._log_locally(message)
+
+    async def drain(self):
+        """Отправить остаток сводки и дождаться доставки (при остановке бота)"""
+        for chunk in self._take_chunks():
+            try:
+                await outbound.send(PRIORITY_LOG, self._bot.send_message, chat_id=self.chat_id, text=self._format(chunk), parse_mode='HTML')
+                self._counters['digests'] += 1
+            except Exception as e:
+                logger.error(f"Ошибка при отправке сводки логов: {e}")
+                for message in chunk:
+                    self._log_locally(message)
+
+    def _log_locally(self, message):
+        self._counters['fallback'] += 1
+        # Убираем HTML-разметку, чтобы запись в локальном логе читалась
+        text = html.unescape(message.replace('<b>', '').replace('</b>', '')).replace('\n', ' | ')
+        logger.info(f"Лог для группы (не отправлен): {text}")
+
+    def stats(self):
+        """Счётчики сводки для метрик"""
+        result = dict(self._counters)
+        result['buffered'] = len(self._events)
+        return result
+
+log_digest = LogDigest(LOG_GROUP_ID, LOG_DIGEST_INTERVAL, LOG_DIGEST_MAX_CHARS, LOG_DIGEST_MAX_EVENTS, parse_sample_rates(LOG_SAMPLE_RATES))
+
+def send_log_to_group(application, message, event_type='other'):
+    """Поставить логовое сообщение в сводку для группы; отправка идёт из задачи сводки, ждать нечего"""
+    return log_digest.add(event_type, message)
 
 def update_user_timezone(username, timezone_str):
     """Обновить часовой пояс пользователя"""
@@ -129,46 +806,702 @@ def update_user_timezone(username, timezone_str):
         username = username[1:]
     
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
+        conn = db_pool.get_connection()
+        try:
+            conn.execute_prepared(SQL_UPDATE_TIMEZONE, (timezone_str, username))
+            conn.commit()
+        finally:
+            conn.close()
+        user_cache.update(username, timezone=timezone_str)
+        return True
+    except Exception as e:
+        logger.error(f"Ошибка при обновлении timezone: {e}")
+        return False
+
+# Синхронные функции работы с БД. Из async-кода вызываются только через run_db
+
+def create_linked_parent(username, display_name, chat_id):
+    """Создать запись родителя, если username указан как parent_id у ученика. True — запись создана"""
+    conn = db_pool.get_connection()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT id FROM telegram_id WHERE parent_id = %s LIMIT 1", (username,))
+        has_parent_link = cursor.fetchone()
+
+        cursor.execute("SELECT id FROM telegram_id WHERE telegram_id = %s", (username,))
+        existing_parent = cursor.fetchone()
+
+        created = False
+        if has_parent_link and not existing_parent:
+            cursor.execute(
+                """
+                INSERT INTO telegram_id (telegram_id, description, status, chat_id)
+                VALUES (%s, %s, %s, %s)
+                """,
+                (username, display_name, 'родитель', chat_id)
+            )
+            conn.commit()
+            created = True
+            user_cache.invalidate(username)
+        cursor.close()
+        return created
+    finally:
+        conn.close()
+
+def get_pending_reports(tutor_id):
+    """Получить неотправленные отчёты репетитора"""
+    conn = db_pool.get_connection()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT r.id as report_id, s.id as schedule_id, s.date, s.time, s.lesson_type, s.duration_minutes,
+                   sub.name as subject_name,
+                   st.description as student_name
+            FROM reports r
+            JOIN schedule s ON r.schedule_id = s.id
+            JOIN subject sub ON s.subject_id = sub.id
+            JOIN telegram_id st ON s.student_id = st.id
+            WHERE s.tutor_id = %s AND r.sent = FALSE
+            ORDER BY s.date DESC, s.time DESC
+            LIMIT 20
+        """, (tutor_id,))
+        reports = cursor.fetchall()
+        cursor.close()
+        return reports
+    finally:
+        conn.close()
+
+def save_report_content(schedule_id, report_text, photo_file_id):
+    """Записать текст и фото в неотправленный отчёт занятия. Возвращает id отчёта или None"""
+    conn = db_pool.get_connection()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT id FROM reports WHERE schedule_id = %s AND sent = FALSE", (schedule_id,))
+        report = cursor.fetchone()
+
+        if not report:
+            cursor.close()
+            return None
+
+        cursor.execute("""
+            UPDATE reports
+            SET report_text = %s, photo_file_id = %s
+            WHERE id = %s
+        """, (report_text, photo_file_id, report['id']))
+        conn.commit()
+        cursor.close()
+        return report['id']
+    finally:
+        conn.close()
+
+def get_schedule_summary(schedule_id):
+    """Получить предмет, участников и время занятия"""
+    conn = db_pool.get_connection()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT s.date, s.time, sub.name as subject_name,
+                   st.description as student_name, t.description as tutor_name
+            FROM schedule s
+            JOIN subject sub ON s.subject_id = sub.id
+            JOIN telegram_id st ON s.student_id = st.id
+            JOIN telegram_id t ON s.tutor_id = t.id
+            WHERE s.id = %s
+        """, (schedule_id,))
+        schedule_info = cursor.fetchone()
+        cursor.close()
+        return schedule_info
+    finally:
+        conn.close()
+
+SQL_REPORT_WITH_LESSON = """
+    SELECT r.id, r.schedule_id, r.report_text, r.photo_file_id, r.sent,
+           s.date, s.time, s.student_id,
+           sub.name as subject_name,
+           st.description as student_name, st.parent_id,
+           t.description as tutor_name
+    FROM reports r
+    JOIN schedule s ON r.schedule_id = s.id
+    JOIN subject sub ON s.subject_id = sub.id
+    JOIN telegram_id st ON s.student_id = st.id
+    JOIN telegram_id t ON s.tutor_id = t.id
+    WHERE r.id = %s
+"""
+
+def get_report_info(report_id):
+    """Получить отчёт вместе с данными занятия"""
+    conn = db_pool.get_connection()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(SQL_REPORT_WITH_LESSON, (report_id,))
+        report_info = cursor.fetchone()
+        cursor.close()
+        return report_info
+    finally:
+        conn.close()
+
+def approve_report(report_id):
+    """Пометить отчёт подтверждённым. Возвращает данные отчёта или None, если его нет"""
+    conn = db_pool.get_connection()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(SQL_REPORT_WITH_LESSON, (report_id,))
+        report_info = cursor.fetchone()
+
+        if report_info:
+            cursor.execute("UPDATE reports SET sent = TRUE WHERE id = %s", (report_id,))
+            conn.commit()
+        cursor.close()
+        return report_info
+    finally:
+        conn.close()
+
+def approve_edited_report(report_id, report_text, photo_file_id):
+    """Сохранить отредактированный отчёт как подтверждённый и вернуть его данные"""
+    conn = db_pool.get_connection()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("""
+            UPDATE reports
+            SET report_text = %s, photo_file_id = %s, sent = TRUE
+            WHERE id = %s
+        """, (report_text, photo_file_id, report_id))
+        conn.commit()
+
+        cursor.execute(SQL_REPORT_WITH_LESSON, (report_id,))
+        report_info = cursor.fetchone()
+        cursor.close()
+        return report_info
+    finally:
+        conn.close()
+
+def cancel_report(report_id):
+    """Удалить неотправленный отчёт. Возвращает 'not_found', 'sent' или 'deleted'"""
+    conn = db_pool.get_connection()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT id, sent FROM reports WHERE id = %s", (report_id,))
+        report = cursor.fetchone()
+
+        if not report:
+            result = 'not_found'
+        elif report['sent']:
+            result = 'sent'
+        else:
+            cursor.execute("DELETE FROM reports WHERE id = %s", (report_id,))
+            conn.commit()
+            result = 'deleted'
+        cursor.close()
+        return result
+    finally:
+        conn.close()
+
+def shard_filter(column, shards):
+    """Условие "строка относится к одному из шардов" (шард = tutor_id % REMINDER_SHARDS) и его параметры"""
+    placeholders = ', '.join(['%s'] * len(shards))
+    return f"MOD({column}, %s) IN ({placeholders})", (REMINDER_SHARDS, *sorted(shards))
+
+def get_report_candidates(ended_from, ended_to, shards):
+    """Занятия репетиторов с chat_id из шардов shards, закончившиеся в [ended_from, ended_to] и ещё без записи в reports"""
+    if not shards:
+        return []
+    shard_sql, shard_params = shard_filter('s.tutor_id', shards)
+    conn = db_pool.get_connection()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(f"""
+            SELECT s.id, s.start_at, s.end_at, s.duration_minutes, s.tutor_id,
+                   sub.name as subject_name,
+                   t.description as tutor_name, t.chat_id as tutor_chat_id,
+                   st.description as student_name
+            FROM schedule s
+            JOIN subject sub ON s.subject_id = sub.id
+            JOIN telegram_id t ON s.tutor_id = t.id
+            JOIN telegram_id st ON s.student_id = st.id
+            LEFT JOIN reports r ON r.schedule_id = s.id
+            WHERE s.end_at >= %s AND s.end_at <= %s AND {shard_sql}
+              AND t.chat_id IS NOT NULL AND r.id IS NULL
+        """, (ended_from, ended_to, *shard_params))
+        schedules = cursor.fetchall()
+        cursor.close()
+        return schedules
+    finally:
+        conn.close()
+
+def create_report_stubs(schedule_ids):
+    """Создать пустые записи отчётов для занятий одной вставкой"""
+    if not schedule_ids:
+        return
+    conn = db_pool.get_connection()
+    try:
         cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE telegram_id SET timezone = %s WHERE telegram_id = %s",
-            (timezone_str, username)
+        cursor.executemany("""
+            INSERT INTO reports (schedule_id, report_text, sent)
+            VALUES (%s, '', FALSE)
+        """, [(schedule_id,) for schedule_id in schedule_ids])
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+
+def get_high_water_marks(names):
+    """Моменты, до которых фоновые задачи (по шардам) обработали все события: {name: value}"""
+    if not names:
+        return {}
+    conn = db_pool.get_connection()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        placeholders = ', '.join(['%s'] * len(names))
+        cursor.execute(f"SELECT name, value FROM bot_state WHERE name IN ({placeholders})", tuple(names))
+        marks = {row['name']: row['value'] for row in cursor.fetchall()}
+        cursor.close()
+        return marks
+    finally:
+        conn.close()
+
+def save_high_water_marks(names, value):
+    """Сохранить момент, до которого фоновые задачи (по шардам) обработали все события"""
+    if not names:
+        return
+    conn = db_pool.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.executemany(
+            "INSERT INTO bot_state (name, value) VALUES (%s, %s) ON DUPLICATE KEY UPDATE value = VALUES(value)",
+            [(name, value) for name in names]
         )
         conn.commit()
         cursor.close()
+    finally:
         conn.close()
-        return True
-    except Exception as e:
-        logger.error(f"Ошибка при обновлении timezone: {e}")
-        return False
 
-def convert_time_to_user_timezone(system_datetime, user_timezone_str):
-    """
-    Конвертировать время из системного часового пояса в пользовательский
-    system_datetime - datetime объект в системном времени (Саратов UTC+4)
-    user_timezone_str - строка часового пояса пользователя (например, 'Europe/Moscow')
+def as_lesson_time(value):
+    """TIME из БД: mysql.connector отдаёт timedelta от полуночи, SQLite — строку"""
+    if isinstance(value, timedelta):
+        return (datetime.min + value).time()
+    if isinstance(value, str):
+        return time.fromisoformat(value)
+    return value
+
+def materialize_series_rows(conn, date_from, date_to, shards, changed_since=None):
+    """Записать в schedule занятия серий шардов shards с датами в [date_from, date_to].
+    
+    Серии хранят только правило повторения, а напоминания и отчёты ссылаются на schedule.id — поэтому
+    строка появляется, когда к занятию подходит время напоминаний. Отменённые даты пропускаются, уже
+    записанные (в том числе перенесённые) не дублируются: INSERT IGNORE по (series_id, occurrence_date).
+    Если строки добавлены, версии их месяцев в schedule_version увеличиваются.
+    changed_since — только серии, созданные или изменённые с этого момента. Возвращает число новых строк.
     """
+    if not shards:
+        return 0
+    shard_sql, shard_params = shard_filter('tutor_id', shards)
+    sql = (
+        "SELECT id, tutor_id, student_id, subject_id, interval_weeks, time, duration_minutes, lesson_type, "
+        "start_date, end_date FROM lesson_series "
+        f"WHERE start_date <= %s AND (end_date IS NULL OR end_date >= %s) AND {shard_sql}"
+    )
+    params = [date_to, date_from, *shard_params]
+    if changed_since is not None:
+        sql += " AND updated_at >= %s"
+        params.append(changed_since)
+    
+    cursor = conn.cursor()
     try:
-        # Если передана строка вместо timezone объекта
-        if isinstance(user_timezone_str, str):
-            if user_timezone_str.startswith('UTC') or user_timezone_str.startswith('+'):
-                # Старый формат (например, '+04:00')
-                user_timezone_str = 'Europe/Saratov'  # По умолчанию
-            user_tz = pytz.timezone(user_timezone_str)
-        else:
-            user_tz = user_timezone_str
+        cursor.execute(sql, tuple(params))
+        series_rows = cursor.fetchall()
+        if not series_rows:
+            return 0
         
-        # Локализуем системное время
-        system_dt_localized = SYSTEM_TIMEZONE.localize(system_datetime) if system_datetime.tzinfo is None else system_datetime
+        placeholders = ', '.join(['%s'] * len(series_rows))
+        cursor.execute(
+            f"SELECT series_id, occurrence_date FROM lesson_series_exception "
+            f"WHERE series_id IN ({placeholders}) AND occurrence_date >= %s AND occurrence_date <= %s",
+            (*(row[0] for row in series_rows), date_from, date_to)
+        )
+        cancelled = set(cursor.fetchall())
         
-        # Конвертируем в пользовательский часовой пояс
-        user_dt = system_dt_localized.astimezone(user_tz)
+        rows = []
+        for series_id, tutor_id, student_id, subject_id, interval_weeks, lesson_time, duration, lesson_type, start_date, end_date in series_rows:
+            lesson_time = as_lesson_time(lesson_time)
+            for occurrence_date in series_occurrence_dates(start_date, end_date, interval_weeks, date_from, date_to):
+                if (series_id, occurrence_date) in cancelled:
+                    continue
+                start_at = datetime.combine(occurrence_date, lesson_time)
+                rows.append((
+                    tutor_id, student_id, subject_id, occurrence_date, lesson_time, lesson_type, duration,
+                    start_at, start_at + timedelta(minutes=duration or 60), series_id, occurrence_date
+                ))
+        if not rows:
+            return 0
+        cursor.executemany(
+            "INSERT IGNORE INTO schedule (tutor_id, student_id, subject_id, date, time, lesson_type, duration_minutes, "
+            "start_at, end_at, series_id, occurrence_date) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+            rows
+        )
+        created = max(cursor.rowcount, 0)
+        if created:
+            # У занятий в /get_month_schedule появился id: версии их месяцев (ETag и кэш админки)
+            # увеличиваются в той же транзакции, как bump_schedule_versions в app.py
+            cursor.executemany(
+                "INSERT INTO schedule_version (scope, version) VALUES (%s, 1) ON DUPLICATE KEY UPDATE version = version + 1",
+                [(scope,) for scope in sorted({row[3].strftime('%Y-%m') for row in rows})]
+            )
+        conn.commit()
+        return created
+    finally:
+        cursor.close()
+
+def materialize_series(date_from, date_to, shards, changed_since=None):
+    """Записать занятия серий в schedule (см. materialize_series_rows)"""
+    conn = db_pool.get_connection()
+    try:
+        return materialize_series_rows(conn, date_from, date_to, shards, changed_since)
+    finally:
+        conn.close()
+
+def get_lesson_starts(start_from, start_to, shards):
+    """Лёгкая выборка для планировщика: занятия шардов shards, начинающиеся в [start_from, start_to).
+    Занятия серий в этом окне сначала записываются в schedule"""
+    conn = db_pool.get_connection()
+    try:
+        if shards:
+            materialize_series_rows(conn, start_from.date(), (start_to - timedelta(microseconds=1)).date(), shards)
+        cursor = conn.cursor(dictionary=True)
+        lessons = []
+        if shards:
+            shard_sql, shard_params = shard_filter('tutor_id', shards)
+            cursor.execute(
+                f"SELECT id, tutor_id, start_at FROM schedule WHERE start_at >= %s AND start_at < %s AND {shard_sql}",
+                (start_from, start_to, *shard_params)
+            )
+            lessons = cursor.fetchall()
+        cursor.execute("SELECT COALESCE(MAX(updated_at), NOW()) AS watermark FROM schedule")
+        watermark = cursor.fetchone()['watermark']
+        cursor.close()
+        return lessons, watermark
+    finally:
+        conn.close()
+
+def get_changed_lessons(since):
+    """Занятия, созданные или изменённые начиная с since (по schedule.updated_at)"""
+    conn = db_pool.get_connection()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            "SELECT id, tutor_id, start_at, updated_at FROM schedule WHERE updated_at >= %s",
+            (since,)
+        )
+        lessons = cursor.fetchall()
+        cursor.close()
+        return lessons
+    finally:
+        conn.close()
+
+def get_lessons_for_reminders(schedule_ids):
+    """Актуальные данные занятий вместе с настройками напоминаний участников"""
+    if not schedule_ids:
+        return []
+    conn = db_pool.get_connection()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        placeholders = ', '.join(['%s'] * len(schedule_ids))
+        cursor.execute(f"""
+            SELECT
+                s.id, s.date, s.time, s.start_at, s.tutor_id, s.student_id,
+                s.lesson_type, s.duration_minutes,
+                sub.name as subject_name,
+                t1.telegram_id as tutor_username, t1.description as tutor_name, t1.chat_id as tutor_chat_id, t1.timezone as tutor_timezone,
+                t1.tutor_notify_day, t1.tutor_notify_hour, t1.tutor_notify_10min,
+                t2.telegram_id as student_username, t2.description as student_name, t2.chat_id as student_chat_id, t2.timezone as student_timezone,
+                t2.student_notify_day, t2.student_notify_hour, t2.student_notify_10min,
+                t2.parent_notify_day, t2.parent_notify_hour, t2.parent_notify_10min, t2.parent_id
+            FROM schedule s
+            JOIN subject sub ON s.subject_id = sub.id
+            JOIN telegram_id t1 ON s.tutor_id = t1.id
+            JOIN telegram_id t2 ON s.student_id = t2.id
+            WHERE s.id IN ({placeholders}) AND (t1.chat_id IS NOT NULL OR t2.chat_id IS NOT NULL)
+        """, tuple(schedule_ids))
+        schedules = cursor.fetchall()
+        cursor.close()
+        return schedules
+    finally:
+        conn.close()
+
+def claim_reminders(claims, claim_token):
+    """
+    Занять напоминания в таблице reminder (см. claim_reminder_rows).
+    Возвращает (занятые, {(schedule_id, reminder_type): claimed_at} занятых другой репликой и не отправленных)
+    """
+    conn = db_pool.get_connection()
+    try:
+        return claim_reminder_events(conn, claims, claim_token, datetime.now())
+    finally:
+        conn.close()
+
+def claim_reminder_events(conn, claims, claim_token, now):
+    """Занять напоминания и найти те из незанятых, что держит другая реплика (см. claim_reminders)"""
+    claimed = claim_reminder_rows(conn, claims, claim_token, now)
+    return claimed, busy_reminder_rows(conn, [claim for claim in claims if claim[:2] not in claimed])
+
+def claim_reminder_rows(conn, claims, claim_token, now, claim_timeout=None):
+    """
+    Занять напоминания: недостающие записи reminder создаются одной вставкой, затем
+    каждая занимается атомарным UPDATE. Занять можно свободную запись, запись для
+    прежнего времени занятия (занятие перенесли) и неотправленную запись, занятую
+    дольше claim_timeout (по умолчанию REMINDER_CLAIM_TIMEOUT) назад — реплика упала, не успев отправить.
+    claims — [(schedule_id, reminder_type, lesson_start)].
+    Возвращает множество занятых этим вызовом (schedule_id, reminder_type).
+    """
+    if not claims:
+        return set()
+    claim_timeout = claim_timeout or REMINDER_CLAIM_TIMEOUT
+    cursor = conn.cursor()
+    cursor.executemany(
+        "INSERT IGNORE INTO reminder (schedule_id, reminder_type, sent) VALUES (%s, %s, FALSE)",
+        [(schedule_id, reminder_type) for schedule_id, reminder_type, _ in claims]
+    )
+    cursor.executemany("""
+        UPDATE reminder
+        SET claim_token = %s, claimed_at = %s, lesson_start = %s, sent = FALSE,
+            tutor_status = NULL, student_status = NULL, parent_status = NULL
+        WHERE schedule_id = %s AND reminder_type = %s
+          AND (claim_token IS NULL OR lesson_start IS NULL OR lesson_start <> %s
+               OR (sent = FALSE AND claimed_at < %s))
+    """, [
+        (claim_token, now, start, schedule_id, reminder_type, start, now - claim_timeout)
+        for schedule_id, reminder_type, start in claims
+    ])
+    conn.commit()
+    cursor.execute("SELECT schedule_id, reminder_type FROM reminder WHERE claim_token = %s", (claim_token,))
+    claimed = {(row[0], row[1]) for row in cursor.fetchall()}
+    cursor.close()
+    return claimed
+
+def busy_reminder_rows(conn, claims):
+    """Неотправленные напоминания из claims, занятые другой репликой: {(schedule_id, reminder_type): claimed_at}"""
+    if not claims:
+        return {}
+    cursor = conn.cursor()
+    placeholders = ', '.join(['%s'] * len(claims))
+    cursor.execute(
+        f"SELECT schedule_id, reminder_type, claimed_at FROM reminder "
+        f"WHERE schedule_id IN ({placeholders}) AND sent = FALSE AND claim_token IS NOT NULL",
+        tuple(sorted({schedule_id for schedule_id, _, _ in claims}))
+    )
+    wanted = {claim[:2] for claim in claims}
+    busy = {(row[0], row[1]): row[2] for row in cursor.fetchall() if (row[0], row[1]) in wanted}
+    cursor.close()
+    return busy
+
+def release_reminders(claim_token):
+    """Снять занятие с неотправленных напоминаний (см. release_reminder_rows)"""
+    conn = db_pool.get_connection()
+    try:
+        release_reminder_rows(conn, claim_token)
+    finally:
+        conn.close()
+
+def release_reminder_rows(conn, claim_token):
+    """Освободить неотправленные напоминания, занятые claim_token: их сразу может занять любая реплика"""
+    cursor = conn.cursor()
+    cursor.execute(
+        "UPDATE reminder SET claim_token = NULL, claimed_at = NULL WHERE claim_token = %s AND sent = FALSE",
+        (claim_token,)
+    )
+    conn.commit()
+    cursor.close()
+
+def record_reminder_deliveries(deliveries):
+    """Сохранить результат доставки по каждому получателю (см. record_reminder_rows)"""
+    if not deliveries:
+        return
+    conn = db_pool.get_connection()
+    try:
+        record_reminder_rows(conn, deliveries, datetime.now())
+    finally:
+        conn.close()
+
+def record_reminder_rows(conn, deliveries, now):
+    """Отметить напоминания отправленными: [(schedule_id, reminder_type, {получатель: статус})]"""
+    cursor = conn.cursor()
+    cursor.executemany("""
+        UPDATE reminder
+        SET sent = TRUE, sent_at = %s, last_sent = %s,
+            tutor_status = %s, student_status = %s, parent_status = %s
+        WHERE schedule_id = %s AND reminder_type = %s
+    """, [
+        (now, now, statuses['tutor'], statuses['student'], statuses['parent'], schedule_id, reminder_type)
+        for schedule_id, reminder_type, statuses in deliveries
+    ])
+    conn.commit()
+    cursor.close()
+
+class ShardLeases:
+    """
+    Аренда шардов напоминаний между репликами бота через таблицу reminder_lease.
+    
+    Шард занятия — tutor_id % shard_count. Каждая реплика пишет пульс в bot_state
+    (worker:<id>), по живым пульсам считает свою долю шардов, продлевает свои аренды,
+    отдаёт лишние и забирает свободные или просроченные атомарным UPDATE. Если реплика
+    умерла, её аренды истекают через ttl и шарды (вместе с досылкой по high-water mark)
+    переходят к остальным. Повторную отправку на стыке исключают занятия в reminder.
+    """
+
+    def __init__(self, worker_id, shard_count, ttl):
+        self.worker_id = worker_id
+        self.shard_count = shard_count
+        self.ttl = ttl
+        self.owned = frozenset()
+        self.version = 0  # Увеличивается при каждом изменении набора шардов
+        self._valid_until = None
+        self._lease_rows_ready = False
+        self._counters = {'renewals': 0, 'acquired': 0, 'released': 0, 'lost': 0}
+
+    @property
+    def heartbeat_name(self):
+        return f"worker:{self.worker_id}"
+
+    def shard_of(self, tutor_id):
+        return tutor_id % self.shard_count
+
+    def current(self, now):
+        """Шарды, которыми реплика владеет сейчас (пусто, если аренду давно не продлевали)"""
+        if self._valid_until is None or now >= self._valid_until:
+            return frozenset()
+        return self.owned
+
+    def renew(self, conn, now):
+        """Продлить аренды и перераспределить шарды. Возвращает набор своих шардов"""
+        cursor = conn.cursor()
+        if not self._lease_rows_ready:
+            cursor.executemany(
+                "INSERT IGNORE INTO reminder_lease (shard) VALUES (%s)",
+                [(shard,) for shard in range(self.shard_count)]
+            )
+            self._lease_rows_ready = True
+        
+        # Пульс реплики и число живых реплик
+        cursor.execute("INSERT IGNORE INTO bot_state (name, value) VALUES (%s, %s)", (self.heartbeat_name, now))
+        cursor.execute("UPDATE bot_state SET value = %s WHERE name = %s", (now, self.heartbeat_name))
+        cursor.execute("DELETE FROM bot_state WHERE name LIKE %s AND value < %s", ('worker:%', now - self.ttl * 10))
+        cursor.execute("SELECT COUNT(*) FROM bot_state WHERE name LIKE %s AND value >= %s", ('worker:%', now - self.ttl))
+        workers = max(1, cursor.fetchone()[0])
+        target = -(-self.shard_count // workers)
+        
+        # Продлеваем свои аренды (просроченные могли уже забрать другие)
+        expires_at = now + self.ttl
+        cursor.execute(
+            "UPDATE reminder_lease SET expires_at = %s WHERE owner = %s AND expires_at >= %s",
+            (expires_at, self.worker_id, now)
+        )
+        cursor.execute("SELECT shard FROM reminder_lease WHERE owner = %s AND expires_at >= %s", (self.worker_id, now))
+        owned = sorted(row[0] for row in cursor.fetchall())
+        
+        if len(owned) > target:
+            # Отдаём лишние шарды новым репликам
+            extra = owned[target:]
+            cursor.executemany(
+                "UPDATE reminder_lease SET owner = NULL, expires_at = NULL WHERE shard = %s AND owner = %s",
+                [(shard, self.worker_id) for shard in extra]
+            )
+            owned = owned[:target]
+            self._counters['released'] += len(extra)
+        elif len(owned) < target:
+            # Забираем свободные и просроченные
+            cursor.execute(
+                "SELECT shard FROM reminder_lease WHERE owner IS NULL OR expires_at < %s ORDER BY shard",
+                (now,)
+            )
+            for shard in [row[0] for row in cursor.fetchall()]:
+                if len(owned) >= target:
+                    break
+                cursor.execute(
+                    "UPDATE reminder_lease SET owner = %s, expires_at = %s "
+                    "WHERE shard = %s AND (owner IS NULL OR expires_at < %s)",
+                    (self.worker_id, expires_at, shard, now)
+                )
+                if cursor.rowcount == 1:
+                    owned.append(shard)
+                    self._counters['acquired'] += 1
+        conn.commit()
+        cursor.close()
         
-        return user_dt
-    except Exception as e:
-        logger.error(f"Ошибка конвертации времени: {e}")
-        return system_datetime
+        owned = frozenset(owned)
+        if owned != self.owned:
+            self._counters['lost'] += len(self.owned - owned)
+            logger.info(f"Реплика {self.worker_id}: шарды напоминаний {sorted(owned)} (реплик: {workers})")
+            self.owned = owned
+            self.version += 1
+        self._valid_until = expires_at
+        self._counters['renewals'] += 1
+        return owned
+
+    def release_all(self, conn):
+        """Отдать все шарды и убрать пульс (при штатной остановке)"""
+        cursor = conn.cursor()
+        cursor.execute("UPDATE reminder_lease SET owner = NULL, expires_at = NULL WHERE owner = %s", (self.worker_id,))
+        cursor.execute("DELETE FROM bot_state WHERE name = %s", (self.heartbeat_name,))
+        conn.commit()
+        cursor.close()
+        self.owned = frozenset()
+        self._valid_until = None
+        self.version += 1
+
+    def stats(self):
+        result = dict(self._counters)
+        result['worker_id'] = self.worker_id
+        result['owned'] = sorted(self.owned)
+        return result
+
+shard_leases = ShardLeases(WORKER_ID, REMINDER_SHARDS, REMINDER_LEASE_TTL)
+
+def renew_shard_leases():
+    conn = db_pool.get_connection()
+    try:
+        return shard_leases.renew(conn, datetime.now())
+    finally:
+        conn.close()
+
+def release_shard_leases():
+    conn = db_pool.get_connection()
+    try:
+        shard_leases.release_all(conn)
+    finally:
+        conn.close()
+
+def resolve_parents(parent_ids):
+    """
+    Найти родителей по parent_id учеников одним запросом: {parent_id: данные родителя}.
+    parent_id может храниться как numeric id или как telegram_id; обе ветки идут по индексам
+    (PRIMARY и UNIQUE telegram_id), совпадение по id важнее.
+    """
+    parent_ids = {str(parent_id) for parent_id in parent_ids if parent_id}
+    if not parent_ids:
+        return {}
+    numeric_ids = [int(parent_id) for parent_id in parent_ids if parent_id.isdigit()]
+    conn = db_pool.get_connection()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        columns = "id, telegram_id, chat_id, timezone, parent_notify_day, parent_notify_hour, parent_notify_10min"
+        queries = [f"SELECT {columns} FROM telegram_id WHERE telegram_id IN ({', '.join(['%s'] * len(parent_ids))})"]
+        params = list(parent_ids)
+        if numeric_ids:
+            queries.append(f"SELECT {columns} FROM telegram_id WHERE id IN ({', '.join(['%s'] * len(numeric_ids))})")
+            params.extend(numeric_ids)
+        cursor.execute(" UNION ALL ".join(queries), tuple(params))
+        rows = cursor.fetchall()
+        cursor.close()
+    finally:
+        conn.close()
+    
+    by_id = {str(row['id']): row for row in rows}
+    by_username = {row['telegram_id']: row for row in rows}
+    parents = {}
+    for parent_id in parent_ids:
+        parent_info = by_id.get(parent_id) or by_username.get(parent_id)
+        if parent_info:
+            parents[parent_id] = parent_info
+    return parents
 
 def get_main_keyboard():
     """Получить главную клавиатуру с кнопками"""
@@ -188,8 +1521,34 @@ async def set_menu_button(bot, chat_id: int, username: str):
                 web_app=WebAppInfo(url=f"{WEBAPP_URL}?username={username}")
             )
         )
+        return True
     except Exception as e:
         logger.error(f"Ошибка при установке кнопки меню: {e}")
+        return False
+
+async def sync_chat_id(context, username, chat_id, user_info):
+    """Сохранить chat_id, только если он изменился или давно не обновлялся"""
+    saved = context.chat_data.get('saved_chat_id')  # (username, chat_id, когда сохранили)
+    if (
+        user_info.get('chat_id') == chat_id
+        and saved is not None
+        and saved[:2] == (username, chat_id)
+        and monotonic() - saved[2] < CHAT_STATE_REFRESH_INTERVAL
+    ):
+        return
+    
+    if await run_db(save_chat_id, username, chat_id):
+        context.chat_data['saved_chat_id'] = (username, chat_id, monotonic())
+
+async def sync_menu_button(context, chat_id, username):
+    """Установить кнопку меню, только если она изменилась или давно не обновлялась"""
+    url = f"{WEBAPP_URL}?username={username}"
+    installed = context.chat_data.get('menu_button')  # (url, когда установили)
+    if installed is not None and installed[0] == url and monotonic() - installed[1] < CHAT_STATE_REFRESH_INTERVAL:
+        return
+    
+    if await set_menu_button(context.bot, chat_id, username):
+        context.chat_data['menu_button'] = (url, monotonic())
 
 # Команда /start
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -208,11 +1567,11 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         return
 
     # Проверяем, есть ли пользователь в базе
-    user_info = get_user_info(username)
+    user_info = await run_db(get_user_info, username)
     
     if user_info:
-        # Сохраняем chat_id в базу данных
-        save_chat_id(username, chat_id)
+        # Сохраняем chat_id в базу данных (если изменился)
+        await sync_chat_id(context, username, chat_id, user_info)
         
         # Отправляем лог о входе пользователя
         log_message = (
@@ -223,10 +1582,10 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
             f"🏷️ <b>Описание:</b> {user_info['description']}\n"
             f"⏰ <b>Время:</b> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
         )
-        await send_log_to_group(context.application, log_message)
+        send_log_to_group(context.application, log_message, 'login')
         
-        # Устанавливаем кнопку меню
-        await set_menu_button(context.bot, chat_id, username)
+        # Устанавливаем кнопку меню (если изменилась)
+        await sync_menu_button(context, chat_id, username)
         
         # Формируем приветственное сообщение
         if user_info['status'] == 'репетитор':
@@ -267,32 +1626,14 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     else:
         # Если пользователя нет в БД, проверим, указан ли он как родитель у кого-то
         try:
-            conn = mysql.connector.connect(**DB_CONFIG)
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT id FROM telegram_id WHERE parent_id = %s LIMIT 1", (username,))
-            has_parent_link = cursor.fetchone()
-            
             # Если есть связь как родитель и самого родителя нет в БД — создаём запись
-            cursor.execute("SELECT id FROM telegram_id WHERE telegram_id = %s", (username,))
-            existing_parent = cursor.fetchone()
+            display_name = (user.first_name or '') + ((' ' + user.last_name) if user.last_name else '')
+            created = await run_db(create_linked_parent, username, display_name.strip() or username, chat_id)
             
-            if has_parent_link and not existing_parent:
-                display_name = (user.first_name or '') + ((' ' + user.last_name) if user.last_name else '')
-                cursor2 = conn.cursor()
-                cursor2.execute(
-                    """
-                    INSERT INTO telegram_id (telegram_id, description, status, chat_id)
-                    VALUES (%s, %s, %s, %s)
-                    """,
-                    (username, display_name.strip() or username, 'родитель', chat_id)
-                )
-                conn.commit()
-                cursor2.close()
-                cursor.close()
-                conn.close()
+            if created:
                 # Повторно читаем инфо и приветствуем как родителя
-                user_info = get_user_info(username)
-                await set_menu_button(context.bot, chat_id, username)
+                user_info = await run_db(get_user_info, username)
+                await sync_menu_button(context, chat_id, username)
                 welcome_text = (
                     f"👋 Добро пожаловать, {user.first_name or username}!\n\n"
                     f"👨‍👧 Вы авторизованы как родитель\n\n"
@@ -304,9 +1645,6 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
                 )
                 await update.message.reply_text(text=welcome_text, reply_markup=get_main_keyboard())
                 return
-            else:
-                cursor.close()
-                conn.close()
         except Exception as e:
             logger.error(f"Ошибка автосоздания родителя: {e}")
         
@@ -334,14 +1672,14 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         return
 
     # Проверяем, есть ли пользователь в базе
-    user_info = get_user_info(username)
+    user_info = await run_db(get_user_info, username)
     
     if user_info:
-        # Сохраняем chat_id в базу данных
-        save_chat_id(username, chat_id)
+        # Сохраняем chat_id в базу данных (если изменился)
+        await sync_chat_id(context, username, chat_id, user_info)
         
-        # Устанавливаем кнопку меню
-        await set_menu_button(context.bot, chat_id, username)
+        # Устанавливаем кнопку меню (если изменилась)
+        await sync_menu_button(context, chat_id, username)
         
         # Обработка кнопок
         if message_text == "📅 Расписание":
@@ -354,7 +1692,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                 f"🏷️ <b>Описание:</b> {user_info['description']}\n"
                 f"⏰ <b>Время:</b> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
             )
-            await send_log_to_group(context.application, log_message)
+            send_log_to_group(context.application, log_message, 'schedule_view')
             
             # Создаем inline кнопку с WebApp
             keyboard = [
@@ -458,11 +1796,11 @@ async def handle_timezone_callback(update: Update, context: ContextTypes.DEFAULT
     timezone_str = callback_data[3:]  # Убираем префикс "tz:"
     
     # Обновляем часовой пояс в базе данных
-    if update_user_timezone(username, timezone_str):
+    if await run_db(update_user_timezone, username, timezone_str):
         timezone_name = TIMEZONES.get(timezone_str, timezone_str)
         
         # Получаем информацию о пользователе
-        user_info = get_user_info(username)
+        user_info = await run_db(get_user_info, username)
         
         # Отправляем лог о смене часового пояса
         if user_info:
@@ -474,7 +1812,7 @@ async def handle_timezone_callback(update: Update, context: ContextTypes.DEFAULT
                 f"🌍 <b>Новый часовой пояс:</b> {timezone_name}\n"
                 f"⏰ <b>Время:</b> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
             )
-            await send_log_to_group(context.application, log_message)
+            send_log_to_group(context.application, log_message, 'timezone')
         
         if user_info:
             # Пересоздаем клавиатуру с обновленной галочкой
@@ -510,28 +1848,10 @@ async def show_reports(update: Update, context: ContextTypes.DEFAULT_TYPE, user_
     if user_info['status'] != 'репетитор':
         await update.message.reply_text("❌ Отчёты доступны только для репетиторов.")
         return
-    
-    try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor(dictionary=True)
-        
-        # Получаем список неотправленных отчётов из таблицы reports
-        cursor.execute("""
-            SELECT r.id as report_id, s.id as schedule_id, s.date, s.time, s.lesson_type, s.duration_minutes,
-                   sub.name as subject_name,
-                   st.description as student_name
-            FROM reports r
-            JOIN schedule s ON r.schedule_id = s.id
-            JOIN subject sub ON s.subject_id = sub.id
-            JOIN telegram_id st ON s.student_id = st.id
-            WHERE s.tutor_id = %s AND r.sent = FALSE
-            ORDER BY s.date DESC, s.time DESC
-            LIMIT 20
-        """, (user_info['id'],))
-        
-        reports = cursor.fetchall()
-        cursor.close()
-        conn.close()
+    
+    try:
+        # Получаем список неотправленных отчётов из таблицы reports
+        reports = await run_db(get_pending_reports, user_info['id'])
         
         if not reports:
             await update.message.reply_text("✅ У вас нет неотправленных отчётов.")
@@ -656,33 +1976,16 @@ async def send_report(update, context) -> None:
     
     try:
         # Обновляем существующую запись отчёта в БД
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor(dictionary=True)
+        report_id = await run_db(save_report_content, schedule_id, report_text, photo_file_id)
         
-        # Находим ID существующей записи отчёта
-        cursor.execute("SELECT id FROM reports WHERE schedule_id = %s AND sent = FALSE", (schedule_id,))
-        report = cursor.fetchone()
-        
-        if not report:
+        if not report_id:
             message = "❌ Ошибка: запись отчёта не найдена."
             if hasattr(update, 'edit_message_text'):
                 await update.edit_message_text(message)
             else:
                 await update.message.reply_text(message)
-            cursor.close()
-            conn.close()
             return
         
-        report_id = report['id']
-        
-        # Обновляем запись отчёта
-        cursor.execute("""
-            UPDATE reports 
-            SET report_text = %s, photo_file_id = %s 
-            WHERE id = %s
-        """, (report_text, photo_file_id, report_id))
-        conn.commit()
-        
         # Отправляем отчёт в отдельный чат
         if not REPORTS_CHAT_ID:
             logger.error("REPORTS_CHAT_ID не установлен в переменных окружения")
@@ -691,24 +1994,13 @@ async def send_report(update, context) -> None:
                 await update.edit_message_text(message)
             else:
                 await update.message.reply_text(message)
-            cursor.close()
-            conn.close()
             return
         
         logger.info(f"Отправка отчёта {report_id} в чат {REPORTS_CHAT_ID}")
         
         try:
             # Получаем информацию о занятии
-            cursor.execute("""
-                SELECT s.date, s.time, sub.name as subject_name, 
-                       st.description as student_name, t.description as tutor_name
-                FROM schedule s
-                JOIN subject sub ON s.subject_id = sub.id
-                JOIN telegram_id st ON s.student_id = st.id
-                JOIN telegram_id t ON s.tutor_id = t.id
-                WHERE s.id = %s
-            """, (schedule_id,))
-            schedule_info = cursor.fetchone()
+            schedule_info = await run_db(get_schedule_summary, schedule_id)
             
             if schedule_info:
                 date_str = schedule_info['date'].strftime('%d.%m.%Y') if isinstance(schedule_info['date'], datetime) else schedule_info['date']
@@ -737,7 +2029,9 @@ async def send_report(update, context) -> None:
             
             # Отправляем сообщение с фото, если есть, иначе только текст
             if photo_file_id:
-                sent_message = await context.bot.send_photo(
+                sent_message = await outbound.send(
+                    PRIORITY_REPORT,
+                    context.bot.send_photo,
                     chat_id=REPORTS_CHAT_ID,
                     photo=photo_file_id,
                     caption=message_text,
@@ -745,7 +2039,9 @@ async def send_report(update, context) -> None:
                     reply_markup=reply_markup
                 )
             else:
-                sent_message = await context.bot.send_message(
+                sent_message = await outbound.send(
+                    PRIORITY_REPORT,
+                    context.bot.send_message,
                     chat_id=REPORTS_CHAT_ID,
                     text=message_text,
                     parse_mode='HTML',
@@ -761,13 +2057,8 @@ async def send_report(update, context) -> None:
                 await update.edit_message_text(message)
             else:
                 await update.message.reply_text(message)
-            cursor.close()
-            conn.close()
             return
         
-        cursor.close()
-        conn.close()
-        
         # Очищаем контекст
         schedule_id_to_remove = context.user_data.pop('report_schedule_id', None)
         context.user_data.pop('report_text', None)
@@ -783,27 +2074,10 @@ async def send_report(update, context) -> None:
         # Обновляем список отчётов, если есть ссылка на сообщение со списком
         if 'reports_list_message_id' in context.user_data and 'reports_list_chat_id' in context.user_data:
             try:
-                user_info = get_user_info(update.effective_user.username)
+                user_info = await run_db(get_user_info, update.effective_user.username)
                 if user_info and user_info['status'] == 'репетитор':
                     # Получаем обновленный список отчётов
-                    conn2 = mysql.connector.connect(**DB_CONFIG)
-                    cursor2 = conn2.cursor(dictionary=True)
-                    cursor2.execute("""
-                        SELECT r.id as report_id, s.id as schedule_id, s.date, s.time, s.lesson_type, s.duration_minutes,
-                               sub.name as subject_name,
-                               st.description as student_name
-                        FROM reports r
-                        JOIN schedule s ON r.schedule_id = s.id
-                        JOIN subject sub ON s.subject_id = sub.id
-                        JOIN telegram_id st ON s.student_id = st.id
-                        WHERE s.tutor_id = %s AND r.sent = FALSE
-                        ORDER BY s.date DESC, s.time DESC
-                        LIMIT 20
-                    """, (user_info['id'],))
-                    
-                    reports = cursor2.fetchall()
-                    cursor2.close()
-                    conn2.close()
+                    reports = await run_db(get_pending_reports, user_info['id'])
                     
                     list_message_id = context.user_data.pop('reports_list_message_id', None)
                     list_chat_id = context.user_data.pop('reports_list_chat_id', None)
@@ -859,36 +2133,13 @@ async def handle_approve_report(update: Update, context: ContextTypes.DEFAULT_TY
     report_id = int(callback_data.split(":")[1])
     
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor(dictionary=True)
-        
-        # Получаем информацию об отчёте
-        cursor.execute("""
-            SELECT r.id, r.schedule_id, r.report_text, r.photo_file_id,
-                   s.date, s.time, s.student_id,
-                   sub.name as subject_name,
-                   st.description as student_name, st.parent_id,
-                   t.description as tutor_name
-            FROM reports r
-            JOIN schedule s ON r.schedule_id = s.id
-            JOIN subject sub ON s.subject_id = sub.id
-            JOIN telegram_id st ON s.student_id = st.id
-            JOIN telegram_id t ON s.tutor_id = t.id
-            WHERE r.id = %s
-        """, (report_id,))
-        
-        report_info = cursor.fetchone()
+        # Получаем информацию об отчёте и помечаем его как подтверждённый и отправленный
+        report_info = await run_db(approve_report, report_id)
         
         if not report_info:
             await query.edit_message_text("❌ Отчёт не найден")
-            cursor.close()
-            conn.close()
             return
         
-        # Помечаем отчёт как подтверждённый и отправленный
-        cursor.execute("UPDATE reports SET sent = TRUE WHERE id = %s", (report_id,))
-        conn.commit()
-        
         # Отправляем подтверждение
         await query.edit_message_text(
             query.message.text + "\n\n✅ <b>Подтверждено администратором</b>",
@@ -900,13 +2151,8 @@ async def handle_approve_report(update: Update, context: ContextTypes.DEFAULT_TY
         if report_info.get('parent_id'):
             try:
                 # Ищем родителя по parent_id
-                parent_cursor = conn.cursor(dictionary=True)
-                parent_cursor.execute(
-                    "SELECT chat_id, timezone FROM telegram_id WHERE id = %s OR telegram_id = %s LIMIT 1",
-                    (report_info['parent_id'], report_info['parent_id'])
-                )
-                parent_info = parent_cursor.fetchone()
-                parent_cursor.close()
+                parent_id = str(report_info['parent_id'])
+                parent_info = (await run_db(resolve_parents, [parent_id])).get(parent_id)
                 
                 logger.info(f"Найден родитель: {parent_info}, chat_id: {parent_info.get('chat_id') if parent_info else None}")
                 
@@ -940,14 +2186,18 @@ async def handle_approve_report(update: Update, context: ContextTypes.DEFAULT_TY
                         f"<b>Отчёт:</b>\n{report_info['report_text']}"
                     )
                     
-                    await context.bot.send_message(
+                    await outbound.send(
+                        PRIORITY_REPORT,
+                        context.bot.send_message,
                         chat_id=parent_info['chat_id'],
                         text=parent_message,
                         parse_mode='HTML'
                     )
                     
                     if report_info['photo_file_id']:
-                        await context.bot.send_photo(
+                        await outbound.send(
+                            PRIORITY_REPORT,
+                            context.bot.send_photo,
                             chat_id=parent_info['chat_id'],
                             photo=report_info['photo_file_id']
                         )
@@ -956,9 +2206,6 @@ async def handle_approve_report(update: Update, context: ContextTypes.DEFAULT_TY
             except Exception as e:
                 logger.error(f"Ошибка при отправке отчёта родителю: {e}")
         
-        cursor.close()
-        conn.close()
-        
     except Exception as e:
         logger.error(f"Ошибка при подтверждении отчёта: {e}")
         await query.edit_message_text("❌ Ошибка при подтверждении отчёта")
@@ -980,33 +2227,8 @@ async def handle_approve_edited_report(update: Update, context: ContextTypes.DEF
     report_info = context.user_data.get('editing_report_info', {})
     
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor(dictionary=True)
-        
-        # Обновляем отчёт с отредактированными данными
-        cursor.execute("""
-            UPDATE reports 
-            SET report_text = %s, photo_file_id = %s, sent = TRUE 
-            WHERE id = %s
-        """, (edited_text, edited_photo_id, report_id))
-        conn.commit()
-        
-        # Получаем полную информацию об отчёте для отправки родителю
-        cursor.execute("""
-            SELECT r.id, r.schedule_id, r.report_text, r.photo_file_id,
-                   s.date, s.time, s.student_id,
-                   sub.name as subject_name,
-                   st.description as student_name, st.parent_id,
-                   t.description as tutor_name
-            FROM reports r
-            JOIN schedule s ON r.schedule_id = s.id
-            JOIN subject sub ON s.subject_id = sub.id
-            JOIN telegram_id st ON s.student_id = st.id
-            JOIN telegram_id t ON s.tutor_id = t.id
-            WHERE r.id = %s
-        """, (report_id,))
-        
-        updated_report_info = cursor.fetchone()
+        # Обновляем отчёт с отредактированными данными и получаем полную информацию для отправки родителю
+        updated_report_info = await run_db(approve_edited_report, report_id, edited_text, edited_photo_id)
         
         # Обновляем сообщение с предпросмотром
         await query.edit_message_text(
@@ -1018,13 +2240,8 @@ async def handle_approve_edited_report(update: Update, context: ContextTypes.DEF
         if updated_report_info and updated_report_info.get('parent_id'):
             try:
                 # Ищем родителя по parent_id
-                parent_cursor = conn.cursor(dictionary=True)
-                parent_cursor.execute(
-                    "SELECT chat_id, timezone FROM telegram_id WHERE id = %s OR telegram_id = %s LIMIT 1",
-                    (updated_report_info['parent_id'], updated_report_info['parent_id'])
-                )
-                parent_info = parent_cursor.fetchone()
-                parent_cursor.close()
+                parent_id = str(updated_report_info['parent_id'])
+                parent_info = (await run_db(resolve_parents, [parent_id])).get(parent_id)
                 
                 if parent_info and parent_info.get('chat_id'):
                     # Форматируем дату и время
@@ -1057,14 +2274,18 @@ async def handle_approve_edited_report(update: Update, context: ContextTypes.DEF
                     
                     # Отправляем отчёт родителю
                     if updated_report_info.get('photo_file_id'):
-                        await context.bot.send_photo(
+                        await outbound.send(
+                            PRIORITY_REPORT,
+                            context.bot.send_photo,
                             chat_id=parent_info['chat_id'],
                             photo=updated_report_info['photo_file_id'],
                             caption=parent_message,
                             parse_mode='HTML'
                         )
                     else:
-                        await context.bot.send_message(
+                        await outbound.send(
+                            PRIORITY_REPORT,
+                            context.bot.send_message,
                             chat_id=parent_info['chat_id'],
                             text=parent_message,
                             parse_mode='HTML'
@@ -1080,9 +2301,6 @@ async def handle_approve_edited_report(update: Update, context: ContextTypes.DEF
         context.user_data.pop('edited_report_text', None)
         context.user_data.pop('edited_report_photo_id', None)
         
-        cursor.close()
-        conn.close()
-        
     except Exception as e:
         logger.error(f"Ошибка при подтверждении отредактированного отчёта: {e}")
         await query.edit_message_text("❌ Ошибка при подтверждении отредактированного отчёта")
@@ -1099,29 +2317,17 @@ async def handle_cancel_report(update: Update, context: ContextTypes.DEFAULT_TYP
     report_id = int(callback_data.split(":")[1])
     
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor(dictionary=True)
-        
-        # Проверяем, существует ли отчёт
-        cursor.execute("SELECT id, sent FROM reports WHERE id = %s", (report_id,))
-        report = cursor.fetchone()
+        # Удаляем отчёт из базы данных, если он существует и ещё не отправлен
+        result = await run_db(cancel_report, report_id)
         
-        if not report:
+        if result == 'not_found':
             await query.edit_message_text("❌ Отчёт не найден")
-            cursor.close()
-            conn.close()
             return
         
-        if report['sent']:
+        if result == 'sent':
             await query.edit_message_text("❌ Отчёт уже был отправлен")
-            cursor.close()
-            conn.close()
             return
         
-        # Удаляем отчёт из базы данных
-        cursor.execute("DELETE FROM reports WHERE id = %s", (report_id,))
-        conn.commit()
-        
         # Обновляем сообщение
         await query.edit_message_text(
             query.message.text + "\n\n❌ <b>Отменено администратором</b>",
@@ -1130,9 +2336,6 @@ async def handle_cancel_report(update: Update, context: ContextTypes.DEFAULT_TYP
         
         logger.info(f"Отчёт {report_id} отменён администратором")
         
-        cursor.close()
-        conn.close()
-        
     except Exception as e:
         logger.error(f"Ошибка при отмене отчёта: {e}")
         await query.edit_message_text("❌ Ошибка при отмене отчёта")
@@ -1149,27 +2352,8 @@ async def handle_edit_report(update: Update, context: ContextTypes.DEFAULT_TYPE)
     report_id = int(callback_data.split(":")[1])
     
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor(dictionary=True)
-        
         # Получаем информацию об отчёте
-        cursor.execute("""
-            SELECT r.id, r.schedule_id, r.report_text, r.photo_file_id, r.sent,
-                   s.date, s.time,
-                   sub.name as subject_name,
-                   st.description as student_name,
-                   t.description as tutor_name
-            FROM reports r
-            JOIN schedule s ON r.schedule_id = s.id
-            JOIN subject sub ON s.subject_id = sub.id
-            JOIN telegram_id st ON s.student_id = st.id
-            JOIN telegram_id t ON s.tutor_id = t.id
-            WHERE r.id = %s
-        """, (report_id,))
-        
-        report_info = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        report_info = await run_db(get_report_info, report_id)
         
         if not report_info:
             await query.edit_message_text("❌ Отчёт не найден")
@@ -1310,96 +2494,108 @@ async def handle_edited_report_photo(update: Update, context: ContextTypes.DEFAU
     )
     logger.info(f"Получено отредактированное фото для отчёта {report_id}")
 
+# Напоминание об отчёте: через сколько после конца занятия и сколько длится окно отправки
+REPORT_REMINDER_DELAY = timedelta(minutes=5)
+REPORT_REMINDER_TEST_DELAY = timedelta(minutes=1)  # Для тестовых занятий длительностью 2 минуты
+REPORT_REMINDER_WINDOW = timedelta(minutes=2)
+
+async def send_report_reminder(bot, schedule):
+    """Напомнить репетитору отправить отчёт о занятии"""
+    await outbound.send(
+        PRIORITY_REMINDER,
+        bot.send_message,
+        chat_id=schedule['tutor_chat_id'],
+        text=f"📋 Напоминание: отправьте отчёт о занятии\n\n"
+             f"📚 Предмет: {schedule['subject_name']}\n"
+             f"👤 Ученик: {schedule['student_name']}\n"
+             f"🕐 Время: {schedule['start_at'].strftime('%d.%m.%Y %H:%M')}\n\n"
+             f"Нажмите /start и выберите \"📊 Отчёты\" для отправки отчёта."
+    )
+    logger.info(f"Отправлено напоминание об отчёте репетитору {schedule['tutor_chat_id']}")
+    return True
+
 async def check_reports_reminders(application):
     """Проверка и отправка напоминаний о необходимости отправить отчёт"""
     logger.info("Задача check_reports_reminders запущена")
     
     while True:
         try:
+            tick_stats['check_reports_reminders'].beat()
+            tick_started = monotonic()
+            delivered = 0
             now = datetime.now()
+            shards = shard_leases.current(now)
+            mark_names = [f"report_reminders:{shard}" for shard in sorted(shards)]
+            marks = await run_db(get_high_water_marks, mark_names)
             
-            conn = mysql.connector.connect(**DB_CONFIG)
-            cursor = conn.cursor(dictionary=True)
-            
-            # Получаем все завершившиеся занятия
-            cursor.execute("""
-                SELECT s.id, s.date, s.time, s.duration_minutes, s.tutor_id,
-                       sub.name as subject_name,
-                       t.description as tutor_name, t.chat_id as tutor_chat_id,
-                       st.description as student_name
-                FROM schedule s
-                JOIN subject sub ON s.subject_id = sub.id
-                JOIN telegram_id t ON s.tutor_id = t.id
-                JOIN telegram_id st ON s.student_id = st.id
-                WHERE t.chat_id IS NOT NULL
-            """)
+            # Окно напоминаний: от самого раннего high-water mark своих шардов (после простоя или
+            # передачи шарда — пропущенные, но не устаревшие); для нового шарда — последние 2 минуты
+            window_start = min(
+                (
+                    max(marks[name], now - REPORT_REMINDER_MAX_LATENESS) if marks.get(name) else now - REPORT_REMINDER_WINDOW
+                    for name in mark_names
+                ),
+                default=now - REPORT_REMINDER_WINDOW
+            )
             
-            schedules = cursor.fetchall()
+            # Время напоминания = конец занятия + задержка (1 или 5 минут)
+            schedules = await run_db(
+                get_report_candidates,
+                window_start - REPORT_REMINDER_DELAY,
+                now - REPORT_REMINDER_TEST_DELAY,
+                shards
+            )
             
+            due = []
             for schedule in schedules:
-                # Вычисляем время начала занятия (MySQL TIME может прийти как timedelta)
-                try:
-                    schedule_time_value = schedule['time']
-                    if isinstance(schedule_time_value, timedelta):
-                        total_seconds = int(schedule_time_value.total_seconds())
-                        hours = (total_seconds // 3600) % 24
-                        minutes = (total_seconds % 3600) // 60
-                        seconds = total_seconds % 60
-                        schedule_time_obj = time(hours, minutes, seconds)
-                    elif isinstance(schedule_time_value, str):
-                        parts = schedule_time_value.split(":")
-                        schedule_time_obj = time(int(parts[0]), int(parts[1]), int(parts[2]) if len(parts) > 2 else 0)
-                    else:
-                        schedule_time_obj = schedule_time_value
-                except Exception as e:
-                    logger.error(f"Ошибка обработки времени (reports) для занятия {schedule['id']}: {e}, тип: {type(schedule['time'])}, значение: {schedule['time']}")
-                    continue
-
-                schedule_datetime = datetime.combine(schedule['date'], schedule_time_obj)
-                # Вычисляем время окончания занятия
-                end_datetime = schedule_datetime + timedelta(minutes=schedule['duration_minutes'])
                 # Время напоминания - через 5 минут после окончания (или 1 минута для тестовых занятий длительностью 2 минуты)
                 if schedule['duration_minutes'] == 2:
-                    reminder_delay = timedelta(minutes=1)  # Для тестовых занятий - 1 минута
+                    reminder_delay = REPORT_REMINDER_TEST_DELAY  # Для тестовых занятий - 1 минута
                 else:
-                    reminder_delay = timedelta(minutes=5)  # Для обычных занятий - 5 минут
-                reminder_time = end_datetime + reminder_delay
+                    reminder_delay = REPORT_REMINDER_DELAY  # Для обычных занятий - 5 минут
+                schedule['reminder_time'] = schedule['end_at'] + reminder_delay
+                
+                # Проверяем, что занятие завершилось и пора напомнить
+                if window_start <= schedule['reminder_time'] <= now:
+                    due.append(schedule)
+            
+            # Не больше REMINDER_CATCHUP_BURST за раз, начиная с самых давних
+            due.sort(key=lambda schedule: schedule['reminder_time'])
+            backlog = len(due) > REMINDER_CATCHUP_BURST
+            batch = due[:REMINDER_CATCHUP_BURST]
+            
+            if batch:
+                # Занимаем напоминания в reminder (тип 'report'): на стыке шардов другая реплика их не повторит
+                claimed = await run_db(
+                    claim_reminders,
+                    [(schedule['id'], 'report', schedule['start_at']) for schedule in batch],
+                    uuid.uuid4().hex
+                )
+                to_send = [schedule for schedule in batch if (schedule['id'], 'report') in claimed]
                 
-                # Проверяем, что занятие завершилось и пора напомнить (с окном в 2 минуты)
-                if now >= reminder_time and now < reminder_time + timedelta(minutes=2):
-                    # Проверяем, есть ли уже запись в reports для этого занятия
-                    cursor.execute("SELECT id FROM reports WHERE schedule_id = %s", (schedule['id'],))
-                    existing_report = cursor.fetchone()
+                if to_send:
+                    # Создаем записи в reports для всех занятий тика одной вставкой
+                    await run_db(create_report_stubs, [schedule['id'] for schedule in to_send])
+                    logger.info(f"Созданы записи отчётов для занятий: {', '.join(str(schedule['id']) for schedule in to_send)}")
                     
-                    if not existing_report:
-                        # Создаем запись в reports
-                        cursor.execute("""
-                            INSERT INTO reports (schedule_id, report_text, sent)
-                            VALUES (%s, '', FALSE)
-                        """, (schedule['id'],))
-                        conn.commit()
-                        
-                        logger.info(f"Создана запись отчёта для занятия {schedule['id']}")
-                        
-                        # Отправляем напоминание репетитору
-                        date_str = schedule['date'].strftime('%d.%m.%Y') if isinstance(schedule['date'], datetime) else schedule['date']
-                        time_str = str(schedule['time'])[:5] if isinstance(schedule['time'], time) else str(schedule['time'])
-                        
-                        await application.bot.send_message(
-                            chat_id=schedule['tutor_chat_id'],
-                            text=f"📋 Напоминание: отправьте отчёт о занятии\n\n"
-                                 f"📚 Предмет: {schedule['subject_name']}\n"
-                                 f"👤 Ученик: {schedule['student_name']}\n"
-                                 f"🕐 Время: {date_str} {time_str}\n\n"
-                                 f"Нажмите /start и выберите \"📊 Отчёты\" для отправки отчёта."
-                        )
-                        
-                        logger.info(f"Отправлено напоминание об отчёте репетитору {schedule['tutor_chat_id']}")
+                    # Отправляем напоминания репетиторам
+                    results = await run_bounded(
+                        [functools.partial(send_report_reminder, application.bot, schedule) for schedule in to_send],
+                        REMINDER_CONCURRENCY
+                    )
+                    await run_db(record_reminder_deliveries, [
+                        (schedule['id'], 'report', {'tutor': delivery_status(result), 'student': 'skipped', 'parent': 'skipped'})
+                        for schedule, result in zip(to_send, results)
+                    ])
+                    delivered = len(to_send)
             
-            cursor.close()
-            conn.close()
+            tick_stats['check_reports_reminders'].record(monotonic() - tick_started, delivered)
+            
+            # Запоминаем, до какого момента всё обработано
+            high_water = batch[-1]['reminder_time'] if backlog else now
+            await run_db(save_high_water_marks, mark_names, high_water)
             
-            await asyncio.sleep(60)  # Проверяем каждую минуту
+            await asyncio.sleep(REMINDER_CATCHUP_PAUSE if backlog else 60)  # Проверяем каждую минуту
             
         except Exception as e:
             logger.error(f"Ошибка при проверке напоминаний об отчётах: {e}")
@@ -1419,31 +2615,9 @@ async def send_reminder(bot, chat_id, schedule_data, user_status, time_before, u
             emoji = "🔔"
             time_text = "через 10 минут"
         
-        # Конвертируем время в часовой пояс пользователя
-        # schedule_data['time'] может быть time, timedelta или строка
-        schedule_date = schedule_data.get('date')  # Дата занятия
-        
-        # Создаем datetime объект в системном времени
-        if schedule_date:
-            schedule_time = schedule_data['time']
-            
-            # Обрабатываем разные типы schedule_time
-            if isinstance(schedule_time, timedelta):
-                # Конвертируем timedelta в time
-                total_seconds = int(schedule_time.total_seconds())
-                hours = (total_seconds // 3600) % 24
-                minutes = (total_seconds % 3600) // 60
-                schedule_time = time(hours, minutes)
-            elif isinstance(schedule_time, str):
-                # Если время пришло как строка HH:MM:SS
-                time_parts = schedule_time.split(':')
-                schedule_time = time(int(time_parts[0]), int(time_parts[1]), int(time_parts[2]) if len(time_parts) > 2 else 0)
-            # Если уже time объект, используем как есть
-            
-            system_datetime = datetime.combine(schedule_date, schedule_time)
-            
-            # Конвертируем в пользовательский часовой пояс
-            user_datetime = convert_time_to_user_timezone(system_datetime, user_timezone_str)
+        # Конвертируем время начала занятия в часовой пояс пользователя
+        if schedule_data.get('start_at'):
+            user_datetime = convert_time_to_user_timezone(schedule_data['start_at'], user_timezone_str)
             time_display = user_datetime.strftime('%H:%M')
         else:
             time_display = str(schedule_data['time'])
@@ -1466,7 +2640,7 @@ async def send_reminder(bot, chat_id, schedule_data, user_status, time_before, u
         else:
             message += f"👨‍🏫 Репетитор: {schedule_data['tutor_name']}"
         
-        await bot.send_message(chat_id=chat_id, text=message)
+        await outbound.send(PRIORITY_REMINDER, bot.send_message, chat_id=chat_id, text=message)
         logger.info(f"Отправлено напоминание пользователю {chat_id}")
 
         # Дополнительно отправляем лог администратору (в лог-группу)
@@ -1498,187 +2672,400 @@ async def send_reminder(bot, chat_id, schedule_data, user_status, time_before, u
                 f"⏰ <b>Тип напоминания:</b> {reminder_kind}\n"
             )
 
-            try:
-                await bot.send_message(
-                    chat_id=LOG_GROUP_ID,
-                    text=admin_message,
-                    parse_mode='HTML'
-                )
+            if log_digest.add('reminder', admin_message):
                 logger.info(
-                    f"Отправлен лог напоминания в LOG_GROUP_ID={LOG_GROUP_ID} "
+                    f"Лог напоминания добавлен в сводку для LOG_GROUP_ID={LOG_GROUP_ID} "
                     f"(расписание {schedule_data.get('id')}, получатель {recipient_role})"
                 )
-            except Exception as log_err:
-                logger.error(f"Ошибка при отправке лога напоминания администратору: {log_err}")
 
         return True
     except Exception as e:
         logger.error(f"Ошибка при отправке напоминания: {e}")
         return False
 
+# Напоминания: тип и за сколько до начала занятия отправлять (от раннего к позднему)
+REMINDER_LEADS = (
+    ('day', timedelta(hours=24)),
+    ('hour', timedelta(minutes=60)),
+    ('10min', timedelta(minutes=10)),
+)
+
+def parse_lateness(value):
+    """Разобрать строку вида "day:14400,hour:300" в словарь {тип: timedelta}"""
+    lateness = {}
+    for item in value.split(','):
+        if ':' not in item:
+            continue
+        kind, seconds = item.split(':', 1)
+        try:
+            lateness[kind.strip()] = timedelta(seconds=max(0, int(seconds)))
+        except ValueError:
+            logger.error(f"Некорректное значение в REMINDER_MAX_LATENESS: {item}")
+    return lateness
+
+# Насколько напоминание может опоздать и остаться осмысленным (например, если занятие
+# создано меньше чем за сутки или бот был недоступен); опоздавшее сильнее — пропускается
+REMINDER_LATENESS = {
+    'day': timedelta(hours=4),
+    'hour': timedelta(minutes=5),
+    '10min': timedelta(minutes=2),
+    **parse_lateness(REMINDER_MAX_LATENESS),
+}
+
+# Занятие упавшей реплики должно освободиться раньше, чем самое срочное напоминание устареет,
+# иначе перехватившая шард реплика не успеет его дослать
+_SHORTEST_LATENESS = min((value for value in REMINDER_LATENESS.values() if value), default=REMINDER_CLAIM_TIMEOUT * 2)
+if REMINDER_CLAIM_TIMEOUT > _SHORTEST_LATENESS / 2:
+    logger.warning(
+        f"REMINDER_CLAIM_TIMEOUT={REMINDER_CLAIM_TIMEOUT.total_seconds():.0f} сек не меньше допустимого опоздания "
+        f"напоминаний, используется {(_SHORTEST_LATENESS / 2).total_seconds():.0f} сек"
+    )
+    REMINDER_CLAIM_TIMEOUT = _SHORTEST_LATENESS / 2
+
+def reminder_is_stale(kind, start, now):
+    """Напоминание опоздало сильнее допустимого или уже наступило время более позднего напоминания"""
+    if now >= start:
+        return True
+    for index, (reminder_kind, lead) in enumerate(REMINDER_LEADS):
+        if reminder_kind == kind:
+            if now - (start - lead) > REMINDER_LATENESS[kind]:
+                return True
+            # Если пора слать более позднее напоминание, раннее уже не нужно
+            return any(start - later_lead <= now for _, later_lead in REMINDER_LEADS[index + 1:])
+    return True
+
+class ReminderScheduler:
+    """
+    Очередь точных моментов отправки напоминаний (min-heap).
+    
+    Занятия на сегодня и завтра загружаются один раз (и заново при смене даты),
+    дальше подтягиваются только изменённые строки schedule (по updated_at).
+    Перед отправкой данные занятий перечитываются, поэтому удалённые и перенесённые
+    занятия отсеиваются в момент срабатывания. Повторную отправку (после перезапуска
+    или повторной загрузки) исключает таблица reminder, а не память процесса.
+    
+    При загрузке пропускаются события не позже high-water mark своего шарда (уже
+    обработаны прошлым запуском или другой репликой); пропущенные во время простоя
+    досылаются, если ещё не устарели. В очередь попадают только занятия арендованных шардов.
+    """
+
+    def __init__(self, refresh_interval, shard_of):
+        self.refresh_interval = refresh_interval
+        self.shard_of = shard_of
+        self.shards = frozenset()
+        self._heap = []  # (fire_at, schedule_id, kind, start)
+        self._starts = {}  # schedule_id -> актуальное начало занятия
+        self._loaded_for = None
+        self._watermark = None
+        self._last_refresh = 0.0
+        self._counters = {
+            'full_loads': 0,
+            'refreshes': 0,
+            'changed_rows': 0,
+            'fired': 0,
+            'stale': 0,
+            'already_sent': 0,
+            'requeued': 0,
+            'caught_up': 0,
+        }
+
+    def needs_full_load(self, now, shards):
+        return self._loaded_for != now.date() or shards != self.shards
+
+    def needs_refresh(self):
+        return monotonic() - self._last_refresh >= self.refresh_interval
+
+    def refresh_since(self):
+        # Небольшой запас: строки, закоммиченные с опозданием, не потеряются
+        return self._watermark - timedelta(seconds=REMINDER_REFRESH_OVERLAP)
+
+    def invalidate(self):
+        """Сбросить очередь: следующая итерация загрузит горизонт заново (от high-water mark)"""
+        self._loaded_for = None
+
+    def load(self, lessons, watermark, now, shards, high_water):
+        """Полная загрузка горизонта (сегодня и завтра) для шардов shards; high_water — {шард: момент}"""
+        self._heap = []
+        self._starts = {}
+        self.shards = shards
+        for lesson in lessons:
+            self._track(lesson, now, high_water)
+        self._loaded_for = now.date()
+        self._watermark = watermark
+        self._last_refresh = monotonic()
+        self._counters['full_loads'] += 1
+        logger.info(f"Планировщик напоминаний: загружено {len(lessons)} занятий, событий в очереди: {len(self._heap)}")
+
+    def apply_changes(self, lessons, now):
+        """Учесть созданные и изменённые занятия"""
+        for lesson in lessons:
+            self._track(lesson, now)
+            if lesson['updated_at'] > self._watermark:
+                self._watermark = lesson['updated_at']
+        self._last_refresh = monotonic()
+        self._counters['refreshes'] += 1
+        self._counters['changed_rows'] += len(lessons)
+
+    def _track(self, lesson, now, high_water=None):
+        start = lesson['start_at']
+        shard = self.shard_of(lesson['tutor_id'])
+        if shard not in self.shards:
+            # Занятие другого шарда (или его передали другому репетитору)
+            self._starts.pop(lesson['id'], None)
+            return
+        if start is None or self._starts.get(lesson['id']) == start:
+            return
+        self._starts[lesson['id']] = start
+        # Занятия за пределами горизонта подхватит загрузка при смене даты
+        if not now.date() <= start.date() <= now.date() + timedelta(days=1):
+            return
+        for kind, lead in REMINDER_LEADS:
+            fire_at = start - lead
+            if high_water and high_water.get(shard) is not None and fire_at <= high_water[shard]:
+                continue
+            if not reminder_is_stale(kind, start, max(now, fire_at)):
+                heapq.heappush(self._heap, (fire_at, lesson['id'], kind, start))
+
+    def has_due(self, now):
+        return bool(self._heap) and self._heap[0][0] <= now
+
+    def pop_due(self, now, limit):
+        """Забрать из очереди до limit наступивших напоминаний: [(schedule_id, kind, start)]"""
+        due = []
+        while len(due) < limit and self.has_due(now):
+            fire_at, schedule_id, kind, start = heapq.heappop(self._heap)
+            if self._starts.get(schedule_id) != start or reminder_is_stale(kind, start, now):
+                self._counters['stale'] += 1
+                continue
+            if now - fire_at > timedelta(minutes=1):
+                self._counters['caught_up'] += 1
+            due.append((schedule_id, kind, start))
+        self._counters['fired'] += len(due)
+        return due
+
+    def requeue_busy(self, events, busy, claim_timeout):
+        """
+        Вернуть в очередь события, занятые другой репликой и ещё не отправленные: они сработают,
+        когда занятие истечёт (реплика могла упасть), если к тому времени не устареют.
+        events — [(schedule_id, kind, start)], busy — {(schedule_id, kind): claimed_at}. Возвращает число возвращённых.
+        """
+        requeued = 0
+        for schedule_id, kind, start in events:
+            claimed_at = busy.get((schedule_id, kind))
+            if claimed_at is None:
+                continue
+            retry_at = claimed_at + claim_timeout + timedelta(seconds=1)
+            if reminder_is_stale(kind, start, retry_at):
+                self._counters['stale'] += 1
+                continue
+            heapq.heappush(self._heap, (retry_at, schedule_id, kind, start))
+            requeued += 1
+        self._counters['requeued'] += requeued
+        return requeued
+
+    def note_already_sent(self, count):
+        """Учесть напоминания, которые уже заняты в таблице reminder (другим запуском)"""
+        self._counters['already_sent'] += count
+
+    def seconds_until_wake(self, now):
+        """Сколько спать до ближайшего события, обновления или смены даты"""
+        wake_in = self.refresh_interval - (monotonic() - self._last_refresh)
+        midnight = datetime.combine(now.date() + timedelta(days=1), time())
+        wake_in = min(wake_in, (midnight - now).total_seconds())
+        if self._heap:
+            wake_in = min(wake_in, (self._heap[0][0] - now).total_seconds())
+        return max(wake_in, 0.0)
+
+    def stats(self):
+        result = dict(self._counters)
+        result['queued'] = len(self._heap)
+        result['tracked'] = len(self._starts)
+        result['next_fire'] = self._heap[0][0].isoformat() if self._heap else None
+        return result
+
+reminder_scheduler = ReminderScheduler(REMINDER_REFRESH_INTERVAL, shard_leases.shard_of)
+
+class TickStats:
+    """Длительность тиков фоновой задачи, число доставок за тик и время последней итерации"""
+
+    def __init__(self, name):
+        self.name = name
+        self._last_beat = None
+        self._counters = {
+            'ticks': 0,
+            'deliveries': 0,
+            'last_duration': 0.0,
+            'max_duration': 0.0,
+            'total_duration': 0.0,
+        }
+
+    def record(self, duration, deliveries):
+        self._counters['ticks'] += 1
+        self._counters['deliveries'] += deliveries
+        self._counters['last_duration'] = duration
+        self._counters['max_duration'] = max(self._counters['max_duration'], duration)
+        self._counters['total_duration'] += duration
+        if deliveries:
+            logger.info(f"Тик {self.name}: {deliveries} отправок за {duration:.2f} сек")
+
+    def beat(self):
+        """Отметить, что цикл задачи прошёл очередную итерацию"""
+        self._last_beat = monotonic()
+
+    def seconds_since_beat(self):
+        return None if self._last_beat is None else monotonic() - self._last_beat
+
+    def stats(self):
+        result = dict(self._counters)
+        result['avg_duration'] = result['total_duration'] / (result['ticks'] or 1)
+        result['since_beat'] = self.seconds_since_beat()
+        return result
+
+tick_stats = {
+    'check_schedules': TickStats('check_schedules'),
+    'check_reports_reminders': TickStats('check_reports_reminders'),
+}
+
+async def run_bounded(jobs, limit):
+    """Выполнить асинхронные задания (функции без аргументов), не больше limit одновременно"""
+    semaphore = asyncio.Semaphore(limit)
+    
+    async def run(job):
+        async with semaphore:
+            return await job()
+    
+    return await asyncio.gather(*(run(job) for job in jobs), return_exceptions=True)
+
+REMINDER_RECIPIENTS = ('tutor', 'student', 'parent')
+
+def plan_reminder_deliveries(bot, schedule, reminder_kind, parents):
+    """
+    Собрать отправки напоминания репетитору, ученику и родителю (с учётом их настроек): {получатель: задание}.
+    parents — результат resolve_parents для всех занятий пачки.
+    """
+    deliveries = {}
+    # Отправляем репетитору (если включено)
+    if schedule['tutor_chat_id'] and schedule.get(f'tutor_notify_{reminder_kind}', True):
+        tutor_tz = schedule.get('tutor_timezone', 'Europe/Saratov')
+        deliveries['tutor'] = functools.partial(send_reminder, bot, schedule['tutor_chat_id'], schedule, 'репетитор', reminder_kind, tutor_tz)
+    # Отправляем ученику (если включено)
+    if schedule['student_chat_id'] and schedule.get(f'student_notify_{reminder_kind}', True):
+        student_tz = schedule.get('student_timezone', 'Europe/Saratov')
+        deliveries['student'] = functools.partial(send_reminder, bot, schedule['student_chat_id'], schedule, 'ученик', reminder_kind, student_tz)
+    # Отправляем родителю (если есть и включено)
+    parent_info = parents.get(str(schedule['parent_id'])) if schedule.get('parent_id') else None
+    if parent_info and parent_info.get('chat_id') and parent_info.get(f'parent_notify_{reminder_kind}', True):
+        parent_tz = parent_info.get('timezone', 'Europe/Saratov')
+        deliveries['parent'] = functools.partial(send_reminder, bot, parent_info['chat_id'], schedule, 'родитель', reminder_kind, parent_tz)
+    return deliveries
+
+def delivery_status(result):
+    """Статус доставки получателю по результату задания"""
+    if result is True:
+        return 'sent'
+    if result is None:
+        return 'skipped'
+    return 'failed'
+
+async def deliver_reminders(bot, claimed):
+    """
+    Доставить занятые напоминания параллельно (с ограничением) и сохранить статусы.
+    claimed — [(schedule, reminder_type)]. Возвращает число отправленных заданий.
+    """
+    # Родители всех занятий пачки — одним запросом
+    parents = await run_db(resolve_parents, {schedule['parent_id'] for schedule, _ in claimed if schedule.get('parent_id')})
+    plans = [(schedule, reminder_kind, plan_reminder_deliveries(bot, schedule, reminder_kind, parents)) for schedule, reminder_kind in claimed]
+    jobs = [recipients[name] for _, _, recipients in plans for name in REMINDER_RECIPIENTS if name in recipients]
+    results = iter(await run_bounded(jobs, REMINDER_CONCURRENCY))
+    
+    deliveries = []
+    for schedule, reminder_kind, recipients in plans:
+        statuses = {
+            name: delivery_status(next(results)) if name in recipients else 'skipped'
+            for name in REMINDER_RECIPIENTS
+        }
+        deliveries.append((schedule['id'], reminder_kind, statuses))
+    await run_db(record_reminder_deliveries, deliveries)
+    return len(jobs)
+
 async def check_schedules(application):
-    """Проверка расписания и отправка напоминаний"""
+    """Отправка напоминаний о занятиях по очереди точных моментов срабатывания"""
     logger.info("Задача check_schedules запущена")
-    sent_reminders = set()
+    scheduler = reminder_scheduler
+    high_water_saved = 0.0
+    claim_token = None
     
     while True:
         try:
+            tick_stats['check_schedules'].beat()
             now = datetime.now()
-            logger.debug(f"Проверка расписания в {now.strftime('%Y-%m-%d %H:%M:%S')}")
-            
-            # Подключаемся к БД
-            conn = mysql.connector.connect(**DB_CONFIG)
-            cursor = conn.cursor(dictionary=True)
-            
-            # Получаем расписание на сегодня и завтра
-            today = now.date()
-            tomorrow = (now + timedelta(days=1)).date()
-            
-            cursor.execute("""
-                SELECT
-                    s.id, s.date, s.time, s.tutor_id, s.student_id,
-                    s.lesson_type, s.duration_minutes,
-                    sub.name as subject_name,
-                    t1.telegram_id as tutor_username, t1.description as tutor_name, t1.chat_id as tutor_chat_id, t1.timezone as tutor_timezone,
-                    t1.tutor_notify_day, t1.tutor_notify_hour, t1.tutor_notify_10min,
-                    t2.telegram_id as student_username, t2.description as student_name, t2.chat_id as student_chat_id, t2.timezone as student_timezone,
-                    t2.student_notify_day, t2.student_notify_hour, t2.student_notify_10min,
-                    t2.parent_notify_day, t2.parent_notify_hour, t2.parent_notify_10min, t2.parent_id
-                FROM schedule s
-                JOIN subject sub ON s.subject_id = sub.id
-                JOIN telegram_id t1 ON s.tutor_id = t1.id
-                JOIN telegram_id t2 ON s.student_id = t2.id
-                WHERE s.date IN (%s, %s) AND (t1.chat_id IS NOT NULL OR t2.chat_id IS NOT NULL)
-            """, (today, tomorrow))
-            
-            schedules = cursor.fetchall()
+            shards = shard_leases.current(now)
+            if scheduler.needs_full_load(now, shards):
+                # Первый запуск, новая дата, смена шардов или восстановление после ошибки — загружаем
+                # занятия на сегодня и завтра, пропуская уже обработанное до high-water mark
+                marks = await run_db(get_high_water_marks, [f"reminders:{shard}" for shard in shards])
+                high_water = {shard: marks.get(f"reminders:{shard}") for shard in shards}
+                today_start = datetime.combine(now.date(), time())
+                lessons, watermark = await run_db(get_lesson_starts, today_start, today_start + timedelta(days=2), shards)
+                scheduler.load(lessons, watermark, now, shards, high_water)
+            elif scheduler.needs_refresh():
+                since = scheduler.refresh_since()
+                # Занятия новых и изменённых серий на сегодня и завтра попадают в schedule и в изменения ниже
+                await run_db(materialize_series, now.date(), now.date() + timedelta(days=1), scheduler.shards, since)
+                changed = await run_db(get_changed_lessons, since)
+                scheduler.apply_changes(changed, now)
             
-            for schedule in schedules:
-                # MySQL возвращает TIME как timedelta
-                try:
-                    if isinstance(schedule['time'], timedelta):
-                        # Конвертируем timedelta в time
-                        total_seconds = int(schedule['time'].total_seconds())
-                        hours = (total_seconds // 3600) % 24
-                        minutes = (total_seconds % 3600) // 60
-                        seconds = total_seconds % 60
-                        schedule_time = time(hours, minutes, seconds)
-                    elif isinstance(schedule['time'], str):
-                        # Если время пришло как строка HH:MM:SS
-                        time_parts = schedule['time'].split(':')
-                        schedule_time = time(int(time_parts[0]), int(time_parts[1]), int(time_parts[2]) if len(time_parts) > 2 else 0)
-                    else:
-                        # Если уже time объект
-                        schedule_time = schedule['time']
-                        
-                    schedule_datetime = datetime.combine(schedule['date'], schedule_time)
-                except Exception as e:
-                    logger.error(f"Ошибка обработки времени для занятия {schedule['id']}: {e}, тип: {type(schedule['time'])}, значение: {schedule['time']}")
-                    continue
-                time_diff = schedule_datetime - now
-                
-                # Уникальный ключ для напоминания
-                reminder_key = f"{schedule['id']}_{schedule['date']}_{schedule['time']}"
+            due = scheduler.pop_due(now, REMINDER_CATCHUP_BURST)
+            if due:
+                tick_started = monotonic()
+                schedule_ids = sorted({schedule_id for schedule_id, _, _ in due})
+                schedules = {row['id']: row for row in await run_db(get_lessons_for_reminders, schedule_ids)}
+                # Занятие удалено или перенесено после загрузки в очередь
+                candidates = [
+                    (schedule_id, reminder_kind, start) for schedule_id, reminder_kind, start in due
+                    if schedule_id in schedules and schedules[schedule_id]['start_at'] == start
+                ]
                 
-                # Проверяем напоминание за день
-                if timedelta(hours=20) <= time_diff <= timedelta(hours=28):
-                    day_key = f"{reminder_key}_day"
-                    if day_key not in sent_reminders:
-                        # Отправляем репетитору (если включено)
-                        if schedule['tutor_chat_id'] and schedule.get('tutor_notify_day', True):
-                            tutor_tz = schedule.get('tutor_timezone', 'Europe/Saratov')
-                            await send_reminder(application.bot, schedule['tutor_chat_id'], schedule, 'репетитор', 'day', tutor_tz)
-                        # Отправляем ученику (если включено)
-                        if schedule['student_chat_id'] and schedule.get('student_notify_day', True):
-                            student_tz = schedule.get('student_timezone', 'Europe/Saratov')
-                            await send_reminder(application.bot, schedule['student_chat_id'], schedule, 'ученик', 'day', student_tz)
-                        # Отправляем родителю (если есть)
-                        if schedule.get('parent_id'):
-                            try:
-                                parent_cursor = conn.cursor(dictionary=True)
-                                # parent_id может храниться как numeric id или как telegram_id (username)
-                                parent_cursor.execute(
-                                    "SELECT chat_id, timezone, parent_notify_day FROM telegram_id WHERE id = %s OR telegram_id = %s LIMIT 1",
-                                    (schedule['parent_id'], schedule['parent_id'])
-                                )
-                                parent_info = parent_cursor.fetchone()
-                                parent_cursor.close()
-                                if parent_info and parent_info.get('chat_id') and parent_info.get('parent_notify_day', True):
-                                    parent_tz = parent_info.get('timezone', 'Europe/Saratov')
-                                    await send_reminder(application.bot, parent_info['chat_id'], schedule, 'родитель', 'day', parent_tz)
-                            except Exception as e:
-                                logger.error(f"Ошибка при отправке напоминания родителю: {e}")
-                        sent_reminders.add(day_key)
-                
-                # Проверяем напоминание за час
-                elif timedelta(minutes=55) <= time_diff <= timedelta(minutes=65):
-                    hour_key = f"{reminder_key}_hour"
-                    if hour_key not in sent_reminders:
-                        # Отправляем репетитору (если включено)
-                        if schedule['tutor_chat_id'] and schedule.get('tutor_notify_hour', True):
-                            tutor_tz = schedule.get('tutor_timezone', 'Europe/Saratov')
-                            await send_reminder(application.bot, schedule['tutor_chat_id'], schedule, 'репетитор', 'hour', tutor_tz)
-                        # Отправляем ученику (если включено)
-                        if schedule['student_chat_id'] and schedule.get('student_notify_hour', True):
-                            student_tz = schedule.get('student_timezone', 'Europe/Saratov')
-                            await send_reminder(application.bot, schedule['student_chat_id'], schedule, 'ученик', 'hour', student_tz)
-                        # Отправляем родителю (если есть)
-                        if schedule.get('parent_id'):
-                            try:
-                                parent_cursor = conn.cursor(dictionary=True)
-                                parent_cursor.execute(
-                                    "SELECT chat_id, timezone, parent_notify_hour FROM telegram_id WHERE id = %s OR telegram_id = %s LIMIT 1",
-                                    (schedule['parent_id'], schedule['parent_id'])
-                                )
-                                parent_info = parent_cursor.fetchone()
-                                parent_cursor.close()
-                                if parent_info and parent_info.get('chat_id') and parent_info.get('parent_notify_hour', True):
-                                    parent_tz = parent_info.get('timezone', 'Europe/Saratov')
-                                    await send_reminder(application.bot, parent_info['chat_id'], schedule, 'родитель', 'hour', parent_tz)
-                            except Exception as e:
-                                logger.error(f"Ошибка при отправке напоминания родителю: {e}")
-                        sent_reminders.add(hour_key)
+                # Занимаем напоминания в таблице reminder: уже отправленные не повторяются, занятые
+                # другой репликой возвращаются в очередь до истечения её занятия
+                claim_token = uuid.uuid4().hex
+                claimed, busy = await run_db(claim_reminders, candidates, claim_token)
+                requeued = scheduler.requeue_busy(
+                    [event for event in candidates if event[:2] not in claimed], busy, REMINDER_CLAIM_TIMEOUT
+                )
+                scheduler.note_already_sent(len(candidates) - len(claimed) - requeued)
+                to_deliver = [
+                    (schedules[schedule_id], reminder_kind) for schedule_id, reminder_kind, _ in candidates
+                    if (schedule_id, reminder_kind) in claimed
+                ]
                 
-                # Проверяем напоминание за 10 минут
-                elif timedelta(minutes=8) <= time_diff <= timedelta(minutes=12):
-                    ten_min_key = f"{reminder_key}_10min"
-                    if ten_min_key not in sent_reminders:
-                        # Отправляем репетитору (если включено)
-                        if schedule['tutor_chat_id'] and schedule.get('tutor_notify_10min', True):
-                            tutor_tz = schedule.get('tutor_timezone', 'Europe/Saratov')
-                            await send_reminder(application.bot, schedule['tutor_chat_id'], schedule, 'репетитор', '10min', tutor_tz)
-                        # Отправляем ученику (если включено)
-                        if schedule['student_chat_id'] and schedule.get('student_notify_10min', True):
-                            student_tz = schedule.get('student_timezone', 'Europe/Saratov')
-                            await send_reminder(application.bot, schedule['student_chat_id'], schedule, 'ученик', '10min', student_tz)
-                        # Отправляем родителю (если есть)
-                        if schedule.get('parent_id'):
-                            try:
-                                parent_cursor = conn.cursor(dictionary=True)
-                                parent_cursor.execute(
-                                    "SELECT chat_id, timezone, parent_notify_10min FROM telegram_id WHERE id = %s OR telegram_id = %s LIMIT 1",
-                                    (schedule['parent_id'], schedule['parent_id'])
-                                )
-                                parent_info = parent_cursor.fetchone()
-                                parent_cursor.close()
-                                if parent_info and parent_info.get('chat_id') and parent_info.get('parent_notify_10min', True):
-                                    parent_tz = parent_info.get('timezone', 'Europe/Saratov')
-                                    await send_reminder(application.bot, parent_info['chat_id'], schedule, 'родитель', '10min', parent_tz)
-                            except Exception as e:
-                                logger.error(f"Ошибка при отправке напоминания родителю: {e}")
-                        sent_reminders.add(ten_min_key)
+                delivered = await deliver_reminders(application.bot, to_deliver)
+                claim_token = None
+                tick_stats['check_schedules'].record(monotonic() - tick_started, delivered)
             
-            # Очищаем старые записи
-            if len(sent_reminders) > 1000:
-                sent_reminders.clear()
+            if scheduler.has_due(now):
+                # Досылаем накопившееся пачками, не забивая очередь исходящих
+                await asyncio.sleep(REMINDER_CATCHUP_PAUSE)
+                continue
             
-            cursor.close()
-            conn.close()
+            # Всё, что должно было сработать до now, обработано
+            if due or monotonic() - high_water_saved >= REMINDER_REFRESH_INTERVAL:
+                await run_db(save_high_water_marks, [f"reminders:{shard}" for shard in scheduler.shards], now)
+                high_water_saved = monotonic()
             
-            await asyncio.sleep(60)  # Проверяем каждую минуту
+            await asyncio.sleep(scheduler.seconds_until_wake(datetime.now()))
             
         except Exception as e:
             logger.error(f"Ошибка при проверке расписания: {e}")
+            if claim_token:
+                # Занятые в этом тике, но не отправленные напоминания сразу доступны после перезагрузки
+                try:
+                    await run_db(release_reminders, claim_token)
+                except Exception as release_error:
+                    logger.error(f"Не удалось снять занятие напоминаний: {release_error}")
+                claim_token = None
+            # Снятые с очереди события могли потеряться — перезагрузимся от high-water mark
+            scheduler.invalidate()
             await asyncio.sleep(60)
 
 async def handle_cancel_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -1701,22 +3088,304 @@ async def handle_cancel_command(update: Update, context: ContextTypes.DEFAULT_TY
     else:
         await update.message.reply_text("❌ Нет активных операций для отмены")
 
+def collect_metrics():
+    """Собрать метрики бота в один словарь"""
+    return {
+        'db_pool': db_pool.stats(),
+        'db_executor': db_executor.stats(),
+        'user_cache': user_cache.stats(),
+        'outbound': outbound.stats(),
+        'log_digest': log_digest.stats(),
+        'reminder_scheduler': reminder_scheduler.stats(),
+        'shard_leases': shard_leases.stats(),
+        **({'webhook': webhook_listener.stats()} if webhook_listener else {}),
+        **{f'tick_{name}': stats.stats() for name, stats in tick_stats.items()},
+    }
+
+async def log_metrics(application):
+    """Периодически писать метрики в лог"""
+    logger.info("Задача log_metrics запущена")
+
+    while True:
+        await asyncio.sleep(METRICS_LOG_INTERVAL)
+        try:
+            for name, values in collect_metrics().items():
+                formatted = ', '.join(
+                    f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}"
+                    for key, value in values.items()
+                )
+                logger.info(f"Метрики {name}: {formatted}")
+        except Exception as e:
+            logger.error(f"Ошибка при сборе метрик: {e}")
+
+async def maintain_shard_leases(application):
+    """Продлевать аренду шардов напоминаний и подхватывать шарды упавших реплик"""
+    logger.info(f"Задача аренды шардов запущена (реплика {WORKER_ID})")
+    while True:
+        try:
+            await run_db(renew_shard_leases)
+        except Exception as e:
+            logger.error(f"Ошибка при продлении аренды шардов: {e}")
+        await asyncio.sleep(REMINDER_LEASE_TTL.total_seconds() / 3)
+
+HTTP_REASONS = {
+    200: 'OK', 400: 'Bad Request', 403: 'Forbidden', 404: 'Not Found',
+    405: 'Method Not Allowed', 408: 'Request Timeout', 413: 'Payload Too Large', 503: 'Service Unavailable',
+}
+
+class HttpRequestError(Exception):
+    """Запрос не удалось прочитать; status — код ответа клиенту"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+async def read_http_head(reader):
+    request_line = (await reader.readline()).decode('latin-1').split()
+    method, path = (request_line[0], request_line[1]) if len(request_line) >= 2 else ('', '')
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode('latin-1').strip()
+        if not line:
+            break
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return method, path, headers
+
+async def read_http_request(reader, max_body, timeout=WEBHOOK_READ_TIMEOUT):
+    """Прочитать HTTP-запрос: (метод, путь, заголовки в нижнем регистре, тело или None, если тело больше max_body).
+    
+    Заголовки и тело читаются не дольше timeout секунд каждое: медленный или молчащий клиент не держит
+    соединение (и остановку webhook) бесконечно. Ошибки — HttpRequestError с кодом 400 или 408.
+    """
+    try:
+        method, path, headers = await asyncio.wait_for(read_http_head(reader), timeout)
+    except asyncio.TimeoutError:
+        raise HttpRequestError(408, "заголовки запроса не получены вовремя")
+    
+    length_header = headers.get('content-length') or '0'
+    if not length_header.isdigit():
+        raise HttpRequestError(400, f"неверный Content-Length: {length_header!r}")
+    length = int(length_header)
+    if length > max_body:
+        return method, path, headers, None
+    try:
+        body = await asyncio.wait_for(reader.readexactly(length), timeout) if length else b''
+    except asyncio.TimeoutError:
+        raise HttpRequestError(408, "тело запроса не получено вовремя")
+    except asyncio.IncompleteReadError:
+        raise HttpRequestError(400, "соединение закрыто до конца тела запроса")
+    return method, path, headers, body
+
+async def write_http_response(writer, status, payload=None):
+    """Отправить ответ с JSON-телом и закрыть соединение"""
+    body = json.dumps(payload if payload is not None else {}, ensure_ascii=False, default=str).encode()
+    writer.write(
+        f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\nContent-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+
+class WebhookListener:
+    """Приём обновлений от Telegram по HTTP: проверка секрета и передача в очередь обновлений приложения"""
+
+    def __init__(self, application, path, secret_token, max_body=WEBHOOK_MAX_BODY, read_timeout=WEBHOOK_READ_TIMEOUT):
+        self.application = application
+        self.path = path
+        self.secret_token = secret_token
+        self.max_body = max_body
+        self.read_timeout = read_timeout
+        self._server = None
+        self._in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._counters = {'received': 0, 'rejected': 0, 'invalid': 0}
+
+    @property
+    def serving(self):
+        return self._server is not None and self._server.is_serving()
+
+    async def start(self, host, port):
+        self._server = await asyncio.start_server(self._handle, host, port)
+        logger.info(f"Приём обновлений по webhook на {host}:{port}{self.path}")
+
+    async def stop(self, timeout=WEBHOOK_DRAIN_TIMEOUT):
+        """Перестать принимать соединения и дождаться запросов, которые уже в обработке"""
+        if self._server is None:
+            return
+        self._server.close()
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Webhook: {self._in_flight} запросов не завершились за {timeout} сек")
+        logger.info("Приём обновлений по webhook остановлен")
+
+    async def _handle(self, reader, writer):
+        self._in_flight += 1
+        self._idle.clear()
+        try:
+            status = await self._process(reader)
+            await write_http_response(writer, status)
+        except Exception as e:
+            logger.error(f"Ошибка обработки запроса webhook: {e}")
+        finally:
+            writer.close()
+            self._in_flight -= 1
+            if not self._in_flight:
+                self._idle.set()
+
+    async def _process(self, reader):
+        """Разобрать запрос и поставить обновление в очередь; вернуть HTTP-статус ответа"""
+        try:
+            method, path, headers, body = await read_http_request(reader, self.max_body, self.read_timeout)
+        except HttpRequestError as e:
+            self._counters['invalid'] += 1
+            logger.warning(f"Webhook: {e}")
+            return e.status
+        if path != self.path:
+            return 404
+        if method != 'POST':
+            return 405
+        secret = headers.get('x-telegram-bot-api-secret-token', '')
+        if not hmac.compare_digest(secret.encode(), self.secret_token.encode()):
+            self._counters['rejected'] += 1
+            logger.warning("Webhook: запрос с неверным секретным токеном отклонён")
+            return 403
+        if body is None:
+            self._counters['invalid'] += 1
+            return 413
+        try:
+            update = Update.de_json(json.loads(body), self.application.bot)
+        except Exception as e:
+            self._counters['invalid'] += 1
+            logger.warning(f"Webhook: не удалось разобрать обновление: {e}")
+            return 400
+        # Обновление считается принятым, как только оно в очереди: при остановке
+        # Application.stop() обработает всё, что в неё попало
+        await self.application.update_queue.put(update)
+        self._counters['received'] += 1
+        return 200
+
+    def stats(self):
+        return {**self._counters, 'in_flight': self._in_flight, 'serving': self.serving}
+
+webhook_listener = None
+
+def health_status(application):
+    """Состояние процесса: (здоров ли, подробности)"""
+    problems = []
+    if BOT_MODE in ('all', 'worker'):
+        for name in ('check_schedules', 'check_reports_reminders'):
+            since_beat = tick_stats[name].seconds_since_beat()
+            if since_beat is None or since_beat > HEALTH_STALE_AFTER:
+                problems.append(f"{name} не отвечает")
+    if BOT_MODE in ('all', 'poller'):
+        if UPDATE_MODE == 'webhook':
+            receiving = webhook_listener is not None and webhook_listener.serving
+        else:
+            receiving = application.updater is not None and application.updater.running
+        if not receiving:
+            problems.append("получение обновлений остановлено")
+    details = {
+        'mode': BOT_MODE,
+        'update_mode': UPDATE_MODE,
+        'worker_id': WORKER_ID,
+        'problems': problems,
+        'metrics': collect_metrics(),
+    }
+    return not problems, details
+
+async def serve_health(application):
+    """HTTP-проверка здоровья: GET /health — 200 или 503 с метриками в JSON"""
+    async def handle(reader, writer):
+        try:
+            await read_http_request(reader, 0)
+            healthy, details = health_status(application)
+            await write_http_response(writer, 200 if healthy else 503, details)
+        except Exception as e:
+            logger.error(f"Ошибка проверки здоровья: {e}")
+        finally:
+            writer.close()
+    
+    server = await asyncio.start_server(handle, '0.0.0.0', HEALTH_PORT)
+    logger.info(f"Проверка здоровья доступна на порту {HEALTH_PORT} (режим {BOT_MODE})")
+    async with server:
+        await server.serve_forever()
+
 async def post_init(application: Application) -> None:
-    """Запуск фоновых задач после инициализации бота"""
-    # Запускаем задачу проверки расписания
-    logger.info("Запуск задачи проверки расписания...")
-    asyncio.create_task(check_schedules(application))
+    """Запуск фоновых задач после инициализации бота (набор зависит от режима)"""
+    # Запускаем очередь исходящих сообщений и сводку логов
+    outbound.start()
+    log_digest.start(application.bot)
     
-    # Запускаем задачу проверки напоминаний об отчётах
-    logger.info("Запуск задачи проверки напоминаний об отчётах...")
-    asyncio.create_task(check_reports_reminders(application))
+    if BOT_MODE in ('all', 'worker'):
+        # Арендуем шарды напоминаний до запуска задач, которые их обрабатывают
+        try:
+            await run_db(renew_shard_leases)
+        except Exception as e:
+            logger.error(f"Ошибка при аренде шардов: {e}")
+        asyncio.create_task(maintain_shard_leases(application))
+        
+        # Запускаем задачу проверки расписания
+        logger.info("Запуск задачи проверки расписания...")
+        asyncio.create_task(check_schedules(application))
+        
+        # Запускаем задачу проверки напоминаний об отчётах
+        logger.info("Запуск задачи проверки напоминаний об отчётах...")
+        asyncio.create_task(check_reports_reminders(application))
 
-def main():
-    """Главная функция запуска бота"""
-    # Создаем приложение
-    application = Application.builder().token(TOKEN).post_init(post_init).build()
+    # Запускаем периодический вывод метрик и проверку здоровья
+    asyncio.create_task(log_metrics(application))
+    if HEALTH_PORT:
+        asyncio.create_task(serve_health(application))
+
+async def post_stop(application: Application) -> None:
+    """Отдать шарды другим репликам и отправить накопленную сводку логов перед остановкой бота"""
+    if BOT_MODE in ('all', 'worker'):
+        try:
+            await run_db(release_shard_leases)
+        except Exception as e:
+            logger.error(f"Ошибка при освобождении шардов: {e}")
+    await log_digest.drain()
+
+async def run_until_signal(application):
+    """Запуск без run_polling: режим worker и приём обновлений по webhook.
     
-    # Добавляем обработчики команд
+    При SIGINT/SIGTERM сначала перестаём принимать обновления, затем Application.stop()
+    обрабатывает всё, что уже попало в очередь, и только после этого процесс завершается.
+    """
+    global webhook_listener
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    
+    async with application:
+        await post_init(application)
+        await application.start()
+        if BOT_MODE != 'worker':
+            webhook_listener = WebhookListener(application, WEBHOOK_PATH, WEBHOOK_SECRET_TOKEN)
+            await webhook_listener.start(WEBHOOK_LISTEN, WEBHOOK_PORT)
+            if WEBHOOK_URL:
+                # Очередь обновлений, накопившихся за время деплоя, не сбрасываем
+                await application.bot.set_webhook(
+                    url=WEBHOOK_URL,
+                    secret_token=WEBHOOK_SECRET_TOKEN,
+                    allowed_updates=Update.ALL_TYPES,
+                    max_connections=WEBHOOK_MAX_CONNECTIONS,
+                )
+                logger.info(f"Webhook зарегистрирован: {WEBHOOK_URL}")
+        logger.info(f"Бот {WORKER_ID} запущен в режиме {BOT_MODE}")
+        await stop.wait()
+        logger.info("Бот останавливается...")
+        # Webhook в Telegram не удаляем: пока нас нет, Telegram копит обновления и повторяет доставку
+        if webhook_listener is not None:
+            await webhook_listener.stop()
+        await application.stop()
+        await post_stop(application)
+
+def add_handlers(application):
+    """Зарегистрировать обработчики команд, сообщений и callback-запросов"""
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("cancel", handle_cancel_command))
     # Обработчик фото должен быть перед обработчиком текста, чтобы обрабатывать фото с подписью
@@ -1733,9 +3402,33 @@ def main():
     application.add_handler(CallbackQueryHandler(handle_cancel_report, pattern="^cancel_report:"))
     application.add_handler(CallbackQueryHandler(handle_edit_report, pattern="^edit_report:"))
     application.add_handler(CallbackQueryHandler(handle_approve_edited_report, pattern="^approve_edited_report:"))
+
+def main():
+    """Главная функция запуска бота"""
+    # Создаем приложение
+    application = (
+        Application.builder()
+        .token(TOKEN)
+        .connection_pool_size(TELEGRAM_CONNECTION_POOL_SIZE)
+        .post_init(post_init)
+        .post_stop(post_stop)
+        .build()
+    )
+    
+    if BOT_MODE == 'worker':
+        logger.info("Бот запускается в режиме worker...")
+        asyncio.run(run_until_signal(application))
+        return
+    
+    add_handlers(application)
+    
+    if UPDATE_MODE == 'webhook':
+        logger.info(f"Бот запускается в режиме {BOT_MODE}, обновления по webhook...")
+        asyncio.run(run_until_signal(application))
+        return
     
     # Запускаем бота
-    logger.info("Бот запускается...")
+    logger.info(f"Бот запускается в режиме {BOT_MODE}...")
     application.run_polling(allowed_updates=Update.ALL_TYPES, drop_pending_updates=True)
 
 if __name__ == '__main__':
@@ -53,6 +53,39 @@ CREATE TABLE IF NOT EXISTS subject (
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Создание таблицы серий занятий (правило повторения вместо строки на каждую неделю)
+CREATE TABLE IF NOT EXISTS lesson_series (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    tutor_id INT NOT NULL,
+    student_id INT NOT NULL,
+    subject_id INT NOT NULL,
+    weekday TINYINT NOT NULL, -- 0 — понедельник
+    interval_weeks INT NOT NULL DEFAULT 1,
+    time TIME NOT NULL,
+    duration_minutes INT DEFAULT 60,
+    lesson_type VARCHAR(20) DEFAULT 'regular',
+    start_date DATE NOT NULL,
+    end_date DATE, -- NULL — без даты окончания
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (tutor_id) REFERENCES telegram_id(id) ON DELETE CASCADE,
+    FOREIGN KEY (student_id) REFERENCES telegram_id(id) ON DELETE CASCADE,
+    FOREIGN KEY (subject_id) REFERENCES subject(id) ON DELETE CASCADE,
+    INDEX idx_series_tutor (tutor_id),
+    INDEX idx_series_student (student_id),
+    INDEX idx_series_period (start_date, end_date),
+    INDEX idx_series_updated_at (updated_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Создание таблицы отменённых занятий серий
+CREATE TABLE IF NOT EXISTS lesson_series_exception (
+    series_id INT NOT NULL,
+    occurrence_date DATE NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (series_id, occurrence_date),
+    FOREIGN KEY (series_id) REFERENCES lesson_series(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 -- Создание таблицы расписания
 CREATE TABLE IF NOT EXISTS schedule (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -63,13 +96,25 @@ CREATE TABLE IF NOT EXISTS schedule (
     subject_id INT NOT NULL,
     lesson_type VARCHAR(20) DEFAULT 'regular',
     duration_minutes INT DEFAULT 60,
+    start_at DATETIME, -- date + time
+    end_at DATETIME, -- start_at + duration_minutes
+    series_id INT NULL, -- Серия, из которой записано занятие
+    occurrence_date DATE NULL, -- Дата занятия по правилу серии
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     FOREIGN KEY (tutor_id) REFERENCES telegram_id(id) ON DELETE CASCADE,
     FOREIGN KEY (student_id) REFERENCES telegram_id(id) ON DELETE CASCADE,
     FOREIGN KEY (subject_id) REFERENCES subject(id) ON DELETE CASCADE,
+    CONSTRAINT fk_schedule_series FOREIGN KEY (series_id) REFERENCES lesson_series(id) ON DELETE SET NULL,
+    UNIQUE KEY unique_series_occurrence (series_id, occurrence_date),
     INDEX idx_date (date),
     INDEX idx_tutor (tutor_id),
-    INDEX idx_student (student_id)
+    INDEX idx_student (student_id),
+    INDEX idx_updated_at (updated_at),
+    INDEX idx_start_at (start_at),
+    INDEX idx_end_at (end_at),
+    INDEX idx_tutor_start_at (tutor_id, start_at),
+    INDEX idx_student_start_at (student_id, start_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- Создание таблицы напоминаний (тоже БЕЗ ENUM!)
@@ -80,9 +125,16 @@ CREATE TABLE IF NOT EXISTS reminder (
     sent BOOLEAN DEFAULT FALSE,
     sent_at DATETIME,
     last_sent DATETIME,
+    lesson_start DATETIME, -- Время занятия, для которого отправлено напоминание
+    claim_token VARCHAR(32), -- Метка запуска бота, занявшего напоминание
+    claimed_at DATETIME, -- Когда напоминание занято (неотправленное можно занять заново по таймауту)
+    tutor_status VARCHAR(20), -- sent / failed / skipped
+    student_status VARCHAR(20),
+    parent_status VARCHAR(20),
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (schedule_id) REFERENCES schedule(id) ON DELETE CASCADE,
-    UNIQUE KEY unique_reminder (schedule_id, reminder_type)
+    UNIQUE KEY unique_reminder (schedule_id, reminder_type),
+    INDEX idx_claim_token (claim_token)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- Создание таблицы отчётов о занятиях
@@ -96,6 +148,27 @@ CREATE TABLE IF NOT EXISTS reports (
     FOREIGN KEY (schedule_id) REFERENCES schedule(id) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Создание таблицы состояния фоновых задач бота (high-water mark напоминаний)
+CREATE TABLE IF NOT EXISTS bot_state (
+    name VARCHAR(50) PRIMARY KEY,
+    value DATETIME,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Создание таблицы версий расписания по месяцам (ETag /get_month_schedule)
+CREATE TABLE IF NOT EXISTS schedule_version (
+    scope VARCHAR(7) PRIMARY KEY, -- 'YYYY-MM' или 'all'
+    version BIGINT NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Создание таблицы аренды шардов напоминаний репликами бота
+CREATE TABLE IF NOT EXISTS reminder_lease (
+    shard INT PRIMARY KEY,
+    owner VARCHAR(100),
+    expires_at DATETIME,
+    INDEX idx_owner (owner)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 -- Добавление примеров предметов (необязательно)
 INSERT IGNORE INTO subject (name) VALUES 
     ('Математика'),
@@ -0,0 +1,8 @@
+-- Миграция для хранения состояния фоновых задач бота
+-- value — момент, до которого задача обработала все события (high-water mark)
+
+CREATE TABLE IF NOT EXISTS bot_state (
+    name VARCHAR(50) PRIMARY KEY,
+    value DATETIME,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,51 @@
+-- Миграция для серий занятий по правилу повторения
+-- Регулярное занятие хранится одной строкой lesson_series (день недели, интервал в неделях, период),
+-- отменённые даты — в lesson_series_exception. Занятия серии разворачиваются на запрошенное окно
+-- при чтении; строка schedule с series_id и occurrence_date появляется, только когда к занятию
+-- привязываются напоминание, отчёт или изменение (перенос, другой предмет)
+
+CREATE TABLE IF NOT EXISTS lesson_series (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    tutor_id INT NOT NULL,
+    student_id INT NOT NULL,
+    subject_id INT NOT NULL,
+    weekday TINYINT NOT NULL, -- 0 — понедельник
+    interval_weeks INT NOT NULL DEFAULT 1, -- Каждую неделю, через неделю и т.д.
+    time TIME NOT NULL,
+    duration_minutes INT DEFAULT 60,
+    lesson_type VARCHAR(20) DEFAULT 'regular',
+    start_date DATE NOT NULL, -- Первое занятие серии
+    end_date DATE, -- NULL — без даты окончания
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (tutor_id) REFERENCES telegram_id(id) ON DELETE CASCADE,
+    FOREIGN KEY (student_id) REFERENCES telegram_id(id) ON DELETE CASCADE,
+    FOREIGN KEY (subject_id) REFERENCES subject(id) ON DELETE CASCADE,
+    INDEX idx_series_tutor (tutor_id),
+    INDEX idx_series_student (student_id),
+    INDEX idx_series_period (start_date, end_date),
+    INDEX idx_series_updated_at (updated_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS lesson_series_exception (
+    series_id INT NOT NULL,
+    occurrence_date DATE NOT NULL, -- Отменённое занятие серии
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (series_id, occurrence_date),
+    FOREIGN KEY (series_id) REFERENCES lesson_series(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Занятие серии, записанное в schedule: series_id и дата по правилу серии (date может быть другой после переноса)
+SET @col_exists = (SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
+    WHERE TABLE_NAME = 'schedule' AND COLUMN_NAME = 'series_id' AND TABLE_SCHEMA = DATABASE());
+
+SET @sql = IF(@col_exists = 0,
+    'ALTER TABLE schedule
+        ADD COLUMN series_id INT NULL,
+        ADD COLUMN occurrence_date DATE NULL,
+        ADD CONSTRAINT fk_schedule_series FOREIGN KEY (series_id) REFERENCES lesson_series(id) ON DELETE SET NULL,
+        ADD UNIQUE KEY unique_series_occurrence (series_id, occurrence_date)',
+    'SELECT "Columns already exist"');
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
@@ -0,0 +1,19 @@
+-- Миграция для хранения отправленных ботом напоминаний в таблице reminder
+-- Запись занимается ботом перед отправкой, статус доставки хранится по каждому получателю
+
+-- Добавляем колонки, если их нет
+SET @col_exists = (SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
+    WHERE TABLE_NAME = 'reminder' AND COLUMN_NAME = 'lesson_start' AND TABLE_SCHEMA = DATABASE());
+
+SET @sql = IF(@col_exists = 0,
+    'ALTER TABLE reminder
+        ADD COLUMN lesson_start DATETIME,
+        ADD COLUMN claim_token VARCHAR(32),
+        ADD COLUMN tutor_status VARCHAR(20),
+        ADD COLUMN student_status VARCHAR(20),
+        ADD COLUMN parent_status VARCHAR(20),
+        ADD INDEX idx_claim_token (claim_token)',
+    'SELECT "Columns already exist"');
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
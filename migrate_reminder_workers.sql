@@ -0,0 +1,21 @@
+-- Миграция для работы нескольких реплик бота
+-- reminder.claimed_at — когда напоминание занято (неотправленное можно занять заново по таймауту)
+-- reminder_lease — аренда шардов напоминаний (tutor_id % REMINDER_SHARDS) репликами
+
+-- Добавляем колонку, если её нет
+SET @col_exists = (SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
+    WHERE TABLE_NAME = 'reminder' AND COLUMN_NAME = 'claimed_at' AND TABLE_SCHEMA = DATABASE());
+
+SET @sql = IF(@col_exists = 0,
+    'ALTER TABLE reminder ADD COLUMN claimed_at DATETIME',
+    'SELECT "Column already exists"');
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+CREATE TABLE IF NOT EXISTS reminder_lease (
+    shard INT PRIMARY KEY,
+    owner VARCHAR(100),
+    expires_at DATETIME,
+    INDEX idx_owner (owner)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,40 @@
+-- Миграция для добавления начала и конца занятия одной колонкой (start_at, end_at)
+-- Запросы бота по окнам времени идут по индексам на этих колонках
+
+-- Добавляем колонки, если их нет
+SET @col_exists = (SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
+    WHERE TABLE_NAME = 'schedule' AND COLUMN_NAME = 'start_at' AND TABLE_SCHEMA = DATABASE());
+
+SET @sql = IF(@col_exists = 0,
+    'ALTER TABLE schedule
+        ADD COLUMN start_at DATETIME,
+        ADD COLUMN end_at DATETIME,
+        ADD INDEX idx_start_at (start_at),
+        ADD INDEX idx_end_at (end_at)',
+    'SELECT "Columns already exist"');
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- Заполняем существующие записи порциями по 1000 строк, чтобы не держать долгих блокировок.
+-- updated_at не трогаем: бот не должен считать все занятия изменёнными
+DROP PROCEDURE IF EXISTS backfill_schedule_bounds;
+
+DELIMITER //
+CREATE PROCEDURE backfill_schedule_bounds()
+BEGIN
+    DECLARE affected INT DEFAULT 1;
+    WHILE affected > 0 DO
+        UPDATE schedule SET
+            start_at = TIMESTAMP(date, time),
+            end_at = TIMESTAMP(date, time) + INTERVAL COALESCE(duration_minutes, 60) MINUTE,
+            updated_at = updated_at
+        WHERE start_at IS NULL
+        LIMIT 1000;
+        SET affected = ROW_COUNT();
+    END WHILE;
+END //
+DELIMITER ;
+
+CALL backfill_schedule_bounds();
+DROP PROCEDURE IF EXISTS backfill_schedule_bounds;
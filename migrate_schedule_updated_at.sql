@@ -0,0 +1,25 @@
+-- Миграция для добавления отметки времени изменения занятия
+-- По ней бот подтягивает изменения расписания без полного перечитывания
+
+-- Добавляем колонку, если её нет
+SET @col_exists = (SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
+    WHERE TABLE_NAME = 'schedule' AND COLUMN_NAME = 'updated_at' AND TABLE_SCHEMA = DATABASE());
+
+SET @sql = IF(@col_exists = 0,
+    'ALTER TABLE schedule
+        ADD COLUMN updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP',
+    'SELECT "Column already exists"');
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- Добавляем индекс, если его нет
+SET @idx_exists = (SELECT COUNT(*) FROM INFORMATION_SCHEMA.STATISTICS
+    WHERE TABLE_NAME = 'schedule' AND INDEX_NAME = 'idx_updated_at' AND TABLE_SCHEMA = DATABASE());
+
+SET @sql = IF(@idx_exists = 0,
+    'ALTER TABLE schedule ADD INDEX idx_updated_at (updated_at)',
+    'SELECT "Index already exists"');
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
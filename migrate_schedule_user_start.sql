@@ -0,0 +1,22 @@
+-- Миграция для составных индексов (tutor_id, start_at) и (student_id, start_at)
+-- По ним WebApp /schedule читает окно занятий пользователя и листает его постранично
+
+SET @idx_exists = (SELECT COUNT(*) FROM INFORMATION_SCHEMA.STATISTICS
+    WHERE TABLE_NAME = 'schedule' AND INDEX_NAME = 'idx_tutor_start_at' AND TABLE_SCHEMA = DATABASE());
+
+SET @sql = IF(@idx_exists = 0,
+    'ALTER TABLE schedule ADD INDEX idx_tutor_start_at (tutor_id, start_at)',
+    'SELECT "Index idx_tutor_start_at already exists"');
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SET @idx_exists = (SELECT COUNT(*) FROM INFORMATION_SCHEMA.STATISTICS
+    WHERE TABLE_NAME = 'schedule' AND INDEX_NAME = 'idx_student_start_at' AND TABLE_SCHEMA = DATABASE());
+
+SET @sql = IF(@idx_exists = 0,
+    'ALTER TABLE schedule ADD INDEX idx_student_start_at (student_id, start_at)',
+    'SELECT "Index idx_student_start_at already exists"');
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
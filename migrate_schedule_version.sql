@@ -0,0 +1,8 @@
+-- Миграция для версий расписания по месяцам
+-- Админка увеличивает версию месяца при любом изменении занятий в нём, версию 'all' — при изменении
+-- пользователей и предметов. Из версий строится ETag /get_month_schedule
+
+CREATE TABLE IF NOT EXISTS schedule_version (
+    scope VARCHAR(7) PRIMARY KEY, -- 'YYYY-MM' или 'all'
+    version BIGINT NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
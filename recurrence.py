@@ -0,0 +1,64 @@
+"""
+Серии занятий: общий модуль для app.py и bot.py.
+
+Регулярное занятие хранится одной строкой lesson_series — день недели, интервал в неделях,
+первая дата и (необязательно) последняя. Даты занятий вычисляются только для запрошенного
+окна, отменённые даты хранятся отдельно (lesson_series_exception).
+"""
+from datetime import timedelta
+from math import lcm
+
+def first_series_date(start_date, weekday):
+    """Первая дата не раньше start_date, приходящаяся на weekday (0 — понедельник)"""
+    return start_date + timedelta(days=(weekday - start_date.weekday()) % 7)
+
+def series_occurrence_dates(start_date, end_date, interval_weeks, date_from, date_to):
+    """Даты занятий серии в окне [date_from, date_to] включительно.
+
+    start_date — первое занятие серии (задаёт день недели), end_date — последняя допустимая
+    дата или None для серии без окончания. Стоимость — O(занятий в окне), а не O(длины серии).
+    """
+    step = timedelta(weeks=max(interval_weeks or 1, 1))
+    last = date_to if end_date is None else min(end_date, date_to)
+    if last < start_date or last < date_from:
+        return []
+
+    # Пропускаем целые периоды до начала окна одним делением
+    skipped = max((date_from - start_date).days, 0) // step.days
+    day = start_date + step * skipped
+    if day < date_from:
+        day += step
+
+    dates = []
+    while day <= last:
+        dates.append(day)
+        day += step
+    return dates
+
+def common_series_dates(start_date, end_date, interval_weeks, other_start, other_end, other_interval):
+    """Даты, в которые проходят обе серии (обе заданы как в series_occurrence_dates), по возрастанию.
+
+    Общие даты идут с шагом НОК интервалов, поэтому первая ищется среди первых НОК/interval_weeks
+    занятий первой серии. Если у обеих серий нет даты окончания, последовательность бесконечна.
+    """
+    interval_weeks, other_interval = max(interval_weeks or 1, 1), max(other_interval or 1, 1)
+    if (start_date - other_start).days % 7:
+        return
+    ends = [end for end in (end_date, other_end) if end is not None]
+    last = min(ends) if ends else None
+
+    period = 7 * interval_weeks
+    lower = max(start_date, other_start)
+    day = start_date + timedelta(days=-(-(lower - start_date).days // period) * period)
+    step_weeks = lcm(interval_weeks, other_interval)
+    for _ in range(step_weeks // interval_weeks):
+        if (day - other_start).days % (7 * other_interval) == 0:
+            break
+        day += timedelta(weeks=interval_weeks)
+    else:
+        return
+
+    step = timedelta(weeks=step_weeks)
+    while last is None or day <= last:
+        yield day
+        day += step
@@ -49,5 +49,13 @@ apply_migration "/app/migrate_lesson_types.sql" "Типы занятий"
 apply_migration "/app/migrate_reminders.sql" "Настройки напоминаний"
 apply_migration "/app/migrate_reports.sql" "Таблица отчётов"
 apply_migration "/app/migrate_tutor_notifications.sql" "Настройки уведомлений репетиторов"
+apply_migration "/app/migrate_schedule_updated_at.sql" "Отметка изменения занятий"
+apply_migration "/app/migrate_reminder_delivery.sql" "Статусы отправки напоминаний"
+apply_migration "/app/migrate_schedule_bounds.sql" "Начало и конец занятий (start_at, end_at)"
+apply_migration "/app/migrate_bot_state.sql" "Состояние фоновых задач бота"
+apply_migration "/app/migrate_reminder_workers.sql" "Несколько реплик бота"
+apply_migration "/app/migrate_schedule_user_start.sql" "Индексы расписания пользователя по времени"
+apply_migration "/app/migrate_schedule_version.sql" "Версии расписания по месяцам"
+apply_migration "/app/migrate_lesson_series.sql" "Серии занятий по правилу повторения"
 
 echo "✅ Все миграции применены!"
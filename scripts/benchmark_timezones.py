@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Микро-бенчмарк перевода времени занятий в пояс пользователя.
+
+Сравнивает прежний способ (pytz.timezone + localize + astimezone на каждое занятие)
+с модулем timezones: по одному вызову на занятие и одним пакетным вызовом на список.
+
+Запуск: python scripts/benchmark_timezones.py [число занятий]
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+from timeit import timeit
+
+import pytz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from timezones import TIMEZONES, convert_time_to_user_timezone, convert_times_to_user_timezone
+
+LEGACY_SYSTEM_TIMEZONE = pytz.timezone('Europe/Saratov')
+
+def legacy_convert(system_datetime, user_timezone_str):
+    """Прежняя реализация из app.py и bot.py"""
+    if user_timezone_str.startswith('UTC') or user_timezone_str.startswith('+'):
+        user_timezone_str = 'Europe/Saratov'
+    user_tz = pytz.timezone(user_timezone_str)
+    system_dt_localized = LEGACY_SYSTEM_TIMEZONE.localize(system_datetime) if system_datetime.tzinfo is None else system_datetime
+    return system_dt_localized.astimezone(user_tz)
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    start = datetime(2026, 9, 1, 9, 0)
+    lessons = [start + timedelta(minutes=90 * index) for index in range(count)]
+    zones = list(TIMEZONES) + ['+04:00']
+    repeat = max(1, 20000 // count)
+
+    def legacy():
+        for zone in zones:
+            [legacy_convert(lesson, zone) for lesson in lessons]
+
+    def single():
+        for zone in zones:
+            [convert_time_to_user_timezone(lesson, zone) for lesson in lessons]
+
+    def batch():
+        for zone in zones:
+            convert_times_to_user_timezone(lessons, zone)
+
+    conversions = count * len(zones) * repeat
+    results = [(name, timeit(func, number=repeat)) for name, func in (
+        ('pytz localize (прежний)', legacy),
+        ('convert_time_to_user_timezone', single),
+        ('convert_times_to_user_timezone', batch),
+    )]
+    baseline = results[0][1]
+    print(f"{count} занятий x {len(zones)} поясов x {repeat} повторов")
+    for name, seconds in results:
+        print(f"{name:32} {seconds * 1e9 / conversions:8.0f} нс/занятие  x{baseline / seconds:.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,22 @@
 import pytest
 import os
+import re
 import sys
 from unittest.mock import Mock, patch
 
 # Добавляем родительскую директорию в путь для импорта
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Движок создаётся при импорте app, поэтому БД для тестов задаётся до него
+os.environ['DATABASE_URL'] = 'sqlite://'
 
-from app import app, db, User, TelegramID, Schedule, Subject
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+from flask import template_rendered
+from sqlalchemy import event
+
+from app import (
+    app, db, User, TelegramID, Schedule, Subject, Pair, LessonSeries, LessonSeriesException, month_schedule_cache
+)
 
 @pytest.fixture
 def client():
@@ -160,5 +170,707 @@ def test_schedule_model_creation():
         assert schedule.student_id == student.id
         assert schedule.subject_id == subject.id
 
+@contextmanager
+def count_queries():
+    """Считать SQL-запросы, выполненные внутри блока"""
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+def rendered_context(client, url):
+    """Ответ страницы и контекст, с которым был отрисован шаблон"""
+    rendered = []
+    def record(sender, template, context, **extra):
+        rendered.append(context)
+    with template_rendered.connected_to(record, app):
+        response = client.get(url)
+    return response, rendered[0] if rendered else None
+
+def add_lessons(count, first_day=None, step_days=1):
+    """Репетитор и count учеников по разным предметам, занятия в обратном порядке дат"""
+    first_day = first_day or date.today()
+    tutor = TelegramID(telegram_id='tutor', description='Репетитор', status='репетитор', timezone='Europe/Moscow')
+    db.session.add(tutor)
+    for index in range(count):
+        student = TelegramID(telegram_id=f'student{index}', description=f'Ученик {index}', status='ученик')
+        subject = Subject(name=f'Предмет {index}')
+        db.session.add_all([student, subject])
+        db.session.flush()
+        db.session.add(Schedule(
+            tutor_id=tutor.id,
+            student_id=student.id,
+            subject_id=subject.id,
+            date=first_day + timedelta(days=(count - 1 - index) * step_days),
+            time=time(10, 0),
+        ))
+    db.session.commit()
+    db.session.expunge_all()
+
+@pytest.mark.parametrize('count', [1, 20])
+def test_schedule_view_query_count(client, count):
+    """Страница /schedule выполняет одинаковое число запросов при любом числе занятий"""
+    add_lessons(count)
+
+    with count_queries() as statements:
+        response, context = rendered_context(client, '/schedule?username=tutor')
+
+    assert response.status_code == 200
+    # Пользователь, занятия вместе с предметами, репетиторами и учениками, серии пользователя
+    assert len(statements) == 3
+    schedules = context['schedules']
+    assert len(schedules) == count
+    # Занятия отсортированы в БД по дате: ученики идут в обратном порядке
+    assert [item['student'] for item in schedules] == [f'Ученик {index}' for index in reversed(range(count))]
+    # Время показано в поясе репетитора (Москва, UTC+3)
+    assert schedules[0]['time'] == '09:00'
+
+def test_schedule_view_loads_only_window(client):
+    """Страница /schedule показывает окно вокруг сегодняшнего дня, а не всю историю"""
+    add_lessons(30, first_day=date.today() - timedelta(days=300), step_days=20)
+
+    response, context = rendered_context(client, '/schedule?username=tutor')
+
+    assert response.status_code == 200
+    window = context['window']
+    starts = [item['start'] for item in context['schedules']]
+    assert starts and len(starts) < 30
+    assert all(window['start'] <= start < window['end'] for start in starts)
+
+def test_schedule_api_keyset_pages(client):
+    """/api/schedule листает занятия в обе стороны без пропусков и повторов, одним запросом на страницу"""
+    add_lessons(30, first_day=date.today() - timedelta(days=300), step_days=20)
+    _, context = rendered_context(client, '/schedule?username=tutor')
+    window = context['window']
+    in_window = [item['id'] for item in context['schedules']]
+
+    def walk(direction, cursor):
+        ids = []
+        while True:
+            with count_queries() as statements:
+                response = client.get('/api/schedule', query_string={
+                    'username': 'tutor', 'direction': direction, 'cursor': cursor, 'limit': 4
+                })
+            assert response.status_code == 200
+            # Пользователь, страница занятий и серии пользователя
+            assert len(statements) == 3
+            page = response.get_json()
+            assert len(page['schedules']) <= 4
+            page_ids = [item['id'] for item in page['schedules']]
+            ids = page_ids + ids if direction == 'before' else ids + page_ids
+            if not page['has_more']:
+                return ids
+            cursor = page['next_cursor']
+
+    earlier = walk('before', window['before'])
+    later = walk('after', window['after'])
+    all_ids = [schedule.id for schedule in Schedule.query.order_by(Schedule.start_at, Schedule.id)]
+    assert earlier + in_window + later == all_ids
+
+def test_schedule_api_rejects_bad_cursor(client):
+    """Неверный курсор или неизвестный пользователь — ошибка, а не вся история"""
+    add_lessons(1)
+    assert client.get('/api/schedule?username=tutor&cursor=yesterday').status_code == 400
+    assert client.get('/api/schedule?username=tutor&direction=sideways&cursor=2026-01-01T00:00:00_0').status_code == 400
+    assert client.get('/api/schedule?username=nobody&cursor=2026-01-01T00:00:00_0').status_code == 404
+
+@pytest.fixture
+def admin_client(client):
+    """Клиент админки без входа в систему"""
+    app.config['LOGIN_DISABLED'] = True
+    month_schedule_cache.clear()
+    yield client
+    app.config['LOGIN_DISABLED'] = False
+
+def schedule_table_queries(statements):
+    """Запросы к таблице schedule (schedule_version не в счёт)"""
+    return [statement for statement in statements if re.search(r'\bFROM schedule\b(?!_)', statement)]
+
+def test_month_schedule_etag_and_304(admin_client):
+    """Неизменённый месяц отдаётся по ETag (304) или из кэша без запроса к таблице schedule"""
+    add_lessons(3, first_day=date(2026, 10, 5))
+    url = '/get_month_schedule?month=10&year=2026'
+
+    with count_queries() as statements:
+        first = admin_client.get(url)
+    assert first.status_code == 200
+    assert len(first.get_json()) == 3
+    assert len(schedule_table_queries(statements)) == 1
+    etag = first.headers['ETag']
+    assert not etag.startswith('W/')
+
+    with count_queries() as statements:
+        not_modified = admin_client.get(url, headers={'If-None-Match': etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers['ETag'] == etag
+    assert not schedule_table_queries(statements)
+
+    with count_queries() as statements:
+        cached = admin_client.get(url)
+    assert cached.status_code == 200
+    assert cached.get_json() == first.get_json()
+    assert not schedule_table_queries(statements)
+
+def test_month_schedule_etag_changes_on_writes(admin_client):
+    """Версия месяца меняется при изменении его занятий, предметов и пользователей, но не соседних месяцев"""
+    add_lessons(2, first_day=date(2026, 10, 5))
+    october = '/get_month_schedule?month=10&year=2026'
+    november = '/get_month_schedule?month=11&year=2026'
+    etags = {url: admin_client.get(url).headers['ETag'] for url in (october, november)}
+
+    # Перенос занятия из октября в ноябрь меняет оба месяца
+    lesson = Schedule.query.filter_by(date=date(2026, 10, 6)).one()
+    lesson.date = date(2026, 11, 3)
+    db.session.commit()
+    changed = {url: admin_client.get(url, headers={'If-None-Match': etags[url]}) for url in (october, november)}
+    assert all(response.status_code == 200 for response in changed.values())
+    assert len(changed[october].get_json()) == 1
+    assert len(changed[november].get_json()) == 1
+    etags = {url: response.headers['ETag'] for url, response in changed.items()}
+
+    # Изменение занятия в ноябре не трогает октябрь
+    lesson = Schedule.query.filter_by(date=date(2026, 11, 3)).one()
+    lesson.duration_minutes = 90
+    db.session.commit()
+    assert admin_client.get(october, headers={'If-None-Match': etags[october]}).status_code == 304
+    assert admin_client.get(november, headers={'If-None-Match': etags[november]}).status_code == 200
+
+    # Переименование предмета видно во всех месяцах
+    etags[november] = admin_client.get(november).headers['ETag']
+    Subject.query.first().name = 'Новый предмет'
+    db.session.commit()
+    for url in (october, november):
+        assert admin_client.get(url, headers={'If-None-Match': etags[url]}).status_code == 200
+
+def add_pairs(count):
+    """Два репетитора и count учеников, распределённых между ними парами"""
+    tutors = [
+        TelegramID(telegram_id=f'tutor{index}', description=f'Репетитор {index}', status='репетитор')
+        for index in range(2)
+    ]
+    db.session.add_all(tutors)
+    db.session.flush()
+    for index in range(count):
+        student = TelegramID(telegram_id=f'student{index}', description=f'Ученик {index}', status='ученик')
+        db.session.add(student)
+        db.session.flush()
+        db.session.add(Pair(tutor_id=tutors[index % 2].id, student_id=student.id))
+    db.session.commit()
+    tutor_id = tutors[0].id
+    db.session.expunge_all()
+    return tutor_id
+
+@pytest.mark.parametrize('count', [2, 30])
+def test_admin_pairs_query_count(admin_client, count):
+    """Страница пар выполняет одинаковое число запросов при любом числе пар"""
+    add_pairs(count)
+
+    with count_queries() as statements:
+        response, context = rendered_context(admin_client, '/admin/pairs')
+
+    assert response.status_code == 200
+    # Пользователи для выпадающих списков и пары с репетиторами и учениками
+    assert len(statements) == 2
+    pairs = context['pairs']
+    assert len(pairs) == count
+    assert (pairs[1].tutor_name, pairs[1].student_name, pairs[1].student_telegram) == ('Репетитор 1', 'Ученик 1', 'student1')
+    assert f'Ученик {count - 1}' in response.get_data(as_text=True)
+
+@pytest.mark.parametrize('count', [2, 30])
+def test_tutor_students_query_count(admin_client, count):
+    """Ученики репетитора отдаются одним запросом"""
+    tutor_id = add_pairs(count)
+
+    with count_queries() as statements:
+        response = admin_client.get(f'/api/tutor_students/{tutor_id}')
+
+    assert response.status_code == 200
+    assert len(statements) == 1
+    students = response.get_json()
+    assert [student['telegram_id'] for student in students] == [f'student{index}' for index in range(0, count, 2)]
+    assert set(students[0]) == {'id', 'description', 'telegram_id'}
+
+def test_add_schedule_recurring_bulk(admin_client):
+    """Повторяющиеся занятия по умолчанию — серия; as_rows — одна проверка существующих и одна массовая вставка"""
+    tutor_id = add_pairs(2)
+    student_id = Pair.query.filter_by(tutor_id=tutor_id).first().student_id
+    subject = Subject(name='Математика')
+    db.session.add(subject)
+    db.session.commit()
+    form = {
+        'tutor_id': tutor_id, 'student_id': student_id, 'subject_id': subject.id,
+        'date': '2026-09-07', 'time': '16:00', 'repeat_count': '52',
+    }
+
+    with count_queries() as statements:
+        first = admin_client.post('/add_schedule', data=form).get_json()
+    assert first['success'] and first['series_created'] == 1
+    assert not [statement for statement in statements if statement.startswith('INSERT INTO schedule ')]
+    assert Schedule.query.count() == 0
+    series = LessonSeries.query.one()
+    assert (series.start_date, series.end_date) == (date(2026, 9, 7), date(2027, 9, 5))
+    assert [item['date'] for item in month_lessons(admin_client, 8, 2027)][-1] == '2027-08-30'
+    assert month_lessons(admin_client, 9, 2027) == []
+
+    assert (first['created'], first['skipped']) == (52, 0)
+
+    # Повторная отправка: те же занятия уже есть — пропускаются, серия не создаётся
+    again = admin_client.post('/add_schedule', data=dict(form, repeat_count='60')).get_json()
+    assert again['success'] and (again['series_created'], again['created'], again['skipped']) == (0, 0, 52)
+    assert LessonSeries.query.count() == 1
+
+    # Серия без окончания продолжает существующую: первые 52 занятия пропущены, начало — после них
+    endless = admin_client.post('/add_schedule', data=dict(form, open_ended='true')).get_json()
+    assert endless['success'] and endless['series_created'] == 1 and endless['skipped'] == 52
+    continued = LessonSeries.query.filter(LessonSeries.end_date.is_(None)).one()
+    assert continued.start_date == date(2027, 9, 6)
+    assert LessonSeriesException.query.count() == 0
+    db.session.delete(continued)
+    db.session.commit()
+
+    # Запасной путь: строка на каждую неделю
+    rows_form = dict(form, time='18:00', as_rows='true')
+    with count_queries() as statements:
+        rows = admin_client.post('/add_schedule', data=rows_form).get_json()
+    assert rows['success'] and (rows['created'], rows['skipped']) == (52, 0)
+    inserts = [statement for statement in statements if statement.startswith('INSERT INTO schedule ')]
+    lesson_queries = [statement for statement in schedule_table_queries(statements) if 'lesson_series' not in statement]
+    assert len(inserts) == 1 and len(lesson_queries) == 1
+    assert '52' in rows['message']
+
+    lessons = Schedule.query.order_by(Schedule.date).all()
+    assert lessons[-1].date == date(2027, 8, 30)
+    assert lessons[0].start_at == datetime(2026, 9, 7, 18, 0)
+    assert lessons[0].end_at == datetime(2026, 9, 7, 19, 0)
+    assert LessonSeries.query.count() == 1
+
+def test_add_schedule_several_pairs_and_weekdays(admin_client):
+    """Группа пар по нескольким дням недели за один запрос"""
+    add_pairs(4)
+    pairs = [f'{pair.tutor_id}:{pair.student_id}' for pair in Pair.query.all()]
+    subject = Subject(name='Физика')
+    db.session.add(subject)
+    db.session.commit()
+
+    response = admin_client.post('/add_schedule', data={
+        'pairs': pairs, 'weekdays': ['0', '3'], 'subject_id': subject.id,
+        'date': '2026-09-02', 'time': '10:00', 'repeat_count': '2', 'is_trial': 'true',
+    }).get_json()
+
+    # Среда 2 сентября, две недели: серия на каждую пару и день недели — четверги 3 и 10, понедельники 7 и 14
+    assert response['success'] and response['series_created'] == 8
+    assert Schedule.query.count() == 0
+    september = month_lessons(admin_client, 9)
+    assert len(september) == 16
+    assert sorted({item['date'] for item in september}) == ['2026-09-03', '2026-09-07', '2026-09-10', '2026-09-14']
+    assert all(series.duration_minutes == 30 and series.lesson_type == 'trial' for series in LessonSeries.query)
+
+def test_add_schedule_rejects_unknown_users(admin_client):
+    """Серия не создаётся, если хоть один пользователь не найден"""
+    add_pairs(1)
+    response = admin_client.post('/add_schedule', data={
+        'pairs': ['1:2', '1:999'], 'subject_id': 1, 'date': '2026-09-02', 'time': '10:00',
+    }).get_json()
+    assert not response['success']
+    assert Schedule.query.count() == 0
+
+def add_weekly_series(admin_client, weeks=6):
+    """Пара с занятиями по понедельникам и четвергам на weeks недель начиная с 7 сентября 2026 (строками, as_rows)"""
+    tutor_id = add_pairs(2)
+    pair = Pair.query.filter_by(tutor_id=tutor_id).first()
+    subject = Subject(name='Химия')
+    db.session.add(subject)
+    db.session.commit()
+    response = admin_client.post('/add_schedule', data={
+        'tutor_id': pair.tutor_id, 'student_id': pair.student_id, 'subject_id': subject.id,
+        'weekdays': ['0', '3'], 'date': '2026-09-07', 'time': '16:00', 'repeat_count': str(weeks),
+        'as_rows': 'true',
+    }).get_json()
+    assert response['created'] == weeks * 2
+    return Schedule.query.filter_by(date=date(2026, 9, 21)).one().id
+
+def test_update_future_same_weekday_is_one_statement(admin_client):
+    """Изменение серии — один UPDATE с днём недели в SQL; start_at/end_at пересчитываются"""
+    lesson_id = add_weekly_series(admin_client)
+    lesson = db.session.get(Schedule, lesson_id)
+    form = {
+        'tutor_id': lesson.tutor_id, 'student_id': lesson.student_id, 'subject_id': lesson.subject_id,
+        'date': '2026-09-21', 'time': '18:30', 'apply_to': 'future_same_weekday',
+    }
+    db.session.expunge_all()
+
+    with count_queries() as statements:
+        response = admin_client.post(f'/update_schedule/{lesson_id}', data=form).get_json()
+
+    assert response['success'] and response['updated'] == 4
+    assert len([statement for statement in statements if statement.startswith('UPDATE schedule ')]) == 1
+    # Понедельники начиная с 21 сентября перенесены, четверги и более ранние понедельники — нет
+    moved = Schedule.query.filter(Schedule.time == time(18, 30)).order_by(Schedule.date).all()
+    assert [lesson.date for lesson in moved] == [date(2026, 9, 21), date(2026, 9, 28), date(2026, 10, 5), date(2026, 10, 12)]
+    assert moved[0].start_at == datetime(2026, 9, 21, 18, 30)
+    assert moved[0].end_at == datetime(2026, 9, 21, 19, 30)
+    assert Schedule.query.filter(Schedule.time == time(16, 0)).count() == 8
+
+def test_delete_future_same_weekday_is_one_statement(admin_client):
+    """Удаление серии — один DELETE с днём недели в SQL"""
+    lesson_id = add_weekly_series(admin_client)
+
+    with count_queries() as statements:
+        response = admin_client.get(f'/delete_schedule/{lesson_id}?apply_to=future_same_weekday').get_json()
+
+    assert response == {'success': True, 'deleted': 4}
+    assert len([statement for statement in statements if statement.startswith('DELETE FROM schedule ')]) == 1
+    assert Schedule.query.count() == 8
+    assert all(lesson.date.weekday() == 3 or lesson.date < date(2026, 9, 21) for lesson in Schedule.query)
+
+def test_delete_pair_and_user_in_bulk(admin_client):
+    """Удаление пары и пользователя не загружает занятия по одному"""
+    add_weekly_series(admin_client)
+    pair = Pair.query.filter(Pair.student_id.in_(db.session.query(Schedule.student_id))).one()
+    other_pair = Pair.query.filter(Pair.id != pair.id).one()
+    pair_id, tutor_id = pair.id, other_pair.tutor_id
+
+    with count_queries() as statements:
+        admin_client.get(f'/delete_pair/{pair_id}')
+    assert Schedule.query.count() == 0
+    assert db.session.get(Pair, pair_id) is None
+    assert not [statement for statement in statements if re.match(r'SELECT .*\bFROM schedule\b(?!_)', statement, re.S)]
+
+    with count_queries() as statements:
+        admin_client.get(f'/delete_telegram_id/{tutor_id}')
+    assert db.session.get(TelegramID, tutor_id) is None
+    assert Pair.query.count() == 0
+    assert not schedule_table_queries([statement for statement in statements if statement.startswith('SELECT')])
+
+def add_lesson_series(admin_client, **form):
+    """Пара и серия занятий по понедельникам с 7 сентября 2026; без repeat_count — без даты окончания"""
+    form.setdefault('open_ended', 'false' if 'repeat_count' in form else 'true')
+    tutor_id = add_pairs(1)
+    pair = Pair.query.filter_by(tutor_id=tutor_id).one()
+    subject = Subject(name='Биология')
+    db.session.add(subject)
+    db.session.commit()
+    response = admin_client.post('/add_schedule', data={
+        'tutor_id': pair.tutor_id, 'student_id': pair.student_id, 'subject_id': subject.id,
+        'date': '2026-09-07', 'time': '16:00', **form,
+    }).get_json()
+    assert response['success'] and response['series_created'] == 1
+    return LessonSeries.query.one().id
+
+def month_lessons(admin_client, month, year=2026):
+    return admin_client.get(f'/get_month_schedule?month={month}&year={year}').get_json()
+
+def materialize(admin_client, series_id, day):
+    return admin_client.post('/materialize_occurrence', data={'series_id': series_id, 'date': day}).get_json()
+
+def test_series_stored_as_rule_and_expanded_per_month(admin_client):
+    """Серия без окончания — одна строка правила, занятия разворачиваются на запрошенный месяц"""
+    series_id = add_lesson_series(admin_client)
+    assert Schedule.query.count() == 0
+
+    october = month_lessons(admin_client, 10)
+    assert [item['date'] for item in october] == ['2026-10-05', '2026-10-12', '2026-10-19', '2026-10-26']
+    assert all(item['id'] is None and item['series_id'] == series_id for item in october)
+    assert october[0]['key'] == f's{series_id}:2026-10-05'
+    assert [item['date'] for item in month_lessons(admin_client, 12, 2027)][0] == '2027-12-06'
+
+def test_series_occurrence_override_and_cancel(admin_client):
+    """Изменённое занятие серии записывается в schedule, удалённое становится исключением"""
+    series_id = add_lesson_series(admin_client)
+
+    moved = materialize(admin_client, series_id, '2026-10-12')
+    assert moved['success']
+    assert materialize(admin_client, series_id, '2026-10-12')['id'] == moved['id']
+    subject_id = db.session.get(LessonSeries, series_id).subject_id
+    assert admin_client.post(f"/edit_schedule/{moved['id']}", data={
+        'date': '2026-10-12', 'time': '18:00', 'subject_id': subject_id,
+    }).get_json()['success']
+
+    cancelled = materialize(admin_client, series_id, '2026-10-19')
+    assert admin_client.get(f"/delete_schedule/{cancelled['id']}").get_json()['success']
+    assert not materialize(admin_client, series_id, '2026-10-19')['success']
+    assert not materialize(admin_client, series_id, '2026-10-13')['success']
+
+    october = month_lessons(admin_client, 10)
+    assert [(item['date'], item['time'], item['id']) for item in october] == [
+        ('2026-10-05', '16:00', None), ('2026-10-12', '18:00', moved['id']), ('2026-10-26', '16:00', None),
+    ]
+    assert LessonSeriesException.query.one().occurrence_date == date(2026, 10, 19)
+    assert Schedule.query.count() == 1
+
+def test_series_future_edit_and_delete_change_the_rule(admin_client):
+    """Изменение «это и последующие» делит серию, удаление заканчивает её — без строк на каждую неделю"""
+    series_id = add_lesson_series(admin_client, repeat_count='10')
+    series = db.session.get(LessonSeries, series_id)
+    assert series.end_date == date(2026, 11, 15)
+    form = {
+        'tutor_id': series.tutor_id, 'student_id': series.student_id, 'subject_id': series.subject_id,
+        'date': '2026-10-05', 'time': '18:30', 'apply_to': 'future_same_weekday',
+    }
+    lesson_id = materialize(admin_client, series_id, '2026-10-05')['id']
+    assert admin_client.post(f'/update_schedule/{lesson_id}', data=form).get_json()['success']
+
+    db.session.expire_all()
+    old, new = LessonSeries.query.order_by(LessonSeries.id).all()
+    assert (old.end_date, new.start_date, new.end_date, new.time) == (
+        date(2026, 10, 4), date(2026, 10, 5), date(2026, 11, 15), time(18, 30)
+    )
+    assert db.session.get(Schedule, lesson_id).series_id == new.id
+    assert {item['time'] for item in month_lessons(admin_client, 9)} == {'16:00'}
+    assert {item['time'] for item in month_lessons(admin_client, 10)} == {'18:30'}
+
+    lesson_id = materialize(admin_client, new.id, '2026-10-19')['id']
+    response = admin_client.get(f'/delete_schedule/{lesson_id}?apply_to=future_same_weekday').get_json()
+    # Записанное 19 октября и незаписанные 26 октября, 2 и 9 ноября
+    assert response == {'success': True, 'deleted': 4, 'series_occurrences_removed': 3}
+    assert [item['date'] for item in month_lessons(admin_client, 10)] == ['2026-10-05', '2026-10-12']
+    assert month_lessons(admin_client, 11) == []
+
+def test_schedule_api_merges_series_occurrences(client):
+    """/schedule и /api/schedule отдают занятия серий вместе с записанными, без пропусков и повторов"""
+    add_lessons(6, first_day=date.today() - timedelta(days=150), step_days=50)
+    tutor = TelegramID.query.filter_by(telegram_id='tutor').one()
+    student = TelegramID.query.filter_by(telegram_id='student0').one()
+    series_start = date.today() - timedelta(days=90)
+    series = LessonSeries(
+        tutor_id=tutor.id, student_id=student.id, subject_id=Subject.query.first().id, weekday=series_start.weekday(),
+        time=time(10, 0), start_date=series_start, end_date=series_start + timedelta(weeks=30),
+    )
+    db.session.add(series)
+    db.session.commit()
+    expected = sorted(
+        [(lesson.start_at, lesson.id, str(lesson.id)) for lesson in Schedule.query]
+        + [
+            (datetime.combine(series_start + timedelta(weeks=week), time(10, 0)), -series.id,
+             f's{series.id}:{(series_start + timedelta(weeks=week)).isoformat()}')
+            for week in range(31)
+        ]
+    )
+    _, context = rendered_context(client, '/schedule?username=tutor')
+    window = context['window']
+
+    def walk(direction, cursor):
+        keys = []
+        while True:
+            page = client.get('/api/schedule', query_string={
+                'username': 'tutor', 'direction': direction, 'cursor': cursor, 'limit': 4
+            }).get_json()
+            assert len(page['schedules']) <= 4
+            page_keys = [item['key'] for item in page['schedules']]
+            keys = page_keys + keys if direction == 'before' else keys + page_keys
+            if not page['has_more']:
+                return keys
+            cursor = page['next_cursor']
+
+    in_window = [item['key'] for item in context['schedules']]
+    assert any(key.startswith('s') for key in in_window)
+    assert walk('before', window['before']) + in_window + walk('after', window['after']) == [key for _, _, key in expected]
+
+def add_conflict_fixture():
+    """Два репетитора, два ученика и занятие первой пары 5 октября 2026 в 15:00 на 60 минут"""
+    tutors = [TelegramID(telegram_id=f'tutor{index}', description=f'Репетитор {index}', status='репетитор') for index in range(2)]
+    students = [TelegramID(telegram_id=f'student{index}', description=f'Ученик {index}', status='ученик') for index in range(2)]
+    subject = Subject(name='Английский')
+    db.session.add_all(tutors + students + [subject])
+    db.session.flush()
+    lesson = Schedule(
+        tutor_id=tutors[0].id, student_id=students[0].id, subject_id=subject.id,
+        date=date(2026, 10, 5), time=time(15, 0), duration_minutes=60,
+    )
+    db.session.add(lesson)
+    db.session.commit()
+    ids = [user.id for user in tutors + students] + [subject.id, lesson.id]
+    db.session.expunge_all()
+    return ids
+
+def test_add_schedule_rejects_overlapping_intervals(admin_client):
+    """Пробное занятие в 15:30 пересекается с часовым в 15:00 — и у репетитора, и у ученика; в 16:00 — нет"""
+    tutor_id, other_tutor_id, student_id, other_student_id, subject_id, lesson_id = add_conflict_fixture()
+    form = {'subject_id': subject_id, 'date': '2026-10-05', 'time': '15:30', 'is_trial': 'true'}
+
+    busy_tutor = admin_client.post('/add_schedule', data=dict(form, tutor_id=tutor_id, student_id=other_student_id)).get_json()
+    assert not busy_tutor['success'] and 'репетитор занят 15:00–16:00' in busy_tutor['error']
+    assert [(item['role'], item['with']['id']) for item in busy_tutor['conflicts']] == [('tutor', lesson_id)]
+
+    busy_student = admin_client.post('/add_schedule', data=dict(form, tutor_id=other_tutor_id, student_id=student_id)).get_json()
+    assert [item['role'] for item in busy_student['conflicts']] == ['student']
+
+    adjacent = admin_client.post('/add_schedule', data=dict(
+        form, tutor_id=tutor_id, student_id=other_student_id, time='16:00'
+    )).get_json()
+    assert adjacent['success'] and adjacent['created'] == 1
+    assert Schedule.query.count() == 2
+
+def test_recurring_batch_reports_every_clash_in_one_query(admin_client):
+    """52 недели проверяются одним запросом к schedule; возвращаются все пересечения, включая занятия серий"""
+    tutor_id, _, student_id, other_student_id, subject_id, _ = add_conflict_fixture()
+    db.session.add(Schedule(
+        tutor_id=tutor_id, student_id=student_id, subject_id=subject_id,
+        date=date(2027, 3, 1), time=time(15, 45), duration_minutes=30,
+    ))
+    db.session.add(LessonSeries(
+        tutor_id=tutor_id, student_id=student_id, subject_id=subject_id, weekday=0, time=time(14, 30),
+        start_date=date(2027, 6, 7), end_date=date(2027, 6, 21), duration_minutes=60,
+    ))
+    db.session.commit()
+
+    with count_queries() as statements:
+        response = admin_client.post('/add_schedule', data={
+            'tutor_id': tutor_id, 'student_id': other_student_id, 'subject_id': subject_id,
+            'date': '2026-09-07', 'time': '15:15', 'repeat_count': '52',
+        }).get_json()
+
+    assert not response['success']
+    assert [item['date'] for item in response['conflicts']] == [
+        '2026-10-05', '2027-03-01', '2027-06-07', '2027-06-14', '2027-06-21'
+    ]
+    assert all(item['role'] == 'tutor' for item in response['conflicts'])
+    # Занятия всех 52 недель — один запрос; второй — записанные даты серий вместе с отменёнными
+    lesson_queries = [statement for statement in schedule_table_queries(statements) if 'lesson_series' not in statement]
+    assert len(lesson_queries) == 1
+    assert not [statement for statement in statements if statement.startswith('INSERT INTO schedule ')]
+    assert Schedule.query.count() == 2
+    assert LessonSeries.query.count() == 1
+
+def test_edit_and_update_check_overlaps_but_not_the_lesson_itself(admin_client):
+    """Перенос занятия на полчаса пересекается только с его старым местом — это не конфликт"""
+    tutor_id, other_tutor_id, student_id, other_student_id, subject_id, lesson_id = add_conflict_fixture()
+    other = Schedule(
+        tutor_id=other_tutor_id, student_id=student_id, subject_id=subject_id,
+        date=date(2026, 10, 5), time=time(17, 0), duration_minutes=60,
+    )
+    db.session.add(other)
+    db.session.commit()
+    other_id = other.id
+
+    shifted = admin_client.post(f'/edit_schedule/{lesson_id}', data={
+        'date': '2026-10-05', 'time': '15:30', 'subject_id': subject_id,
+    }).get_json()
+    assert shifted['success']
+
+    clash = admin_client.post(f'/update_schedule/{other_id}', data={
+        'tutor_id': other_tutor_id, 'student_id': student_id, 'subject_id': subject_id,
+        'date': '2026-10-05', 'time': '16:00',
+    }).get_json()
+    assert not clash['success']
+    assert [(item['role'], item['with']['start']) for item in clash['conflicts']] == [('student', '15:30')]
+    assert db.session.get(Schedule, other_id).time == time(17, 0)
+
+def test_update_future_same_weekday_checks_all_moved_lessons(admin_client):
+    """Перенос серии на новое время отменяется целиком, если хоть одно занятие пересекается"""
+    lesson_id = add_weekly_series(admin_client)
+    lesson = db.session.get(Schedule, lesson_id)
+    other_tutor_id = TelegramID.query.filter(
+        TelegramID.status == 'репетитор', TelegramID.id != lesson.tutor_id
+    ).first().id
+    db.session.add(Schedule(
+        tutor_id=other_tutor_id, student_id=lesson.student_id, subject_id=lesson.subject_id,
+        date=date(2026, 10, 5), time=time(18, 0), duration_minutes=60,
+    ))
+    db.session.commit()
+    form = {
+        'tutor_id': lesson.tutor_id, 'student_id': lesson.student_id, 'subject_id': lesson.subject_id,
+        'date': '2026-09-21', 'time': '18:30', 'apply_to': 'future_same_weekday',
+    }
+
+    response = admin_client.post(f'/update_schedule/{lesson_id}', data=form).get_json()
+
+    assert not response['success']
+    assert [(item['date'], item['role']) for item in response['conflicts']] == [('2026-10-05', 'student')]
+    assert Schedule.query.filter(Schedule.time == time(18, 30)).count() == 0
+
+def test_open_ended_series_checked_past_expansion_horizon(admin_client):
+    """Серии без окончания сравниваются по правилам: пересечение через два года не пропускается"""
+    tutor_id, _, student_id, other_student_id, subject_id, _ = add_conflict_fixture()
+    db.session.add(LessonSeries(
+        tutor_id=tutor_id, student_id=other_student_id, subject_id=subject_id, weekday=0, time=time(16, 30),
+        start_date=date(2028, 9, 4), end_date=None, duration_minutes=60,
+    ))
+    db.session.commit()
+
+    response = admin_client.post('/add_schedule', data={
+        'tutor_id': tutor_id, 'student_id': student_id, 'subject_id': subject_id,
+        'date': '2026-10-12', 'time': '16:00', 'open_ended': 'true',
+    }).get_json()
+
+    assert not response['success']
+    assert response['conflicts'][0]['date'] == '2028-09-04'
+    assert {item['role'] for item in response['conflicts']} == {'tutor'}
+    assert len(response['conflicts']) == 52  # Не больше MAX_RECURRING_WEEKS дат на пару серий
+    assert LessonSeries.query.count() == 1
+
+    # Перенос серии на время, свободное до горизонта развёртывания, тоже проверяется целиком
+    series = LessonSeries(
+        tutor_id=tutor_id, student_id=student_id, subject_id=subject_id, weekday=0, time=time(19, 0),
+        start_date=date(2026, 10, 12), end_date=None, duration_minutes=60,
+    )
+    db.session.add(series)
+    db.session.commit()
+    lesson_id = materialize(admin_client, series.id, '2026-10-12')['id']
+    moved = admin_client.post(f'/update_schedule/{lesson_id}', data={
+        'tutor_id': tutor_id, 'student_id': student_id, 'subject_id': subject_id,
+        'date': '2026-10-12', 'time': '16:00', 'apply_to': 'future_same_weekday',
+    }).get_json()
+    assert not moved['success']
+    assert moved['conflicts'][0]['date'] == '2028-09-04'
+    assert db.session.get(Schedule, lesson_id).time == time(19, 0)
+
+def test_series_skips_existing_lessons_of_the_same_pair(admin_client):
+    """Занятия той же пары в то же время пропускаются: отдельная дата — исключением, совпадающий хвост
+    серии без окончания — датой окончания; отменённая дата существующей серии в новой остаётся"""
+    tutor_id, _, student_id, _, subject_id, _ = add_conflict_fixture()
+    existing = LessonSeries(
+        tutor_id=tutor_id, student_id=student_id, subject_id=subject_id, weekday=0, time=time(16, 0),
+        start_date=date(2026, 9, 7), end_date=None, duration_minutes=60,
+    )
+    db.session.add_all([existing, Schedule(
+        tutor_id=tutor_id, student_id=student_id, subject_id=subject_id,
+        date=date(2026, 8, 31), time=time(16, 0), duration_minutes=60,
+    )])
+    db.session.flush()
+    db.session.add(LessonSeriesException(series_id=existing.id, occurrence_date=date(2026, 10, 12)))
+    db.session.commit()
+    existing_id = existing.id
+
+    response = admin_client.post('/add_schedule', data={
+        'tutor_id': tutor_id, 'student_id': student_id, 'subject_id': subject_id,
+        'date': '2026-08-24', 'time': '16:00', 'open_ended': 'true',
+    }).get_json()
+
+    # С 24 августа по 23 августа 2027 — 53 понедельника, новые только 24 августа и 12 октября
+    assert response['success'] and (response['created'], response['skipped']) == (2, 51)
+    added = LessonSeries.query.filter(LessonSeries.id != existing_id).one()
+    assert (added.start_date, added.end_date) == (date(2026, 8, 24), date(2026, 10, 18))
+    assert LessonSeriesException.query.filter_by(series_id=added.id).count() == 6
+    mondays = [item['date'] for item in month_lessons(admin_client, 8) + month_lessons(admin_client, 10) if item['time'] == '16:00']
+    assert mondays == ['2026-08-24', '2026-08-31', '2026-10-05', '2026-10-12', '2026-10-19', '2026-10-26']
+
+def test_group_lesson_is_the_only_allowed_tutor_overlap(admin_client):
+    """Репетитор может вести одно занятие с несколькими учениками: то же начало, окончание и предмет"""
+    tutor_id, _, student_id, other_student_id, subject_id, lesson_id = add_conflict_fixture()
+    other_subject = Subject(name='Немецкий')
+    db.session.add(other_subject)
+    db.session.commit()
+    form = {'tutor_id': tutor_id, 'student_id': other_student_id, 'date': '2026-10-05', 'time': '15:00'}
+
+    assert not admin_client.post('/add_schedule', data=dict(form, subject_id=other_subject.id)).get_json()['success']
+    assert not admin_client.post('/add_schedule', data=dict(form, subject_id=subject_id, is_trial='true')).get_json()['success']
+    assert admin_client.post('/add_schedule', data=dict(form, subject_id=subject_id)).get_json()['success']
+
+    # Перенос в update_schedule подчиняется тому же правилу
+    group_lesson = Schedule.query.filter_by(student_id=other_student_id).one()
+    shifted = admin_client.post(f'/update_schedule/{group_lesson.id}', data=dict(
+        form, subject_id=subject_id, time='15:30'
+    )).get_json()
+    assert not shifted['success'] and shifted['conflicts'][0]['role'] == 'tutor'
+    back = admin_client.post(f'/update_schedule/{lesson_id}', data=dict(
+        form, student_id=student_id, subject_id=other_subject.id
+    )).get_json()
+    assert not back['success']
+
 if __name__ == '__main__':
     pytest.main([__file__])
\ No newline at end of file
@@ -0,0 +1,544 @@
+import pytest
+import os
+import sys
+import sqlite3
+import asyncio
+import json
+from datetime import date, datetime, time, timedelta
+
+# Добавляем родительскую директорию в путь для импорта
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', '123456:test-token')
+# Админка нужна для проверки ETag месяца; её движок создаётся при импорте
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+import app as admin_app
+import bot
+from bot import (
+    ReminderScheduler, ShardLeases, WebhookListener, claim_reminder_events, claim_reminder_rows,
+    materialize_series_rows, record_reminder_rows, release_reminder_rows
+)
+
+SCHEMA = """
+CREATE TABLE reminder (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    schedule_id INTEGER NOT NULL,
+    reminder_type VARCHAR(20) NOT NULL,
+    sent BOOLEAN DEFAULT FALSE,
+    sent_at DATETIME,
+    last_sent DATETIME,
+    lesson_start DATETIME,
+    claim_token VARCHAR(32),
+    claimed_at DATETIME,
+    tutor_status VARCHAR(20),
+    student_status VARCHAR(20),
+    parent_status VARCHAR(20),
+    UNIQUE (schedule_id, reminder_type)
+);
+CREATE TABLE reminder_lease (
+    shard INTEGER PRIMARY KEY,
+    owner VARCHAR(100),
+    expires_at DATETIME
+);
+CREATE TABLE bot_state (
+    name VARCHAR(50) PRIMARY KEY,
+    value DATETIME
+);
+CREATE TABLE schedule (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tutor_id INTEGER NOT NULL,
+    student_id INTEGER NOT NULL,
+    subject_id INTEGER NOT NULL,
+    date DATE NOT NULL,
+    time TIME NOT NULL,
+    lesson_type VARCHAR(20),
+    duration_minutes INTEGER,
+    start_at DATETIME,
+    end_at DATETIME,
+    series_id INTEGER,
+    occurrence_date DATE,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (series_id, occurrence_date)
+);
+CREATE TABLE lesson_series (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tutor_id INTEGER NOT NULL,
+    student_id INTEGER NOT NULL,
+    subject_id INTEGER NOT NULL,
+    weekday INTEGER NOT NULL,
+    interval_weeks INTEGER NOT NULL DEFAULT 1,
+    time TIME NOT NULL,
+    duration_minutes INTEGER,
+    lesson_type VARCHAR(20),
+    start_date DATE NOT NULL,
+    end_date DATE,
+    updated_at DATETIME
+);
+CREATE TABLE lesson_series_exception (
+    series_id INTEGER NOT NULL,
+    occurrence_date DATE NOT NULL,
+    PRIMARY KEY (series_id, occurrence_date)
+);
+CREATE TABLE schedule_version (
+    scope VARCHAR(7) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+"""
+
+# mysql.connector принимает TIME как datetime.time, SQLite — только строкой
+sqlite3.register_adapter(time, lambda value: value.isoformat())
+# DATETIME, как и в mysql.connector, читается как datetime
+sqlite3.register_converter('DATETIME', lambda value: datetime.fromisoformat(value.decode()))
+
+class SQLiteCursor:
+    """Курсор SQLite, понимающий синтаксис запросов MySQL, которые использует бот"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    @staticmethod
+    def _translate(sql):
+        return (
+            sql.replace('%s', '?').replace('INSERT IGNORE', 'INSERT OR IGNORE')
+            .replace('ON DUPLICATE KEY UPDATE', 'ON CONFLICT DO UPDATE SET')
+        )
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(self._translate(sql), params)
+
+    def executemany(self, sql, params):
+        self._cursor.executemany(self._translate(sql), params)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+class SQLiteConnection:
+    """Подмена MySQL-соединения для проверки координации реплик"""
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES)
+
+    def cursor(self):
+        return SQLiteCursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+class Worker:
+    """Реплика бота: аренда шардов, занятие и отправка напоминаний своих шардов"""
+
+    def __init__(self, path, worker_id, shard_count, ttl):
+        self.conn = SQLiteConnection(path)
+        self.leases = ShardLeases(worker_id, shard_count, ttl)
+        self.delivered = []
+        self.delivered_at = {}
+        self.alive = True
+        self.scheduler = ReminderScheduler(bot.REMINDER_REFRESH_INTERVAL, self.leases.shard_of)
+
+    def renew(self, now):
+        return self.leases.renew(self.conn, now)
+
+    def claim(self, lessons, now, claim_timeout):
+        """Занять напоминания занятий своих шардов"""
+        claims = [
+            (schedule_id, 'hour', start) for schedule_id, tutor_id, start in lessons
+            if self.leases.shard_of(tutor_id) in self.leases.current(now)
+        ]
+        return claim_reminder_rows(self.conn, claims, f"{self.leases.worker_id}-{now.isoformat()}", now, claim_timeout)
+
+    def tick(self, lessons, now):
+        """Итерация check_schedules: очередь своих шардов, наступившие события и их занятие в reminder"""
+        shards = self.leases.current(now)
+        if self.scheduler.needs_full_load(now, shards):
+            self.scheduler.load([
+                {'id': schedule_id, 'tutor_id': tutor_id, 'start_at': start, 'updated_at': now}
+                for schedule_id, tutor_id, start in lessons
+            ], now, now, shards, {})
+        due = self.scheduler.pop_due(now, bot.REMINDER_CATCHUP_BURST)
+        claimed, busy = claim_reminder_events(self.conn, due, f"{self.leases.worker_id}-{now.isoformat()}", now)
+        self.scheduler.requeue_busy([event for event in due if event[:2] not in claimed], busy, bot.REMINDER_CLAIM_TIMEOUT)
+        return claimed
+
+    def deliver(self, claimed, now):
+        """Отправить занятые напоминания и отметить их отправленными"""
+        self.delivered.extend(claimed)
+        self.delivered_at.update((item, now) for item in claimed)
+        statuses = {'tutor': 'sent', 'student': 'sent', 'parent': 'skipped'}
+        record_reminder_rows(self.conn, [(schedule_id, kind, statuses) for schedule_id, kind in claimed], now)
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Файл SQLite со схемой таблиц координации"""
+    path = str(tmp_path / 'bot.sqlite')
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    conn.close()
+    return path
+
+@pytest.fixture
+def lessons():
+    """Занятия разных репетиторов: (schedule_id, tutor_id, start_at)"""
+    start = datetime(2026, 10, 17, 15, 0)
+    return [(schedule_id, schedule_id % 7 + 1, start) for schedule_id in range(1, 61)]
+
+def make_workers(db_path, count, shard_count=8, ttl=timedelta(seconds=60)):
+    return [Worker(db_path, f"worker-{index}", shard_count, ttl) for index in range(count)]
+
+def settle(workers, now, rounds=3):
+    """Несколько раундов продления аренды, пока шарды не распределятся"""
+    for _ in range(rounds):
+        for worker in workers:
+            if worker.alive:
+                worker.renew(now)
+
+def test_shards_split_between_replicas(db_path):
+    """Шарды делятся между репликами без пересечений и без пропусков"""
+    now = datetime(2026, 10, 17, 12, 0)
+    workers = make_workers(db_path, 3)
+    settle(workers, now)
+
+    owned = [worker.leases.current(now) for worker in workers]
+    assert all(owned)
+    assert sum(len(shards) for shards in owned) == 8
+    assert frozenset().union(*owned) == frozenset(range(8))
+
+def test_no_duplicates_between_replicas(db_path, lessons):
+    """Каждое напоминание отправляет ровно одна реплика, даже если все пытаются занять всё"""
+    now = datetime(2026, 10, 17, 14, 0)
+    workers = make_workers(db_path, 3)
+    settle(workers, now)
+
+    # Худший случай: на стыке передачи шардов все реплики видят все занятия
+    for worker in workers:
+        worker.leases.owned = frozenset(range(8))
+    for worker in workers:
+        worker.deliver(worker.claim(lessons, now, bot.REMINDER_CLAIM_TIMEOUT), now)
+
+    delivered = [item for worker in workers for item in worker.delivered]
+    assert sorted(delivered) == sorted((schedule_id, 'hour') for schedule_id, _, _ in lessons)
+
+def test_dead_replica_shards_fail_over_without_losses(db_path, lessons):
+    """Реплика упала, заняв напоминания за 10 минут: остальные досылают их вовремя с настройками по умолчанию"""
+    workers = make_workers(db_path, 3, ttl=bot.REMINDER_LEASE_TTL)
+    dead = workers[0]
+    dead_claimed = set()
+    now = datetime(2026, 10, 17, 13, 59)
+    step = 0
+
+    # Цикл check_schedules каждые 10 секунд, аренда продлевается каждые 20
+    while now <= datetime(2026, 10, 17, 14, 55):
+        for worker in workers:
+            if not worker.alive:
+                continue
+            if step % 2 == 0:
+                worker.renew(now)
+            claimed = worker.tick(lessons, now)
+            if worker is dead and any(kind == '10min' for _, kind in claimed):
+                # Заняла и упала, не отметив отправку
+                dead_claimed = claimed
+                dead.alive = False
+                continue
+            worker.deliver(claimed, now)
+        now += timedelta(seconds=10)
+        step += 1
+
+    assert dead_claimed
+    delivered = [item for worker in workers for item in worker.delivered]
+    expected = [(schedule_id, kind) for schedule_id, _, _ in lessons for kind in ('hour', '10min')]
+    assert sorted(delivered) == sorted(expected)
+
+    # Каждое напоминание — не позже допустимого опоздания, в том числе занятые упавшей репликой
+    start = lessons[0][2]
+    leads = dict(bot.REMINDER_LEADS)
+    for worker in workers[1:]:
+        for (schedule_id, kind), delivered_at in worker.delivered_at.items():
+            assert delivered_at - (start - leads[kind]) <= bot.REMINDER_LATENESS[kind], (schedule_id, kind)
+    assert all(any(item in worker.delivered_at for worker in workers[1:]) for item in dead_claimed)
+
+def test_released_claims_are_taken_at_once(db_path):
+    """Напоминания, снятые упавшим тиком, другая реплика занимает сразу, не дожидаясь срока занятия"""
+    now = datetime(2026, 10, 17, 14, 0)
+    first, second = make_workers(db_path, 2)
+    start = datetime(2026, 10, 17, 15, 0)
+
+    assert claim_reminder_rows(first.conn, [(1, 'hour', start)], 'first', now) == {(1, 'hour')}
+    claimed, busy = claim_reminder_events(second.conn, [(1, 'hour', start)], 'second', now)
+    assert not claimed and busy == {(1, 'hour'): now}
+
+    release_reminder_rows(first.conn, 'first')
+    assert claim_reminder_rows(second.conn, [(1, 'hour', start)], 'second', now) == {(1, 'hour')}
+
+def test_busy_reminder_is_requeued_until_claim_expires(db_path):
+    """Напоминание, занятое другой репликой, возвращается в очередь к истечению её занятия"""
+    fire_at = datetime(2026, 10, 17, 14, 50)
+    start = fire_at + timedelta(minutes=10)
+    worker = make_workers(db_path, 1)[0]
+    claim_reminder_rows(worker.conn, [(1, '10min', start)], 'crashed', fire_at)
+
+    scheduler = ReminderScheduler(bot.REMINDER_REFRESH_INTERVAL, lambda tutor_id: 0)
+    claimed, busy = claim_reminder_events(worker.conn, [(1, '10min', start)], 'other', fire_at + timedelta(seconds=5))
+    assert not claimed
+    assert scheduler.requeue_busy([(1, '10min', start)], busy, bot.REMINDER_CLAIM_TIMEOUT) == 1
+    assert bot.REMINDER_CLAIM_TIMEOUT < bot.REMINDER_LATENESS['10min']
+
+    # pop_due отбрасывает события, если занятие перенесли; здесь отслеживаем его вручную
+    scheduler._starts[1] = start
+    retry_at = fire_at + bot.REMINDER_CLAIM_TIMEOUT + timedelta(seconds=1)
+    assert not scheduler.pop_due(retry_at - timedelta(seconds=1), 10)
+    assert scheduler.pop_due(retry_at, 10) == [(1, '10min', start)]
+    assert claim_reminder_rows(worker.conn, [(1, '10min', start)], 'other', retry_at) == {(1, '10min')}
+
+def test_moved_lesson_is_claimed_again(db_path):
+    """Перенесённое занятие получает напоминание заново, отправленное — не повторяется"""
+    now = datetime(2026, 10, 17, 14, 0)
+    worker = make_workers(db_path, 1)[0]
+    start = datetime(2026, 10, 17, 15, 0)
+
+    claimed = claim_reminder_rows(worker.conn, [(1, 'hour', start)], 'first', now)
+    worker.deliver(claimed, now)
+    assert not claim_reminder_rows(worker.conn, [(1, 'hour', start)], 'second', now)
+
+    moved = start + timedelta(hours=2)
+    assert claim_reminder_rows(worker.conn, [(1, 'hour', moved)], 'third', now) == {(1, 'hour')}
+
+def test_released_shards_go_to_new_replica(db_path):
+    """Новая реплика получает свою долю шардов, штатно остановленная — отдаёт все"""
+    now = datetime(2026, 10, 17, 12, 0)
+    first, second = make_workers(db_path, 2)
+    first.renew(now)
+    assert first.leases.current(now) == frozenset(range(8))
+
+    settle([second, first, second], now, rounds=1)
+    assert len(first.leases.current(now)) == 4
+    assert len(second.leases.current(now)) == 4
+
+    first.leases.release_all(first.conn)
+    second.renew(now)
+    assert second.leases.current(now) == frozenset(range(8))
+
+UPDATE_JSON = {
+    'update_id': 1001,
+    'message': {
+        'message_id': 7,
+        'date': 1760700000,
+        'chat': {'id': 42, 'type': 'private'},
+        'from': {'id': 42, 'is_bot': False, 'first_name': 'Тест'},
+        'text': '/start',
+    },
+}
+
+class FakeApplication:
+    """Приложение без Telegram: только очередь обновлений"""
+
+    def __init__(self):
+        self.bot = None
+        self.update_queue = asyncio.Queue()
+
+async def send_raw(port, data):
+    """Отправить произвольные байты на webhook и вернуть HTTP-статус ответа"""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(data)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    writer.close()
+    return status
+
+async def post(port, path, payload, secret=None):
+    """Отправить POST на webhook и вернуть HTTP-статус"""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    body = json.dumps(payload).encode() if not isinstance(payload, bytes) else payload
+    headers = f"POST {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n"
+    if secret is not None:
+        headers += f"X-Telegram-Bot-Api-Secret-Token: {secret}\r\n"
+    writer.write(headers.encode() + b"\r\n" + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    writer.close()
+    return status
+
+def test_webhook_accepts_only_signed_updates():
+    """Webhook ставит в очередь обновление с верным секретом и отклоняет остальные запросы"""
+    async def scenario():
+        application = FakeApplication()
+        listener = WebhookListener(application, '/telegram', 'secret', max_body=4096)
+        await listener.start('127.0.0.1', 0)
+        port = listener._server.sockets[0].getsockname()[1]
+
+        statuses = [
+            await post(port, '/telegram', UPDATE_JSON, secret='secret'),
+            await post(port, '/telegram', UPDATE_JSON, secret='wrong'),
+            await post(port, '/telegram', UPDATE_JSON),
+            await post(port, '/other', UPDATE_JSON, secret='secret'),
+            await post(port, '/telegram', b'not json', secret='secret'),
+            await post(port, '/telegram', b'x' * 5000, secret='secret'),
+        ]
+        await listener.stop(timeout=1)
+        return application, listener, statuses
+
+    application, listener, statuses = asyncio.run(scenario())
+    assert statuses == [200, 403, 403, 404, 400, 413]
+    assert application.update_queue.qsize() == 1
+    update = application.update_queue.get_nowait()
+    assert update.update_id == 1001
+    assert update.message.text == '/start'
+    assert not listener.serving
+    assert listener.stats()['received'] == 1
+
+def test_series_occurrences_materialized_for_reminder_window(db_path):
+    """Занятия серии записываются в schedule только на окно напоминаний, без отменённых и без повторов"""
+    conn = SQLiteConnection(db_path)
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO lesson_series (id, tutor_id, student_id, subject_id, weekday, interval_weeks, time, "
+        "duration_minutes, lesson_type, start_date, end_date, updated_at) "
+        "VALUES (1, 3, 4, 5, 0, 1, '16:00:00', 30, 'trial', '2026-10-05', NULL, '2026-10-01 12:00:00')"
+    )
+    cursor.execute("INSERT INTO lesson_series_exception (series_id, occurrence_date) VALUES (1, '2026-10-19')")
+    # Занятие 12 октября уже перенесено на 13-е
+    cursor.execute(
+        "INSERT INTO schedule (tutor_id, student_id, subject_id, date, time, series_id, occurrence_date) "
+        "VALUES (3, 4, 5, '2026-10-13', '18:00:00', 1, '2026-10-12')"
+    )
+    conn.commit()
+    all_shards = frozenset(range(bot.REMINDER_SHARDS))
+
+    # Шарды другой реплики и серии, не изменявшиеся с момента обновления, не трогаются
+    assert materialize_series_rows(conn, date(2026, 10, 12), date(2026, 10, 26), frozenset()) == 0
+    assert materialize_series_rows(
+        conn, date(2026, 10, 12), date(2026, 10, 26), all_shards, changed_since=datetime(2026, 10, 2)
+    ) == 0
+
+    assert materialize_series_rows(conn, date(2026, 10, 12), date(2026, 10, 26), all_shards) == 1
+    assert materialize_series_rows(conn, date(2026, 10, 12), date(2026, 10, 26), all_shards) == 0
+
+    cursor.execute("SELECT date, start_at, end_at, lesson_type FROM schedule WHERE series_id = 1 ORDER BY occurrence_date")
+    assert cursor.fetchall() == [
+        (date(2026, 10, 13), None, None, None),
+        (date(2026, 10, 26), datetime(2026, 10, 26, 16, 0), datetime(2026, 10, 26, 16, 30), 'trial'),
+    ]
+
+def test_materialized_series_rows_change_month_etag(db_path, monkeypatch):
+    """Записанное ботом занятие серии меняет ETag своего месяца в админке, остальные месяцы — нет"""
+    monkeypatch.setattr(admin_app.db, 'session', Session(create_engine(f'sqlite:///{db_path}')))
+    conn = SQLiteConnection(db_path)
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO lesson_series (id, tutor_id, student_id, subject_id, weekday, interval_weeks, time, "
+        "duration_minutes, lesson_type, start_date, end_date, updated_at) "
+        "VALUES (1, 3, 4, 5, 0, 1, '16:00:00', 60, 'regular', '2026-10-05', NULL, '2026-10-01 12:00:00')"
+    )
+    conn.commit()
+    all_shards = frozenset(range(bot.REMINDER_SHARDS))
+
+    def etags():
+        admin_app.db.session.rollback()
+        return [admin_app.month_schedule_etag(2026, month, None) for month in (10, 11, 12)]
+
+    before = etags()
+    # 26 октября и 2 ноября
+    assert materialize_series_rows(conn, date(2026, 10, 26), date(2026, 11, 2), all_shards) == 2
+    after = etags()
+    assert after[0] != before[0] and after[1] != before[1]
+    assert after[2] == before[2]
+
+    # Уже записанные занятия версии не меняют
+    assert materialize_series_rows(conn, date(2026, 10, 26), date(2026, 11, 2), all_shards) == 0
+    assert etags() == after
+
+def test_webhook_answers_malformed_and_slow_requests():
+    """Неверный Content-Length — 400, молчащий или медленный клиент — 408, и остановка его не ждёт"""
+    async def scenario():
+        listener = WebhookListener(FakeApplication(), '/telegram', 'secret', max_body=4096, read_timeout=0.2)
+        await listener.start('127.0.0.1', 0)
+        port = listener._server.sockets[0].getsockname()[1]
+        head = "POST /telegram HTTP/1.1\r\nX-Telegram-Bot-Api-Secret-Token: secret\r\n"
+
+        statuses = [
+            await send_raw(port, (head + "Content-Length: abc\r\n\r\n").encode()),
+            await send_raw(port, (head + "Content-Length: -5\r\n\r\n").encode()),
+            # Тело короче заявленного и клиент молчит
+            await send_raw(port, (head + "Content-Length: 100\r\n\r\n{").encode()),
+        ]
+        # Клиент открыл соединение и ничего не прислал
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        await asyncio.sleep(0.05)
+        started = asyncio.get_running_loop().time()
+        await listener.stop(timeout=5)
+        stopped_in = asyncio.get_running_loop().time() - started
+        statuses.append(int((await reader.readline()).split()[1]))
+        writer.close()
+        return listener, statuses, stopped_in
+
+    listener, statuses, stopped_in = asyncio.run(scenario())
+    assert statuses == [400, 400, 408, 408]
+    assert stopped_in < 1
+    assert listener.stats()['invalid'] == 4
+
+class FakeUserPool:
+    """Пул с одной строкой telegram_id; on_read вызывается между чтением строки и возвратом результата"""
+
+    def __init__(self, row):
+        self.row = row
+        self.on_read = None
+
+    def get_connection(self):
+        return self
+
+    def fetchone_prepared(self, sql, params):
+        snapshot = dict(self.row)
+        if self.on_read:
+            on_read, self.on_read = self.on_read, None
+            on_read()
+        return snapshot
+
+    def execute_prepared(self, sql, params):
+        if sql == bot.SQL_UPDATE_TIMEZONE:
+            self.row['timezone'] = params[0]
+        elif sql == bot.SQL_SAVE_CHAT_ID:
+            self.row['chat_id'] = params[0]
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+def test_user_cache_skips_row_read_before_concurrent_update(monkeypatch):
+    pool = FakeUserPool({'id': 1, 'telegram_id': 'student', 'timezone': 'Europe/Moscow', 'chat_id': None})
+    monkeypatch.setattr(bot, 'db_pool', pool)
+    monkeypatch.setattr(bot, 'user_cache', bot.UserCache(10, 60))
+
+    # Обновление timezone и chat_id завершается, пока get_user_info держит прочитанную до него строку
+    pool.on_read = lambda: (
+        bot.update_user_timezone('student', 'Asia/Tokyo'),
+        bot.save_chat_id('student', 42),
+    )
+    stale = bot.get_user_info('student')
+    assert stale['timezone'] == 'Europe/Moscow'
+    assert bot.user_cache.get('student') is None
+    assert bot.user_cache.stats()['stale'] == 1
+
+    fresh = bot.get_user_info('@student')
+    assert (fresh['timezone'], fresh['chat_id']) == ('Asia/Tokyo', 42)
+    assert bot.user_cache.get('student') == fresh
+
+    # Без параллельных изменений строка кэшируется как раньше
+    bot.user_cache.invalidate('student')
+    bot.get_user_info('student')
+    assert bot.user_cache.get('student')['timezone'] == 'Asia/Tokyo'
@@ -0,0 +1,53 @@
+import os
+import sys
+from datetime import date, timedelta
+from itertools import islice
+
+# Добавляем родительскую директорию в путь для импорта
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recurrence import common_series_dates, first_series_date, series_occurrence_dates
+
+def test_first_series_date():
+    """Первое занятие серии — ближайший нужный день недели, не раньше начальной даты"""
+    wednesday = date(2026, 9, 2)
+    assert first_series_date(wednesday, 2) == wednesday
+    assert first_series_date(wednesday, 0) == date(2026, 9, 7)
+    assert first_series_date(wednesday, 3) == date(2026, 9, 3)
+
+def test_occurrences_match_naive_expansion():
+    """Окно серии совпадает с перебором всех занятий серии от начала"""
+    start = date(2026, 9, 7)
+    for interval in (1, 2, 3):
+        for end in (None, date(2027, 3, 1)):
+            all_dates = [start + timedelta(weeks=interval * index) for index in range(60)]
+            all_dates = [day for day in all_dates if end is None or day <= end]
+            for date_from, date_to in [
+                (date(2026, 1, 1), date(2026, 9, 6)),
+                (date(2026, 9, 7), date(2026, 9, 7)),
+                (date(2026, 10, 1), date(2026, 10, 31)),
+                (date(2027, 2, 15), date(2027, 4, 1)),
+            ]:
+                expected = [day for day in all_dates if date_from <= day <= date_to]
+                assert series_occurrence_dates(start, end, interval, date_from, date_to) == expected
+
+def test_common_dates_match_naive_intersection():
+    """Общие даты двух серий совпадают с пересечением их занятий, в том числе для серий без окончания"""
+    horizon = date(2029, 1, 1)
+    starts = [date(2026, 9, 7), date(2026, 9, 21), date(2026, 12, 28), date(2026, 9, 8)]
+    for first_start in starts[:2]:
+        for other_start in starts:
+            for first_interval in (1, 2, 3):
+                for other_interval in (1, 2, 4):
+                    for first_end, other_end in [(None, None), (date(2027, 6, 30), None), (None, date(2027, 3, 1))]:
+                        expected = sorted(
+                            set(series_occurrence_dates(first_start, first_end, first_interval, first_start, horizon))
+                            & set(series_occurrence_dates(other_start, other_end, other_interval, other_start, horizon))
+                        )
+                        found = list(islice(
+                            common_series_dates(first_start, first_end, first_interval, other_start, other_end, other_interval),
+                            len(expected) + 1
+                        ))
+                        if first_end is None and other_end is None:
+                            found = [day for day in found if day <= horizon]
+                        assert found == expected, (first_start, other_start, first_interval, other_interval)
@@ -0,0 +1,90 @@
+import os
+import sys
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytz
+
+# Добавляем родительскую директорию в путь для импорта
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import timezones
+from timezones import (
+    SYSTEM_TIMEZONE, TIMEZONES, convert_time_to_user_timezone, convert_times_to_user_timezone, zone_transitions
+)
+
+def reference(system_datetime, timezone_str):
+    """Прежний способ: pytz.localize и astimezone на каждое время"""
+    return SYSTEM_TIMEZONE.localize(system_datetime).astimezone(pytz.timezone(timezone_str))
+
+def sample_datetimes():
+    """Время раз в двое суток с 2005 по 2030 год и часы вокруг каждого перехода системной зоны"""
+    moment = datetime(2005, 1, 1, 0, 7)
+    while moment < datetime(2030, 1, 1):
+        yield moment
+        moment += timedelta(days=2, hours=1, minutes=13)
+    for transition in SYSTEM_TIMEZONE._utc_transition_times:
+        if datetime(2005, 1, 1) < transition < datetime(2030, 1, 1):
+            for minutes in range(-90, 300, 30):
+                yield transition + timedelta(hours=4, minutes=minutes)
+
+def test_matches_pytz_for_all_zones():
+    """Таблицы смещений дают то же время и смещение, что и pytz"""
+    moments = list(sample_datetimes())
+    for timezone_str in TIMEZONES:
+        for moment, converted in zip(moments, convert_times_to_user_timezone(moments, timezone_str)):
+            expected = reference(moment, timezone_str)
+            assert converted == expected, (timezone_str, moment)
+            assert converted.replace(tzinfo=None) == expected.replace(tzinfo=None), (timezone_str, moment)
+            assert converted.utcoffset() == expected.utcoffset(), (timezone_str, moment)
+
+def berlin_transition_moments():
+    """Системное время каждые 20 минут вокруг переходов Европы/Берлина в 2026 году"""
+    for utc_transition in (datetime(2026, 3, 29, 1, 0), datetime(2026, 10, 25, 1, 0)):
+        for minutes in range(-180, 181, 20):
+            yield utc_transition + timedelta(hours=4, minutes=minutes)
+
+def test_dst_zone_matches_pytz_across_transition():
+    """Зона с летним временем вне TIMEZONES совпадает с pytz до и после перевода часов"""
+    moments = list(berlin_transition_moments())
+    converted = convert_times_to_user_timezone(moments, 'Europe/Berlin')
+    offsets = set()
+    for moment, user_datetime in zip(moments, converted):
+        expected = reference(moment, 'Europe/Berlin')
+        assert user_datetime.replace(tzinfo=None) == expected.replace(tzinfo=None), moment
+        assert user_datetime.utcoffset() == expected.utcoffset(), moment
+        offsets.add(user_datetime.utcoffset())
+    assert offsets == {timedelta(hours=1), timedelta(hours=2)}
+
+def test_falls_back_to_pytz_without_private_fields(monkeypatch):
+    """Если у зоны нет внутренних полей pytz, перевод идёт через localize/astimezone"""
+    assert zone_transitions(SimpleNamespace()) is None
+    monkeypatch.setattr(timezones, 'get_offset_table', lambda timezone_str: None)
+    moments = list(berlin_transition_moments())
+    for moment, user_datetime in zip(moments, convert_times_to_user_timezone(moments, 'Europe/Berlin')):
+        assert user_datetime == reference(moment, 'Europe/Berlin')
+        assert user_datetime.utcoffset() == reference(moment, 'Europe/Berlin').utcoffset()
+
+def test_legacy_offsets_fall_back_to_system_zone():
+    """Старый формат '+04:00' показывается в системном времени, пустой пояс не меняет время"""
+    moment = datetime(2026, 10, 17, 15, 30)
+    for timezone_str in ('+04:00', 'UTC+4'):
+        assert convert_time_to_user_timezone(moment, timezone_str).strftime('%d.%m.%Y %H:%M') == '17.10.2026 15:30'
+    for timezone_str in (None, ''):
+        assert convert_time_to_user_timezone(moment, timezone_str) is moment
+        assert convert_times_to_user_timezone([moment], timezone_str) == [moment]
+    assert convert_time_to_user_timezone(moment, 'Europe/Moscow').strftime('%H:%M') == '14:30'
+    assert convert_time_to_user_timezone(moment, 'Asia/Vladivostok').strftime('%d.%m %H:%M') == '17.10 21:30'
+
+def test_unknown_zone_returns_system_time():
+    """Неизвестный пояс не ломает показ расписания"""
+    moment = datetime(2026, 10, 17, 15, 30)
+    assert convert_time_to_user_timezone(moment, 'Mars/Olympus') == moment
+    assert convert_times_to_user_timezone([moment], 'Mars/Olympus') == [moment]
+
+def test_aware_datetimes_and_zone_objects():
+    """Время с часовым поясом и объект зоны вместо строки обрабатываются как раньше"""
+    aware = pytz.utc.localize(datetime(2026, 10, 17, 11, 30))
+    assert convert_time_to_user_timezone(aware, 'Asia/Omsk').strftime('%H:%M') == '17:30'
+    moment = datetime(2026, 10, 17, 15, 30)
+    assert convert_time_to_user_timezone(moment, pytz.timezone('Asia/Omsk')) == reference(moment, 'Asia/Omsk')
@@ -0,0 +1,157 @@
+"""
+Часовые пояса пользователей: общий модуль для app.py и bot.py.
+
+Время занятий хранится в системном часовом поясе (Саратов, UTC+4). Для показа
+пользователю оно переводится в его пояс. Объекты зон создаются один раз, а для
+зон из TIMEZONES заранее строятся таблицы смещений от UTC, поэтому перевод —
+это два двоичных поиска и сложение, без pytz.localize на каждое занятие.
+Таблицы строятся по внутренним полям pytz; если их нет, перевод идёт через
+localize/astimezone, как раньше.
+"""
+import logging
+from bisect import bisect_right
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+import pytz
+
+logger = logging.getLogger(__name__)
+
+# Часовой пояс системы (Саратов)
+SYSTEM_TIMEZONE_NAME = 'Europe/Saratov'
+SYSTEM_TIMEZONE = pytz.timezone(SYSTEM_TIMEZONE_NAME)  # UTC+4
+
+# Доступные часовые пояса для выбора
+TIMEZONES = {
+    'Europe/Moscow': '🇷🇺 Москва (UTC+3)',
+    'Europe/Saratov': '🇷🇺 Саратов (UTC+4)',
+    'Asia/Yekaterinburg': '🇷🇺 Екатеринбург (UTC+5)',
+    'Asia/Omsk': '🇷🇺 Омск (UTC+6)',
+    'Asia/Krasnoyarsk': '🇷🇺 Красноярск (UTC+7)',
+    'Asia/Irkutsk': '🇷🇺 Иркутск (UTC+8)',
+    'Asia/Yakutsk': '🇷🇺 Якутск (UTC+9)',
+    'Asia/Vladivostok': '🇷🇺 Владивосток (UTC+10)',
+    'Asia/Magadan': '🇷🇺 Магадан (UTC+11)',
+    'Asia/Kamchatka': '🇷🇺 Камчатка (UTC+12)',
+    'Europe/Kaliningrad': '🇷🇺 Калининград (UTC+2)',
+}
+
+def zone_transitions(tz):
+    """Моменты переходов зоны (UTC) и (смещение, dst, имя) после каждого; None, если их не узнать.
+
+    pytz хранит переходы в недокументированных полях _utc_transition_times/_transition_info,
+    поэтому они читаются только если есть и согласованы между собой.
+    """
+    transitions = getattr(tz, '_utc_transition_times', None)
+    infos = getattr(tz, '_transition_info', None)
+    if transitions and infos and len(transitions) == len(infos):
+        return list(transitions), list(infos)
+    if tz is pytz.utc or isinstance(tz, pytz.tzinfo.StaticTzInfo):
+        # Зона без переходов (UTC, Etc/GMT-4 и т.п.)
+        sample = datetime(2000, 1, 1)
+        return [datetime.min], [(tz.utcoffset(sample), timedelta(0), tz.tzname(sample))]
+    return None
+
+class OffsetTable:
+    """Смещения зоны от UTC: моменты переходов (в UTC и в местном времени) и смещение после каждого"""
+
+    def __init__(self, transitions, infos):
+        self.utc_starts = list(transitions)
+        self.offsets = [offset for offset, _, _ in infos]
+        self.zones = [timezone(offset, name) for offset, _, name in infos]
+        # Неоднозначное местное время (перевод часов назад) относится к периоду после перехода,
+        # несуществующее (перевод вперёд) — к периоду до него, как pytz.localize(is_dst=False)
+        self.local_starts = [datetime.min] + [
+            start + offset for start, offset in zip(self.utc_starts[1:], self.offsets[1:])
+        ]
+
+    def to_utc(self, local_datetime):
+        """Наивное местное время -> наивное UTC"""
+        return local_datetime - self.offsets[bisect_right(self.local_starts, local_datetime) - 1]
+
+    def from_utc(self, utc_datetime):
+        """Наивное UTC -> местное время с фиксированным смещением"""
+        index = bisect_right(self.utc_starts, utc_datetime) - 1
+        return (utc_datetime + self.offsets[index]).replace(tzinfo=self.zones[index])
+
+@lru_cache(maxsize=None)
+def resolve_timezone_name(timezone_str):
+    """Имя зоны pytz для значения из БД: старый формат ('+04:00', 'UTC+4') — системная зона"""
+    if timezone_str.startswith('UTC') or timezone_str.startswith('+'):
+        return SYSTEM_TIMEZONE_NAME
+    return timezone_str
+
+@lru_cache(maxsize=None)
+def get_timezone(timezone_str):
+    """Объект зоны pytz (создаётся один раз на имя)"""
+    return pytz.timezone(resolve_timezone_name(timezone_str))
+
+@lru_cache(maxsize=256)
+def get_offset_table(timezone_str):
+    """Таблица смещений зоны (строится один раз на имя) или None, если pytz не отдал переходы"""
+    try:
+        table = zone_transitions(get_timezone(timezone_str))
+        return OffsetTable(*table) if table else None
+    except (TypeError, ValueError) as e:
+        logger.warning(f"Таблица смещений для {timezone_str} не построена: {e}")
+        return None
+
+# Таблицы для системной зоны и зон из TIMEZONES строятся при импорте
+SYSTEM_OFFSETS = get_offset_table(SYSTEM_TIMEZONE_NAME)
+for _name in TIMEZONES:
+    get_offset_table(_name)
+
+def _localize_system(system_datetime):
+    return SYSTEM_TIMEZONE.localize(system_datetime) if system_datetime.tzinfo is None else system_datetime
+
+def _converter(user_timezone_str):
+    """Функция перевода системного времени в пояс пользователя"""
+    if not user_timezone_str:
+        # Пояс не задан — время показывается как есть
+        return lambda system_datetime: system_datetime
+    if not isinstance(user_timezone_str, str):
+        # Передан объект зоны
+        user_tz = user_timezone_str
+        return lambda system_datetime: _localize_system(system_datetime).astimezone(user_tz)
+
+    user_offsets = get_offset_table(user_timezone_str)
+    if user_offsets is None or SYSTEM_OFFSETS is None:
+        user_tz = get_timezone(user_timezone_str)
+        return lambda system_datetime: _localize_system(system_datetime).astimezone(user_tz)
+
+    def convert(system_datetime):
+        if system_datetime.tzinfo is None:
+            utc_datetime = SYSTEM_OFFSETS.to_utc(system_datetime)
+        else:
+            utc_datetime = system_datetime.astimezone(pytz.utc).replace(tzinfo=None)
+        return user_offsets.from_utc(utc_datetime)
+    return convert
+
+def convert_time_to_user_timezone(system_datetime, user_timezone_str):
+    """
+    Конвертировать время из системного часового пояса в пользовательский
+    system_datetime - datetime объект в системном времени (Саратов UTC+4)
+    user_timezone_str - строка часового пояса пользователя (например, 'Europe/Moscow')
+    """
+    try:
+        return _converter(user_timezone_str)(system_datetime)
+    except Exception as e:
+        logger.error(f"Ошибка конвертации времени: {e}")
+        return system_datetime
+
+def convert_times_to_user_timezone(system_datetimes, user_timezone_str):
+    """Конвертировать список времён в пояс пользователя; зона разрешается один раз на весь список"""
+    try:
+        convert = _converter(user_timezone_str)
+    except Exception as e:
+        logger.error(f"Ошибка конвертации времени: {e}")
+        return list(system_datetimes)
+
+    result = []
+    for system_datetime in system_datetimes:
+        try:
+            result.append(convert(system_datetime))
+        except Exception as e:
+            logger.error(f"Ошибка конвертации времени: {e}")
+            result.append(system_datetime)
+    return result